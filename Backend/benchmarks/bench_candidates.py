@@ -0,0 +1,88 @@
+"""
+Chargement des candidats à 50k objets : graphe ORM joinedload + DISTINCT (avant)
+vs. projection de colonnes + fonctions agrégées en SQL (SearchCandidate), puis
+sérialisation ObjetResponse de tous les résultats (avant) vs. de la page seule.
+
+Usage : python benchmarks/bench_candidates.py [nombre_objets]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "tests"))
+
+from sqlalchemy.orm import joinedload  # noqa: E402
+
+import models  # noqa: E402
+import schemas  # noqa: E402
+from db_fixtures import make_session, seed_bulk_inventory  # noqa: E402
+from search_engine import SmartSearchEngine  # noqa: E402
+
+PAGE_SIZE = 20
+
+
+def orm_candidates(db, condition, limit: int):
+    # Former _search candidate query
+    return (
+        db.query(models.Objet)
+        .options(joinedload(models.Objet.salle), joinedload(models.Objet.fonctionnalites))
+        .filter(condition)
+        .distinct()
+        .limit(limit)
+        .all()
+    )
+
+
+def measure(fn, repeat: int = 5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best * 1000, peak / 1024
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    db = make_session()
+    started = time.perf_counter()
+    seed_bulk_inventory(db, count)
+    print(f"{count} objets insérés en {time.perf_counter() - started:.1f} s")
+
+    engine = SmartSearchEngine()
+    for limit in (420, 520):
+        condition = models.Objet.id_objet % 7 == 0
+        id_statement = db.query(models.Objet.id_objet).filter(condition).distinct().limit(limit).statement
+
+        def before():
+            db.expunge_all()
+            objets = orm_candidates(db, condition, limit)
+            return [schemas.ObjetResponse.model_validate(obj) for obj in objets]
+
+        def after():
+            candidates = engine._load_candidates(db, id_statement)
+            return [schemas.ObjetResponse.model_validate(c) for c in candidates[:PAGE_SIZE]]
+
+        before_ms, before_kib = measure(before)
+        after_ms, after_kib = measure(after)
+        print(f"{limit} candidats  ORM joinedload + {limit} réponses : {before_ms:7.1f} ms  pic {before_kib:8.0f} Kio")
+        print(f"{limit} candidats  projection + {PAGE_SIZE} réponses      : {after_ms:7.1f} ms  pic {after_kib:8.0f} Kio")
+
+    queries = ["imprimante couleur", "hp laser", "scanner pdf wifi"]
+    for query in queries:
+        engine.search(db, query=query, limit=PAGE_SIZE)
+        search_ms, search_kib = measure(lambda: engine.search(db, query=query, limit=PAGE_SIZE))
+        print(f"search({query!r}, limit={PAGE_SIZE}) : {search_ms:7.1f} ms  pic {search_kib:8.0f} Kio")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Scoring des candidats : boucle par objet vs. lot (rapidfuzz cdist + NumPy), puis
+recherche complète triée vs. page top-k (limit=20) sur un inventaire SQLite.
+
+Usage : python benchmarks/bench_ranking.py
+"""
+import os
+import random
+import string
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "tests"))
+
+import metrics  # noqa: E402
+from db_fixtures import make_session, seed_bulk_inventory  # noqa: E402
+from search_engine import SmartSearchEngine  # noqa: E402
+
+WORDS = [
+    "imprimante", "scanner", "projecteur", "ecran", "routeur", "hp", "canon", "epson", "laserjet",
+    "couleur", "recto", "verso", "salle", "atlas", "borealis", "wifi", "pdf", "scan", "a4", "reunion",
+]
+
+
+def make_inputs(count: int):
+    random.seed(count)
+    haystacks = [
+        " ".join(random.choice(WORDS) for _ in range(random.randint(4, 10)))
+        + " " + "".join(random.choice(string.ascii_lowercase) for _ in range(6))
+        for _ in range(count)
+    ]
+    return dict(
+        haystacks=haystacks,
+        query_clean="imprimante couleur hp",
+        expanded_terms=["imprimante", "couleur", "hp"],
+        corrections={"coleur": "couleur"},
+        text_ranks=[random.random() for _ in range(count)],
+        availability_scores=[random.choice([100.0, 45.0, 10.0, 30.0]) for _ in range(count)],
+        distances=[random.choice([float("inf"), random.uniform(0, 8000)]) for _ in range(count)],
+        waiting_counts=[random.randint(0, 4) for _ in range(count)],
+        popularity_counts=[random.randint(0, 40) for _ in range(count)],
+        max_waiting=4,
+        max_popularity=40,
+        weights={"text": 0.60, "availability": 0.20, "distance": 0.05, "popularity": 0.10, "waiting": 0.05},
+    )
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    engine = SmartSearchEngine()
+    print(f"{'candidats':>10} {'boucle (ms)':>12} {'lot (ms)':>10} {'gain':>6}  identique")
+    for count in (500, 5_000, 50_000):
+        inputs = make_inputs(count)
+        repeat = 5 if count < 50_000 else 2
+        loop_ms = best_of(lambda: engine._score_features_loop(**inputs), repeat)
+        batch_ms = best_of(lambda: engine._score_features_batch(**inputs), repeat)
+        same = engine._score_features_loop(**inputs) == engine._score_features_batch(**inputs)
+        print(f"{count:>10} {loop_ms:>12.1f} {batch_ms:>10.1f} {loop_ms / batch_ms:>5.1f}x  {same}")
+
+    print()
+    search_topk(engine)
+
+
+def search_topk(engine: SmartSearchEngine, count: int = 5_000, limit: int = 20):
+    db = make_session()
+    seed_bulk_inventory(db, count)
+    queries = ["couleur", "hp laser", "rapide wifi", "reunion hdmi", "brother"]
+    print(f"{'requête':<16} {'candidats':>9} {'scorés':>7} {'tout (ms)':>10} {'top-' + str(limit) + ' (ms)':>12}")
+    for query in queries:
+        full_ms = best_of(lambda: engine.search(db, query=query, timer=metrics.NULL_TIMER), 5)
+        page_ms = best_of(lambda: engine.search(db, query=query, limit=limit, timer=metrics.NULL_TIMER), 5)
+        timer = metrics.StageTimer("search")
+        engine.search(db, query=query, limit=limit, timer=timer)
+        counts = dict(timer.counts)
+        print(f"{query:<16} {counts['candidates']:>9} {counts['scored']:>7} {full_ms:>10.1f} {page_ms:>12.1f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Latence de /search/suggest sur un inventaire synthétique (SQLite en mémoire).
+
+Usage : python benchmarks/bench_suggest.py [nombre_de_labels]
+"""
+import os
+import random
+import statistics
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import models  # noqa: E402
+from database import Base  # noqa: E402
+from search_engine import SmartSearchEngine  # noqa: E402
+
+BRANDS = ["HP", "Canon", "Epson", "Brother", "Fujitsu", "Xerox", "Ricoh", "Lexmark", "BenQ", "Cisco"]
+TYPES = ["Imprimante", "Scanner", "Projecteur", "Écran", "Routeur"]
+
+
+def build_session(label_count: int):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    random.seed(42)
+    session.execute(insert(models.Salle), [
+        {"id_salle": idx, "nom_salle": f"Salle {idx}", "coord_x": float(idx), "coord_y": 0.0, "num_etage": idx % 5}
+        for idx in range(1, 201)
+    ])
+    session.execute(insert(models.Objet), [
+        {
+            "id_objet": idx,
+            "nom_model": "".join(random.choice(string.ascii_lowercase) for _ in range(random.randint(4, 9)))
+            + f" {idx}",
+            "nom_marque": random.choice(BRANDS),
+            "type_objet": random.choice(TYPES),
+            "mac_adresse": f"mac-{idx}",
+            "statut": "Disponible",
+            "id_salle": 1 + idx % 200,
+        }
+        for idx in range(1, label_count + 1)
+    ])
+    session.commit()
+    return session
+
+
+def main():
+    label_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    session = build_session(label_count)
+    engine = SmartSearchEngine()
+
+    started = time.perf_counter()
+    engine.suggest(session, "warmup")
+    print(f"index build (first call): {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    queries = ["i", "im", "imp", "impri", "scan", "sanne", "canon", "salle 1", "hp", "qzx", "ab", "proj"]
+    queries += ["".join(random.choice(string.ascii_lowercase) for _ in range(random.randint(1, 6))) for _ in range(300)]
+
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        engine.suggest(session, query)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    print(f"{label_count} labels, {len(queries)} queries")
+    print(f"p50={statistics.median(timings):.2f} ms  p99={timings[int(len(timings) * 0.99) - 1]:.2f} ms  max={timings[-1]:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
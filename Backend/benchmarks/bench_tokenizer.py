@@ -0,0 +1,112 @@
+"""
+Démarrage à froid et coût de tokenisation par requête : pipeline spaCy complet
+(chargé à l'import, comme avant) vs. pipeline réduit chargé à la demande, et
+modes de tokenizer spacy / table / auto / rules.
+
+Usage : python benchmarks/bench_tokenizer.py
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+import search_engine  # noqa: E402
+from search_engine import SmartSearchEngine  # noqa: E402
+
+QUERIES = [
+    "imprimante dispo etage 2",
+    "hp",
+    "scanner libre",
+    "je cherche un projecteur pour la salle de réunion",
+    "i want to print a document",
+    "ecran en panne",
+    "imprimantes couleur recto verso au deuxième étage",
+    "pdf",
+    "اريد شي لطباعة ورقة",
+    "routeur wifi occupé",
+]
+
+COLD_START_SNIPPET = """
+import time
+import spacy
+started = time.perf_counter()
+spacy.load("{model}"{extra})
+print(time.perf_counter() - started)
+"""
+
+
+def cold_start(extra: str, rounds: int = 3) -> float:
+    code = COLD_START_SNIPPET.format(model=search_engine.SPACY_MODEL, extra=extra)
+    timings = []
+    for _ in range(rounds):
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        timings.append(float(output.stdout.strip().splitlines()[-1]))
+    return min(timings)
+
+
+def engine_start(rounds: int = 3) -> float:
+    code = (
+        "import sys, time; sys.path.insert(0, %r); started = time.perf_counter(); "
+        "import search_engine; print(time.perf_counter() - started)" % BACKEND_DIR
+    )
+    timings = []
+    for _ in range(rounds):
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        timings.append(float(output.stdout.strip().splitlines()[-1]))
+    return min(timings)
+
+
+def per_query(tokenize, rounds: int = 30):
+    for query in QUERIES:
+        tokenize(query)
+
+    timings = []
+    for _ in range(rounds):
+        for query in QUERIES:
+            started = time.perf_counter()
+            tokenize(query)
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.mean(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+def report(label: str, tokenize):
+    mean_ms, p99_ms = per_query(tokenize)
+    print(f"{label:<28} moyenne {mean_ms:7.3f} ms   p99 {p99_ms:7.3f} ms")
+
+
+def main():
+    trimmed_pipeline = search_engine._get_spacy_pipeline()
+    if trimmed_pipeline is None:
+        print(f"spaCy / {search_engine.SPACY_MODEL} indisponible : seul le mode rules est mesurable")
+    else:
+        full = cold_start("")
+        trimmed = cold_start(f", exclude={search_engine.SPACY_EXCLUDED_COMPONENTS!r}")
+        print(f"spacy.load complet (avant)  : {full:6.2f} s")
+        print(f"spacy.load sans parser/ner  : {trimmed:6.2f} s")
+
+    print(f"import search_engine        : {engine_start():6.2f} s   (spaCy chargé à la première requête)")
+    print()
+
+    if trimmed_pipeline is not None:
+        import spacy
+
+        full_pipeline = spacy.load(search_engine.SPACY_MODEL)
+        report("nlp() pipeline complet", full_pipeline)
+        report("nlp() sans parser/ner", trimmed_pipeline)
+
+    table = search_engine._get_lemma_table()
+    if table is not None:
+        print(f"table de lemmes             : {len(table)} formes, {table.size_bytes / 1024:.0f} Ko (mmap)")
+
+    for mode in ("spacy", "table", "auto", "rules"):
+        engine = SmartSearchEngine(use_index=False, tokenizer_mode=mode)
+        report(f"_extract_tokens {mode}", engine._extract_tokens)
+
+
+if __name__ == "__main__":
+    main()
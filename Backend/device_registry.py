@@ -0,0 +1,265 @@
+"""
+Registre mémoire des objets connectés, pour répondre aux heartbeats sans SELECT.
+
+- MAC -> (id_objet, statut, ip_adress) ;
+- clés (id_objet, source, niveau) des alertes ouvertes, avec un compteur par
+  clé (plusieurs alertes ouvertes peuvent partager la même clé).
+
+Les deux sont chargés en une requête chacun au premier heartbeat, puis tenus à
+jour par les endpoints qui créent, modifient, résolvent ou suppriment objets et
+alertes. Le registre est propre au processus : une MAC absente est cherchée en
+base (objet créé par un autre worker) avant d'être déclarée inconnue. Un
+statut changé par un autre worker est rattrapé à l'écriture : les heartbeats
+écrivent en compare-and-set et, si le statut n'est plus celui du registre,
+l'objet est relu (refresh_many). IOT_DEVICE_REGISTRY=0 revient à la lecture
+en base à chaque heartbeat.
+"""
+import os
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+import models
+from heartbeat_rules import OpenAlert
+from metrics import registry as metrics_registry
+
+DEVICE_REGISTRY = os.getenv("IOT_DEVICE_REGISTRY", "1").lower() not in {"0", "false", "no"}
+
+AlertKey = Tuple[int, Optional[str], Optional[str]]
+
+
+class DeviceState(NamedTuple):
+    id_objet: int
+    statut: Optional[str]
+    ip_adress: Optional[str]
+
+
+def _query_devices(db: Session, macs: Optional[Iterable[str]] = None) -> List[Tuple[str, DeviceState]]:
+    query = db.query(models.Objet.mac_adresse, models.Objet.id_objet, models.Objet.statut, models.Objet.ip_adress)
+    if macs is not None:
+        query = query.filter(models.Objet.mac_adresse.in_(sorted(macs)))
+    else:
+        query = query.filter(models.Objet.mac_adresse.isnot(None))
+    return [(mac, DeviceState(id_objet, statut, ip_adress)) for mac, id_objet, statut, ip_adress in query.all()]
+
+
+def _query_open_alerts(db: Session, object_ids: Optional[Iterable[int]] = None) -> List[AlertKey]:
+    query = db.query(models.Alerte.id_objet, models.Alerte.source, models.Alerte.niveau).filter(
+        models.Alerte.est_resolu == False  # noqa: E712
+    )
+    if object_ids is not None:
+        query = query.filter(models.Alerte.id_objet.in_(sorted(object_ids)))
+    return [tuple(row) for row in query.all()]
+
+
+class DeviceRegistry:
+    """
+    Process-local MAC and open-alert index. Mutators are called after the
+    corresponding commit; before the first load they are no-ops (the load reads
+    the committed state). Disabled, every lookup goes to the database.
+    """
+
+    def __init__(self, enabled: bool = DEVICE_REGISTRY):
+        self.enabled = enabled
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+        self._devices: Dict[str, DeviceState] = {}
+        self._macs: Dict[int, str] = {}
+        # id_objet -> {(source, niveau): open alert count}
+        self._alerts: Dict[int, Dict[Tuple[Optional[str], Optional[str]], int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    # ---- lecture ----
+
+    def _ensure_loaded(self, db: Session):
+        if self.loaded:
+            return
+        with self._lock:
+            if self.loaded:
+                return
+            # Lock held across both queries: writers that commit meanwhile apply
+            # their change after the snapshot is installed
+            for mac, state in _query_devices(db):
+                self._put(mac, state)
+            for key in _query_open_alerts(db):
+                self._add_alert(*key)
+            self.loaded = True
+
+    def lookup_many(self, db: Session, macs: Iterable[str]) -> Dict[str, DeviceState]:
+        """Known devices among `macs`; at most one SELECT, for the MACs not in the registry."""
+        macs = set(macs)
+        if not self.enabled:
+            return dict(_query_devices(db, macs)) if macs else {}
+
+        self._ensure_loaded(db)
+        found = {mac: self._devices[mac] for mac in macs if mac in self._devices}
+        missing = macs.difference(found)
+        self.hits += len(found)
+        if not missing:
+            return found
+
+        self.misses += len(missing)
+        rows = _query_devices(db, missing)
+        if rows:
+            alerts = _query_open_alerts(db, [state.id_objet for _, state in rows])
+            with self._lock:
+                for mac, state in rows:
+                    if mac not in self._devices:
+                        self._put(mac, state)
+                        for key in alerts:
+                            if key[0] == state.id_objet:
+                                self._add_alert(*key)
+                    found[mac] = self._devices[mac]
+        return found
+
+    def lookup(self, db: Session, mac: str) -> Optional[DeviceState]:
+        return self.lookup_many(db, [mac]).get(mac)
+
+    def open_alerts_many(self, db: Session, object_ids: Iterable[int]) -> Dict[int, List[OpenAlert]]:
+        object_ids = set(object_ids)
+        open_alerts: Dict[int, List[OpenAlert]] = {}
+        if not object_ids:
+            return open_alerts
+        if not self.enabled:
+            for id_objet, source, niveau in _query_open_alerts(db, object_ids):
+                open_alerts.setdefault(id_objet, []).append(OpenAlert(source, niveau))
+            return open_alerts
+
+        self._ensure_loaded(db)
+        with self._lock:
+            for id_objet in object_ids:
+                keys = self._alerts.get(id_objet)
+                if keys:
+                    open_alerts[id_objet] = [OpenAlert(source, niveau) for source, niveau in keys]
+        return open_alerts
+
+    def open_alerts(self, db: Session, id_objet: int) -> List[OpenAlert]:
+        return self.open_alerts_many(db, [id_objet]).get(id_objet, [])
+
+    def refresh_many(self, db: Session, macs: Iterable[str]) -> Dict[str, DeviceState]:
+        """
+        Re-read `macs` and their open alerts from the database, for devices the registry is
+        behind on (a write that expected their status matched no row); MACs that no longer
+        exist are dropped.
+        """
+        macs = set(macs)
+        rows = _query_devices(db, macs) if macs else []
+        if not self.enabled or not self.loaded:
+            return dict(rows)
+
+        alerts = _query_open_alerts(db, [state.id_objet for _, state in rows])
+        with self._lock:
+            for mac in macs:
+                previous = self._devices.pop(mac, None)
+                if previous is not None:
+                    self._macs.pop(previous.id_objet, None)
+                    self._alerts.pop(previous.id_objet, None)
+            for mac, state in rows:
+                self._put(mac, state)
+                self._alerts.pop(state.id_objet, None)
+            for key in alerts:
+                self._add_alert(*key)
+        return dict(rows)
+
+    # ---- mises à jour (après commit) ----
+
+    def _put(self, mac: str, state: DeviceState):
+        previous = self._macs.get(state.id_objet)
+        if previous is not None and previous != mac:
+            self._devices.pop(previous, None)
+        self._devices[mac] = state
+        self._macs[state.id_objet] = mac
+
+    def _add_alert(self, id_objet: int, source: Optional[str], niveau: Optional[str]):
+        keys = self._alerts.setdefault(id_objet, {})
+        keys[(source, niveau)] = keys.get((source, niveau), 0) + 1
+
+    def upsert_objet(self, id_objet: int, mac_adresse: Optional[str], statut: Optional[str], ip_adress: Optional[str]):
+        """Object created or edited (its MAC may have changed)."""
+        if not self.loaded:
+            return
+        with self._lock:
+            if mac_adresse is None:
+                previous = self._macs.pop(id_objet, None)
+                if previous is not None:
+                    self._devices.pop(previous, None)
+                return
+            self._put(mac_adresse, DeviceState(id_objet, statut, ip_adress))
+
+    def set_state(self, id_objet: int, statut: Optional[str], ip_adress: Optional[str]):
+        if not self.loaded:
+            return
+        with self._lock:
+            mac = self._macs.get(id_objet)
+            if mac is not None:
+                self._devices[mac] = DeviceState(id_objet, statut, ip_adress)
+
+    def set_statut(self, id_objet: int, statut: Optional[str]):
+        if not self.loaded:
+            return
+        with self._lock:
+            mac = self._macs.get(id_objet)
+            if mac is not None:
+                self._devices[mac] = self._devices[mac]._replace(statut=statut)
+
+    def forget_objet(self, id_objet: int):
+        if not self.loaded:
+            return
+        with self._lock:
+            mac = self._macs.pop(id_objet, None)
+            if mac is not None:
+                self._devices.pop(mac, None)
+            self._alerts.pop(id_objet, None)
+
+    def alert_opened(self, id_objet: int, source: Optional[str], niveau: Optional[str]):
+        if not self.loaded:
+            return
+        with self._lock:
+            self._add_alert(id_objet, source, niveau)
+
+    def alert_resolved(self, id_objet: int, source: Optional[str], niveau: Optional[str]):
+        if not self.loaded:
+            return
+        with self._lock:
+            keys = self._alerts.get(id_objet)
+            if not keys or (source, niveau) not in keys:
+                return
+            keys[(source, niveau)] -= 1
+            if keys[(source, niveau)] <= 0:
+                del keys[(source, niveau)]
+            if not keys:
+                del self._alerts[id_objet]
+
+    def open_alert_keys(self) -> List[AlertKey]:
+        with self._lock:
+            return sorted(
+                ((id_objet, source, niveau) for id_objet, keys in self._alerts.items() for source, niveau in keys),
+                key=lambda key: (key[0], str(key[1]), str(key[2])),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._devices.clear()
+            self._macs.clear()
+            self._alerts.clear()
+            self.loaded = False
+
+
+devices = DeviceRegistry()
+
+metrics_registry.gauge("iot_registry_devices", "Objets connus du registre des heartbeats", lambda: len(devices))
+metrics_registry.callback_counter(
+    "iot_registry_hits_total",
+    "MAC résolues par le registre sans requête",
+    lambda: devices.hits,
+)
+metrics_registry.callback_counter(
+    "iot_registry_misses_total",
+    "MAC absentes du registre (recherchées en base)",
+    lambda: devices.misses,
+)
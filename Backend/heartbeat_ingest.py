@@ -0,0 +1,201 @@
+"""
+Ingestion groupée des heartbeats (/iot/heartbeats).
+
+Les MAC et les alertes ouvertes sont lues dans le registre mémoire
+(device_registry) ou, à défaut, en une requête chacune pour tout le lot ; les
+règles de heartbeat_rules sont appliquées en mémoire, puis un UPDATE
+compare-and-set (le statut doit être celui d'où partent les règles) et un
+INSERT d'alertes en masse, dans une seule transaction. Les simples signes de
+vie peuvent passer par le write-behind (liveness_buffer).
+"""
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import DateTime, Integer, String, column, insert, update, values
+from sqlalchemy.orm import Session
+
+import models
+import schemas
+from device_registry import DeviceRegistry, DeviceState
+from heartbeat_rules import OpenAlert, apply_heartbeat, needs_open_alerts
+from heartbeat_series import HeartbeatSeries
+from liveness_buffer import LivenessBuffer
+
+HEARTBEAT_BATCH_MAX = int(os.getenv("IOT_HEARTBEAT_BATCH_MAX", "5000"))
+# Replays of a heartbeat whose object changed status behind the registry's back
+HEARTBEAT_WRITE_ATTEMPTS = 3
+
+_objets = models.Objet.__table__
+
+# (id_objet, statut the rules started from, new statut, ip_adress, last_heartbeat)
+Transition = Tuple[int, Optional[str], Optional[str], Optional[str], datetime]
+
+
+class HeartbeatBatchResult(NamedTuple):
+    processed: int
+    unknown: List[str]
+    # mac -> statut after the batch
+    statuts: Dict[str, Optional[str]]
+    # (id_objet, statut) of the objects whose status or IP changed
+    changed: List[Tuple[int, Optional[str]]]
+
+
+def write_transitions(db: Session, transitions: Sequence[Transition]) -> Set[int]:
+    """
+    One UPDATE ... FROM VALUES, compare-and-set: a row is written only while the object's
+    status is still the one the rules started from. Returns the ids written; the others
+    changed status since it was read (another worker, the offline sweep).
+    """
+    rows = values(
+        column("id_objet", Integer),
+        column("expected", String),
+        column("statut", String),
+        column("ip_adress", String),
+        column("last_heartbeat", DateTime),
+        name="heartbeat_rows",
+    ).data(list(transitions)).cte("heartbeat_rows")
+    statement = (
+        update(_objets)
+        .where(_objets.c.id_objet == rows.c.id_objet)
+        .where(_objets.c.statut.is_not_distinct_from(rows.c.expected))
+        .values(statut=rows.c.statut, ip_adress=rows.c.ip_adress, last_heartbeat=rows.c.last_heartbeat)
+        .returning(_objets.c.id_objet)
+    )
+    return {id_objet for (id_objet,) in db.execute(statement)}
+
+
+def _apply_rules(
+    heartbeats: Iterable[schemas.HeartbeatSchema],
+    initial: Dict[str, DeviceState],
+    open_alerts: Dict[int, List[OpenAlert]],
+    default_ip: Optional[str],
+    now: datetime,
+):
+    """Heartbeats in order, from the `initial` states: final (statut, ip) per MAC, new alerts, per-heartbeat outcomes."""
+    current: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+    new_alerts: List[dict] = []
+    outcomes: List[Tuple[str, Optional[str]]] = []
+    for heartbeat in heartbeats:
+        id_objet = initial[heartbeat.mac_adresse].id_objet
+        statut = current[heartbeat.mac_adresse][0] if heartbeat.mac_adresse in current else initial[heartbeat.mac_adresse].statut
+
+        outcome = apply_heartbeat(statut, heartbeat.statut, open_alerts.get(id_objet, ()))
+        current[heartbeat.mac_adresse] = (outcome.statut, heartbeat.ip_adress or default_ip)
+        outcomes.append((heartbeat.mac_adresse, outcome.statut))
+        if outcome.alerte is not None:
+            new_alerts.append({
+                "message": outcome.alerte.message,
+                "niveau": outcome.alerte.niveau,
+                "source": outcome.alerte.source,
+                "id_objet": id_objet,
+                "date_alerte": now,
+                "est_resolu": False,
+            })
+            open_alerts.setdefault(id_objet, []).append(OpenAlert(outcome.alerte.source, outcome.alerte.niveau))
+    return current, new_alerts, outcomes
+
+
+def ingest_heartbeats(
+    db: Session,
+    heartbeats: Sequence[schemas.HeartbeatSchema],
+    default_ip: Optional[str],
+    now: Optional[datetime] = None,
+    liveness: Optional[LivenessBuffer] = None,
+    registry: Optional[DeviceRegistry] = None,
+    series: Optional[HeartbeatSeries] = None,
+) -> HeartbeatBatchResult:
+    """
+    Apply a batch in order (a MAC sent twice sees its first heartbeat's effects) and commit once.
+    With an enabled `liveness` buffer, objects whose status and IP did not change and that got
+    no new alert are only recorded there. Without a `registry`, MACs and open alerts are read
+    from the database (two SELECTs); the registry is kept up to date after the commit.
+    Status writes are compare-and-set: the heartbeats of an object whose status changed behind
+    the registry are replayed from a fresh read. Each heartbeat's outcome also goes to `series`
+    (uptime history) when given.
+    """
+    now = now or datetime.utcnow()
+    registry = registry or DeviceRegistry(enabled=False)
+    initial = registry.lookup_many(db, {heartbeat.mac_adresse for heartbeat in heartbeats})
+    unknown = [heartbeat.mac_adresse for heartbeat in heartbeats if heartbeat.mac_adresse not in initial]
+    pending = [heartbeat for heartbeat in heartbeats if heartbeat.mac_adresse in initial]
+
+    current: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+    new_alerts: List[dict] = []
+    outcomes: List[Tuple[str, Optional[str]]] = []
+    changed: List[Tuple[int, Optional[str]]] = []
+    written: List[str] = []
+    deferred: Set[str] = set()
+    for _ in range(HEARTBEAT_WRITE_ATTEMPTS):
+        open_alerts = registry.open_alerts_many(db, {
+            initial[heartbeat.mac_adresse].id_objet for heartbeat in pending if needs_open_alerts(heartbeat.statut)
+        })
+        step, step_alerts, step_outcomes = _apply_rules(pending, initial, open_alerts, default_ip, now)
+
+        step_changed = [
+            mac for mac, (statut, ip_adress) in step.items()
+            if statut != initial[mac].statut or ip_adress != initial[mac].ip_adress
+        ]
+        alerted = {alert["id_objet"] for alert in step_alerts}
+        step_deferred: Set[str] = set()
+        if liveness is not None and liveness.enabled:
+            step_deferred = {
+                mac for mac in step
+                if mac not in step_changed and initial[mac].id_objet not in alerted
+            }
+
+        immediate = [mac for mac in step if mac not in step_deferred]
+        stale: Set[str] = set()
+        if immediate:
+            applied = write_transitions(db, [
+                (initial[mac].id_objet, initial[mac].statut, *step[mac], now) for mac in immediate
+            ])
+            stale = {mac for mac in immediate if initial[mac].id_objet not in applied}
+        stale_ids = {initial[mac].id_objet for mac in stale}
+
+        current.update((mac, state) for mac, state in step.items() if mac not in stale)
+        new_alerts.extend(alert for alert in step_alerts if alert["id_objet"] not in stale_ids)
+        outcomes.extend(outcome for outcome in step_outcomes if outcome[0] not in stale)
+        changed.extend((initial[mac].id_objet, step[mac][0]) for mac in step_changed if mac not in stale)
+        written.extend(mac for mac in immediate if mac not in stale)
+        deferred.update(step_deferred)
+        if not stale:
+            break
+
+        # Registry behind the database: re-read these objects and replay their heartbeats
+        fresh = registry.refresh_many(db, stale)
+        for mac in stale.difference(fresh):
+            del initial[mac]
+            unknown.extend(heartbeat.mac_adresse for heartbeat in pending if heartbeat.mac_adresse == mac)
+        initial.update(fresh)
+        pending = [heartbeat for heartbeat in pending if heartbeat.mac_adresse in fresh]
+
+    if new_alerts:
+        db.execute(insert(models.Alerte), new_alerts)
+    if written or new_alerts:
+        db.commit()
+
+    for mac in written:
+        registry.set_state(initial[mac].id_objet, *current[mac])
+    for alert in new_alerts:
+        registry.alert_opened(alert["id_objet"], alert["source"], alert["niveau"])
+    if series is not None:
+        for mac, statut in outcomes:
+            series.record(initial[mac].id_objet, now, statut)
+
+    if liveness is not None and liveness.enabled:
+        for mac in written:
+            liveness.discard(initial[mac].id_objet)
+        for mac in deferred:
+            liveness.record(initial[mac].id_objet, now, current[mac][1])
+
+    return HeartbeatBatchResult(
+        processed=len(heartbeats) - len(unknown),
+        unknown=unknown,
+        # objects still moving after the last replay keep the status last read
+        statuts={
+            mac: current[mac][0] if mac in current else initial[mac].statut
+            for mac in dict.fromkeys(heartbeat.mac_adresse for heartbeat in heartbeats) if mac in initial
+        },
+        changed=changed,
+    )
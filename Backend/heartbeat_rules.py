@@ -0,0 +1,66 @@
+"""
+Règles de statut des heartbeats IoT, sans accès base : partagées par
+/iot/heartbeat (un objet) et /iot/heartbeats (lot de passerelle).
+
+- Critique : l'objet passe en Panne, alerte Critical si aucune alerte IoT ouverte.
+- Avertissement : Signalé (sauf s'il est en Panne), alerte Warning si aucune
+  alerte de niveau Warning n'est déjà ouverte (toutes sources).
+- OK : une Panne ou un Signalé redevient Disponible ; Occupé reste Occupé.
+- Un objet Hors ligne (cf. offline_sweeper) qui se manifeste redevient
+  Disponible, sauf avertissement ou alerte critique.
+"""
+from typing import Iterable, NamedTuple, Optional
+
+# Mots-clés que l'IoT peut envoyer
+STATUS_CRITIQUE = frozenset({"Critical", "Panne", "Erreur", "Surchauffe", "Error"})
+STATUS_WARNING = frozenset({"Warning", "Low Battery", "Papier Bas", "Maintenance"})
+STATUS_OK = frozenset({"OK", "Available", "Ready", "Disponible"})
+
+# Posé par le balayage des objets muets, jamais envoyé par l'IoT
+STATUT_HORS_LIGNE = "Hors ligne"
+
+
+class OpenAlert(NamedTuple):
+    source: Optional[str]
+    niveau: Optional[str]
+
+
+class NewAlert(NamedTuple):
+    message: str
+    niveau: str
+    source: str = "IoT"
+
+
+class HeartbeatOutcome(NamedTuple):
+    statut: Optional[str]
+    alerte: Optional[NewAlert]
+
+
+def needs_open_alerts(reported: str) -> bool:
+    """Only critical and warning heartbeats look at the object's open alerts."""
+    return reported in STATUS_CRITIQUE or reported in STATUS_WARNING
+
+
+def apply_heartbeat(statut: Optional[str], reported: str, open_alerts: Iterable[OpenAlert] = ()) -> HeartbeatOutcome:
+    """New object status and the alert to create (if any) for one heartbeat."""
+    if reported in STATUS_CRITIQUE:
+        if any(alert.source == "IoT" for alert in open_alerts):
+            return HeartbeatOutcome("Panne", None)
+        return HeartbeatOutcome("Panne", NewAlert(f"ALERTE CRITIQUE AUTO : {reported}", "Critical"))
+
+    if reported in STATUS_WARNING:
+        new_statut = statut if statut == "Panne" else "Signalé"
+        # Simple vérif pour éviter doublon (toutes sources)
+        if any(alert.niveau == "Warning" for alert in open_alerts):
+            return HeartbeatOutcome(new_statut, None)
+        return HeartbeatOutcome(new_statut, NewAlert(f"Maintenance requise : {reported}", "Warning"))
+
+    if reported in STATUS_OK and statut in ("Panne", "Signalé"):
+        return HeartbeatOutcome("Disponible", None)
+
+    # N'importe quel signe de vie suffit à sortir du Hors ligne
+    if statut == STATUT_HORS_LIGNE:
+        return HeartbeatOutcome("Disponible", None)
+
+    # Statut inconnu, ou OK sur un objet Disponible / Occupé : on ne touche pas
+    return HeartbeatOutcome(statut, None)
@@ -0,0 +1,408 @@
+"""
+Historique compact des heartbeats par objet (disponibilité, instabilité).
+
+Aucun échantillon n'est gardé : chaque objet a deux anneaux de taille fixe,
+en colonnes `array` :
+- minutes (IOT_SERIES_MINUTES dernières) : état de la minute (muette, en
+  service, en panne) et changements d'état ;
+- heures (IOT_SERIES_HOURS dernières) : minutes en service, minutes en panne,
+  changements d'état.
+
+Un heartbeat ne fait que reclasser sa minute (muette -> en service, en service
+-> en panne) et reporter l'écart sur son heure : la disponibilité d'une fenêtre
+se lit sur les heures entières plus au plus deux bords en minutes.
+
+Persistance : journal binaire, un enregistrement de 13 octets par reclassement
+de minute (au plus deux par objet et par minute). À chaque heure close, et au
+démarrage après rejeu, il est réécrit en instantané des anneaux : un
+enregistrement par heure retenue et par minute encore dans l'anneau, puis les
+reclassements suivants s'y ajoutent. Sa taille reste bornée par la rétention.
+Un seul processus tient le journal (verrou exclusif sur `<journal>.lock`) ; les
+autres workers gardent leur historique en mémoire.
+"""
+import os
+import struct
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from metrics import registry as metrics_registry
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no journal lock, run a single worker
+    fcntl = None
+
+SERIES_ENABLED = os.getenv("IOT_SERIES", "1").lower() not in {"0", "false", "no"}
+SERIES_MINUTES = int(os.getenv("IOT_SERIES_MINUTES", "180"))
+SERIES_HOURS = int(os.getenv("IOT_SERIES_HOURS", str(24 * 14)))
+DEFAULT_SERIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "heartbeat_series.log")
+# Chemin vide : historique en mémoire seulement
+SERIES_PATH = os.getenv("IOT_SERIES_PATH", DEFAULT_SERIES_PATH)
+SERIES_FLUSH_SECONDS = 2.0
+
+MAGIC = b"HBTS"
+FORMAT_VERSION = 2
+# magic, version
+_HEADER = struct.Struct("<4sI")
+# kind, id_objet, then by kind:
+# - _DELTA: minute (since the epoch), previous minute state, new minute state, transitions added
+# - _HOUR: hour (since the epoch), up minutes, down minutes, transitions (whole rollup)
+# - _MINUTE: minute, minute state, unused, transitions (minute slot only, its hour comes as _HOUR)
+_RECORD = struct.Struct("<BIiBBH")
+_DELTA, _HOUR, _MINUTE = 0, 1, 2
+# version 1: _DELTA records without the kind byte
+_RECORD_V1 = struct.Struct("<IiBBB")
+
+SILENT, UP, DOWN = 0, 1, 2
+DOWN_STATUTS = frozenset({"Panne"})
+
+_EPOCH = datetime(1970, 1, 1)
+
+Record = Tuple[int, int, int, int, int, int]
+
+
+def state_of(statut: Optional[str]) -> int:
+    return DOWN if statut in DOWN_STATUTS else UP
+
+
+def minute_of(moment: datetime) -> int:
+    """Minutes since the epoch of a naive UTC datetime (as stored by the API)."""
+    return int((moment - _EPOCH).total_seconds() // 60)
+
+
+class Availability(NamedTuple):
+    window_start: datetime
+    window_end: datetime
+    up_minutes: int
+    down_minutes: int
+    silent_minutes: int
+    transitions: int
+    # "minute", or "hour" when an edge older than the minute ring was widened to the hour
+    resolution: str
+
+    @property
+    def availability_pct(self) -> float:
+        total = self.up_minutes + self.down_minutes + self.silent_minutes
+        return round(100.0 * self.up_minutes / total, 2) if total else 0.0
+
+
+class _DeviceSeries:
+    __slots__ = (
+        "minute_ids", "minute_states", "minute_transitions",
+        "hour_ids", "hour_up", "hour_down", "hour_transitions", "last_state",
+    )
+
+    def __init__(self, minute_slots: int, hour_slots: int):
+        self.minute_ids = array("i", [-1]) * minute_slots
+        self.minute_states = array("B", bytes(minute_slots))
+        self.minute_transitions = array("B", bytes(minute_slots))
+        self.hour_ids = array("i", [-1]) * hour_slots
+        self.hour_up = array("B", bytes(hour_slots))
+        self.hour_down = array("B", bytes(hour_slots))
+        self.hour_transitions = array("H", [0]) * hour_slots
+        # state of the last heartbeat, for flapping
+        self.last_state = SILENT
+
+
+class HeartbeatSeries:
+    """Per-device minute/hour rings fed by heartbeats, journaled to an append-only file."""
+
+    def __init__(
+        self,
+        path: Optional[str] = SERIES_PATH,
+        minute_slots: int = SERIES_MINUTES,
+        hour_slots: int = SERIES_HOURS,
+        enabled: bool = SERIES_ENABLED,
+    ):
+        self.path = path or None
+        self.minute_slots = max(60, minute_slots)
+        self.hour_slots = max(1, hour_slots)
+        self.enabled = enabled
+        self.samples = 0
+        self.records_written = 0
+        self._devices: Dict[int, _DeviceSeries] = {}
+        self._log = None
+        self._lock_file = None
+        # hour of the last snapshot; a later heartbeat hour rewrites the journal
+        self._journal_hour = 0
+        self._last_flush = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    def bytes(self) -> int:
+        per_device = self.minute_slots * 6 + self.hour_slots * 8
+        return per_device * len(self._devices)
+
+    # ---- rollups ----
+
+    def _series(self, id_objet: int) -> _DeviceSeries:
+        series = self._devices.get(id_objet)
+        if series is None:
+            series = self._devices[id_objet] = _DeviceSeries(self.minute_slots, self.hour_slots)
+        return series
+
+    def _apply(self, series: _DeviceSeries, minute: int, previous: int, state: int, transitions: int):
+        hour = minute // 60
+        slot = hour % self.hour_slots
+        if series.hour_ids[slot] != hour:
+            if series.hour_ids[slot] > hour:
+                return
+            series.hour_ids[slot] = hour
+            series.hour_up[slot] = series.hour_down[slot] = series.hour_transitions[slot] = 0
+        if previous == UP and series.hour_up[slot]:
+            series.hour_up[slot] -= 1
+        elif previous == DOWN and series.hour_down[slot]:
+            series.hour_down[slot] -= 1
+        if state == UP:
+            series.hour_up[slot] += 1
+        elif state == DOWN:
+            series.hour_down[slot] += 1
+        series.hour_transitions[slot] = min(0xFFFF, series.hour_transitions[slot] + transitions)
+
+        slot = minute % self.minute_slots
+        if series.minute_ids[slot] != minute:
+            if series.minute_ids[slot] > minute:
+                return
+            series.minute_ids[slot] = minute
+            series.minute_transitions[slot] = 0
+        series.minute_states[slot] = state
+        series.minute_transitions[slot] = min(0xFF, series.minute_transitions[slot] + transitions)
+
+    def record(self, id_objet: int, seen_at: datetime, statut: Optional[str]) -> bool:
+        """One heartbeat; False when disabled or older than the minute ring."""
+        if not self.enabled:
+            return False
+        minute = minute_of(seen_at)
+        state = state_of(statut)
+        with self._lock:
+            series = self._series(id_objet)
+            slot = minute % self.minute_slots
+            if series.minute_ids[slot] == minute:
+                previous = series.minute_states[slot]
+            elif series.minute_ids[slot] > minute:
+                return False
+            else:
+                previous = SILENT
+            merged = DOWN if DOWN in (state, previous) else UP
+            transitions = 1 if series.last_state not in (SILENT, state) else 0
+            series.last_state = state
+            self.samples += 1
+            if merged == previous and not transitions:
+                return True
+            self._apply(series, minute, previous, merged, transitions)
+            if self._log is not None and minute // 60 > self._journal_hour:
+                self._compact(minute // 60)
+            else:
+                self._append((_DELTA, id_objet, minute, previous, merged, transitions))
+        return True
+
+    def availability(
+        self, id_objet: int, start: datetime, end: datetime, now: Optional[datetime] = None,
+    ) -> Availability:
+        """
+        Up / down / silent minutes over [start, end), from hour rollups plus at most two
+        minute edges. Partly covered minutes count (the current one included).
+        """
+        first, last = minute_of(start), minute_of(end)
+        if end > _EPOCH + timedelta(minutes=last):
+            last += 1
+        if last <= first:
+            raise ValueError("Fenêtre vide")
+        minute_horizon = minute_of(now or datetime.utcnow()) - self.minute_slots + 1
+
+        resolution = "minute"
+        # Edges the minute ring no longer holds are widened to the whole hour
+        if first < minute_horizon and first % 60:
+            first -= first % 60
+            resolution = "hour"
+        if last < minute_horizon and last % 60:
+            last += 60 - last % 60
+            resolution = "hour"
+
+        first_hour, last_hour = -(-first // 60), last // 60
+        if first_hour <= last_hour:
+            hours = range(first_hour, last_hour)
+            edges = [(first, first_hour * 60), (last_hour * 60, last)]
+        else:
+            hours = range(0)
+            edges = [(first, last)]
+
+        up = down = transitions = 0
+        with self._lock:
+            series = self._devices.get(id_objet)
+            if series is not None:
+                for hour in hours:
+                    slot = hour % self.hour_slots
+                    if series.hour_ids[slot] == hour:
+                        up += series.hour_up[slot]
+                        down += series.hour_down[slot]
+                        transitions += series.hour_transitions[slot]
+                for edge_start, edge_end in edges:
+                    for minute in range(edge_start, edge_end):
+                        slot = minute % self.minute_slots
+                        if series.minute_ids[slot] != minute:
+                            continue
+                        state = series.minute_states[slot]
+                        up += state == UP
+                        down += state == DOWN
+                        transitions += series.minute_transitions[slot]
+
+        total = last - first
+        return Availability(
+            window_start=_EPOCH + timedelta(minutes=first),
+            window_end=_EPOCH + timedelta(minutes=last),
+            up_minutes=up,
+            down_minutes=down,
+            silent_minutes=total - up - down,
+            transitions=transitions,
+            resolution=resolution,
+        )
+
+    # ---- journal ----
+
+    def _restore(self, kind: int, id_objet: int, moment: int, first: int, second: int, transitions: int):
+        series = self._series(id_objet)
+        if kind == _DELTA:
+            self._apply(series, moment, first, second, transitions)
+        elif kind == _HOUR:
+            slot = moment % self.hour_slots
+            if series.hour_ids[slot] <= moment:
+                series.hour_ids[slot] = moment
+                series.hour_up[slot], series.hour_down[slot] = first, second
+                series.hour_transitions[slot] = transitions
+        elif kind == _MINUTE:
+            slot = moment % self.minute_slots
+            if series.minute_ids[slot] <= moment:
+                series.minute_ids[slot] = moment
+                series.minute_states[slot] = first
+                series.minute_transitions[slot] = transitions
+
+    def _snapshot(self, current_hour: int) -> List[Record]:
+        """The rings as _HOUR / _MINUTE records, without what is past the retention."""
+        hour_horizon = current_hour - self.hour_slots + 1
+        # the oldest minute still read from the ring at any moment of the current hour
+        minute_horizon = current_hour * 60 - self.minute_slots + 1
+        records: List[Record] = []
+        for id_objet, series in self._devices.items():
+            for slot, hour in enumerate(series.hour_ids):
+                if hour >= hour_horizon and (series.hour_up[slot] or series.hour_down[slot] or series.hour_transitions[slot]):
+                    records.append((
+                        _HOUR, id_objet, hour,
+                        series.hour_up[slot], series.hour_down[slot], series.hour_transitions[slot],
+                    ))
+            for slot, minute in enumerate(series.minute_ids):
+                if minute >= minute_horizon and (series.minute_states[slot] or series.minute_transitions[slot]):
+                    records.append((
+                        _MINUTE, id_objet, minute, series.minute_states[slot], 0, series.minute_transitions[slot],
+                    ))
+        return records
+
+    def _compact(self, current_hour: int):
+        """Rewrite the journal as a snapshot of the rings (lock held): closed hours replace their minutes."""
+        if self._log is not None:
+            self._log.close()
+        temporary = self.path + ".tmp"
+        with open(temporary, "wb") as handle:
+            handle.write(_HEADER.pack(MAGIC, FORMAT_VERSION))
+            for record in self._snapshot(current_hour):
+                handle.write(_RECORD.pack(*record))
+        os.replace(temporary, self.path)
+        self._log = open(self.path, "ab")
+        self._journal_hour = current_hour
+        self._last_flush = time.monotonic()
+
+    def _append(self, record: Record):
+        if self._log is None:
+            return
+        self._log.write(_RECORD.pack(*record))
+        self.records_written += 1
+        if time.monotonic() - self._last_flush >= SERIES_FLUSH_SECONDS:
+            self._log.flush()
+            self._last_flush = time.monotonic()
+
+    def _read(self) -> Optional[List[Record]]:
+        """Journal records, [] without a journal, None when the file is not a series journal."""
+        try:
+            with open(self.path, "rb") as handle:
+                data = handle.read()
+        except FileNotFoundError:
+            return []
+        if len(data) < _HEADER.size:
+            return None
+        magic, version = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version not in (1, FORMAT_VERSION):
+            return None
+        record = _RECORD if version == FORMAT_VERSION else _RECORD_V1
+        # A torn last record (crash mid-write) is dropped
+        end = _HEADER.size + (len(data) - _HEADER.size) // record.size * record.size
+        records = record.iter_unpack(data[_HEADER.size:end])
+        if version == 1:
+            return [(_DELTA,) + values for values in records]
+        return list(records)
+
+    def _acquire(self) -> bool:
+        """Exclusive lock on the journal, held until close(); False when another process has it."""
+        if fcntl is None:
+            return True
+        lock_file = open(self.path + ".lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def open(self, now: Optional[datetime] = None):
+        """Take the journal, replay it, rewrite it as a snapshot of the rings, then keep appending."""
+        if not self.enabled or not self.path or self._log is not None:
+            return
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            if not self._acquire():
+                print(f"⚠️ {self.path} est tenu par un autre processus : historique de ce worker en mémoire seulement.")
+                return
+            records = self._read()
+            if records is None:
+                print(f"⚠️ {self.path} n'est pas un historique de heartbeats : il est mis de côté.")
+                os.replace(self.path, self.path + ".invalide")
+                records = []
+
+            current_hour = minute_of(now or datetime.utcnow()) // 60
+            hour_horizon = current_hour - self.hour_slots + 1
+            for record in records:
+                hour = record[2] if record[0] == _HOUR else record[2] // 60
+                if hour >= hour_horizon:
+                    self._restore(*record)
+            self._compact(current_hour)
+
+    def close(self):
+        with self._lock:
+            log, self._log = self._log, None
+            if log is not None:
+                log.close()
+            lock_file, self._lock_file = self._lock_file, None
+            if lock_file is not None:
+                lock_file.close()
+
+
+series = HeartbeatSeries()
+
+metrics_registry.gauge("iot_series_devices", "Objets suivis par l'historique des heartbeats", lambda: len(series))
+metrics_registry.gauge("iot_series_bytes", "Mémoire des anneaux minutes / heures", series.bytes)
+metrics_registry.callback_counter(
+    "iot_series_samples_total",
+    "Heartbeats versés à l'historique",
+    lambda: series.samples,
+)
+metrics_registry.callback_counter(
+    "iot_series_records_total",
+    "Enregistrements ajoutés au journal de l'historique",
+    lambda: series.records_written,
+)
@@ -0,0 +1,295 @@
+"""
+Table lemme / mot vide compacte, exportée hors ligne depuis spaCy.
+
+Au moment de la requête, `_extract_tokens` y lit lemmes et drapeaux (mot vide,
+nombre) sans importer spaCy : fichier trié mappé en mémoire, recherche
+dichotomique, quelques microsecondes par mot.
+
+Le fichier n'est pas versionné : il se construit au déploiement (spaCy et le
+modèle de requirements.txt requis, ~2 min) puis est comparé à la somme SHA-256
+versionnée dans data/lemmas_fr.bin.sha256 (spacy 3.8, fr_core_news_sm 3.8.0) :
+
+    python lemma_table.py            # construit et vérifie, code 1 si la somme diffère
+    python lemma_table.py --update-checksum   # après un changement de modèle / vocabulaire
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "lemmas_fr.bin")
+CHECKSUM_SUFFIX = ".sha256"
+
+MAGIC = b"LEMT"
+FORMAT_VERSION = 1
+# magic, version, count, key blob size, lemma blob size
+_HEADER = struct.Struct("<4sIIII")
+
+FLAG_STOP = 1
+FLAG_NUM = 2
+
+# Élisions gardées comme clés ("d'", "qu'") : une fois l'apostrophe retirée, "d" n'est plus un mot vide
+ELISION = re.compile(r"^(?:qu|[cdjlmnst])['’]$")
+
+Entry = Tuple[str, int]
+
+
+class LemmaTable:
+    """
+    Lecture seule d'une table construite par `write_table`.
+
+    Seules les formes dont le lemme diffère, ou qui sont des mots vides /
+    nombres, y figurent : un mot absent est son propre lemme.
+    """
+
+    def __init__(self, path: str, memo_size: int = 16384):
+        self.path = path
+        with open(path, "rb") as handle:
+            self._mm = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, key_size, lemma_size = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._mm.close()
+            raise ValueError(f"{path}: table de lemmes invalide")
+
+        self._view = view = memoryview(self._mm)
+        offset = _HEADER.size
+        self._key_offsets = _uint32_view(view, offset, count + 1)
+        offset += 4 * (count + 1)
+        self._lemma_offsets = _uint32_view(view, offset, count + 1)
+        offset += 4 * (count + 1)
+        self._flags = view[offset:offset + count]
+        offset += count
+        self._key_base = offset
+        self._lemma_base = offset + key_size
+        self._count = count
+        self.size_bytes = self._lemma_base + lemma_size
+
+        self.lookup = lru_cache(maxsize=memo_size)(self._lookup)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self):
+        self.lookup.cache_clear()
+        for view in (self._key_offsets, self._lemma_offsets, self._flags, self._view):
+            if isinstance(view, memoryview):
+                view.release()
+        self._mm.close()
+
+    def _key_at(self, index: int) -> bytes:
+        return self._mm[self._key_base + self._key_offsets[index]:self._key_base + self._key_offsets[index + 1]]
+
+    def _lookup(self, word: str) -> Optional[Entry]:
+        key = word.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo >= self._count or self._key_at(lo) != key:
+            return None
+
+        start = self._lemma_base + self._lemma_offsets[lo]
+        end = self._lemma_base + self._lemma_offsets[lo + 1]
+        lemma = self._mm[start:end].decode("utf-8") if end > start else word
+        return lemma, self._flags[lo]
+
+
+def _uint32_view(view: memoryview, offset: int, count: int):
+    chunk = view[offset:offset + 4 * count]
+    if sys.byteorder == "little":
+        return chunk.cast("I")
+    values = array("I", chunk.tobytes())
+    values.byteswap()
+    return values
+
+
+def write_table(path: str, entries: Dict[str, Entry]):
+    keys = sorted(entries, key=lambda key: key.encode("utf-8"))
+    key_offsets = array("I", [0])
+    lemma_offsets = array("I", [0])
+    flags = bytearray()
+    key_blob = bytearray()
+    lemma_blob = bytearray()
+
+    for key in keys:
+        lemma, flag = entries[key]
+        key_blob += key.encode("utf-8")
+        if lemma != key:
+            lemma_blob += lemma.encode("utf-8")
+        key_offsets.append(len(key_blob))
+        lemma_offsets.append(len(lemma_blob))
+        flags.append(flag)
+
+    if sys.byteorder != "little":
+        key_offsets.byteswap()
+        lemma_offsets.byteswap()
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "wb") as handle:
+        handle.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(keys), len(key_blob), len(lemma_blob)))
+        handle.write(key_offsets.tobytes())
+        handle.write(lemma_offsets.tobytes())
+        handle.write(bytes(flags))
+        handle.write(bytes(key_blob))
+        handle.write(bytes(lemma_blob))
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_checksum(path: str) -> Optional[str]:
+    """Somme attendue pour `path`, lue dans `path`.sha256 (format sha256sum)."""
+    try:
+        with open(path + CHECKSUM_SUFFIX, encoding="ascii") as handle:
+            return handle.read().split()[0]
+    except (OSError, IndexError):
+        return None
+
+
+def write_checksum(path: str, digest: str):
+    with open(path + CHECKSUM_SUFFIX, "w", encoding="ascii") as handle:
+        handle.write(f"{digest}  {os.path.basename(path)}\n")
+
+
+# --- Construction hors ligne (spaCy requis) ---
+
+QUERY_PREFIXES = [
+    "", "je cherche", "je veux", "je voudrais", "il me faut", "j'ai besoin d'", "où est", "où sont",
+    "trouver", "montre moi", "est-ce qu'il y a", "y a-t-il", "je dois utiliser", "on cherche",
+    "besoin de", "je souhaite réserver", "réserver",
+]
+QUERY_OBJECTS = [
+    "{w}", "un {w}", "une {w}", "le {w}", "la {w}", "l'{w}", "les {w}", "des {w}", "mon {w}", "{w}s",
+]
+QUERY_SUFFIXES = [
+    "", "disponible", "libre", "au deuxième étage", "au premier étage", "en panne", "dans la salle",
+    "pour imprimer", "pour scanner un document", "couleur", "près de moi", "qui marche", "occupé",
+    "pour la réunion", "dans le bâtiment", "hors service",
+]
+
+
+def _template_queries(domain_words: Iterable[str]) -> List[str]:
+    # Every (word, article, prefix) pair, suffixes cycled: ~10k sentences instead of the full product
+    queries = []
+    position = 0
+    for word in domain_words:
+        for obj in QUERY_OBJECTS:
+            for prefix in QUERY_PREFIXES:
+                suffix = QUERY_SUFFIXES[position % len(QUERY_SUFFIXES)]
+                position += 1
+                queries.append(" ".join(part for part in (prefix, obj.format(w=word), suffix) if part))
+    return queries
+
+
+def build_entries(nlp, vocabulary: Iterable[str], queries: Iterable[str], split_words) -> Dict[str, Entry]:
+    """
+    Lemme et drapeaux retenus par forme normalisée : vote majoritaire entre le
+    mot isolé (poids 1) et ses occurrences en contexte de requête (poids 3).
+    """
+    votes: Dict[str, Counter] = defaultdict(Counter)
+    exact_stops = set()
+
+    def observe(docs, weight: int):
+        for doc in docs:
+            for token in doc:
+                if token.is_space or token.is_punct:
+                    continue
+                text = token.text.lower()
+                words = split_words(text)
+                if len(words) != 1:
+                    continue
+                key = words[0] + "'" if ELISION.match(text) else words[0]
+                flag = (FLAG_NUM if token.like_num else 0) | (FLAG_STOP if token.is_stop else 0)
+                lemma = " ".join(split_words((token.lemma_ or token.text).lower().strip())) or words[0]
+                # "mes" must outvote "mès"/"més", which fold to the same key
+                votes[key][(lemma, flag)] += weight * (2 if text == key else 1)
+                if text == key and token.is_stop:
+                    exact_stops.add(key)
+
+    observe(nlp.pipe(vocabulary, batch_size=2000), 1)
+    observe(nlp.pipe(queries, batch_size=500), 3)
+
+    entries: Dict[str, Entry] = {}
+    for key, counter in votes.items():
+        lemma, flag = counter.most_common(1)[0][0]
+        if key in exact_stops:
+            # "ne" stays a stop word even when "né" -> "naître" is seen more often
+            flag |= FLAG_STOP
+        if lemma != key or flag:
+            entries[key] = (lemma, flag)
+    return entries
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Exporte la table lemme / mot vide utilisée par la recherche")
+    parser.add_argument("--output", default=DEFAULT_TABLE_PATH)
+    parser.add_argument("--model", default=None)
+    parser.add_argument(
+        "--update-checksum", action="store_true",
+        help="réécrit <output>.sha256 au lieu de vérifier la table construite",
+    )
+    args = parser.parse_args(argv)
+
+    import spacy
+
+    import search_engine
+
+    model = args.model or search_engine.SPACY_MODEL
+    nlp = spacy.load(model, exclude=search_engine.SPACY_EXCLUDED_COMPONENTS)
+
+    word_pattern = re.compile(r"[a-zà-ÿœæ'’-]{1,30}")
+    vocabulary = {text for text in nlp.vocab.strings if word_pattern.fullmatch(text)}
+    vocabulary.update(nlp.Defaults.stop_words)
+    domain_words = set()
+    for canonical, aliases in search_engine.TYPE_KEYWORDS.items():
+        domain_words.add(canonical.lower())
+        domain_words.update(alias.lower() for alias in aliases)
+    for keywords in search_engine.STATUS_KEYWORDS.values():
+        vocabulary.update(keywords)
+    vocabulary.update(search_engine.NOISE_TERMS)
+    vocabulary.update(domain_words)
+
+    queries = _template_queries(sorted(word for word in domain_words if " " not in word))
+    entries = build_entries(nlp, sorted(vocabulary), queries, search_engine._split_words)
+    write_table(args.output, entries)
+
+    table = LemmaTable(args.output)
+    print(f"{len(table)} formes ({len(vocabulary)} mots, {len(queries)} requêtes modèles) -> "
+          f"{args.output} ({table.size_bytes / 1024:.0f} Ko, modèle {model})")
+    table.close()
+
+    digest = file_sha256(args.output)
+    if args.update_checksum:
+        write_checksum(args.output, digest)
+        print(f"sha256 {digest} -> {args.output}{CHECKSUM_SUFFIX}")
+        return 0
+
+    expected = read_checksum(args.output)
+    if expected is None:
+        print(f"⚠️ Pas de somme de contrôle pour {args.output} (--update-checksum pour l'enregistrer)")
+        return 0
+    if digest != expected:
+        print(f"⚠️ Table non reproduite : sha256 {digest}, attendu {expected} (version de spaCy / du modèle ?)")
+        return 1
+    print(f"sha256 conforme ({digest})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Write-behind des champs de vie des heartbeats (last_heartbeat, ip_adress).
+
+Un heartbeat qui ne change ni le statut ni l'IP et ne crée pas d'alerte n'est
+plus écrit tout de suite : il est gardé en mémoire (le plus récent par objet)
+puis écrit avec les autres en un UPDATE groupé toutes les
+IOT_LIVENESS_FLUSH_SECONDS secondes, ou plus tôt si le tampon dépasse
+IOT_LIVENESS_MAX_PENDING entrées. Les transitions de statut restent écrites
+immédiatement ; le tampon est vidé à l'arrêt de l'application.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, or_, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+from metrics import registry
+
+LIVENESS_WRITE_BEHIND = os.getenv("IOT_LIVENESS_WRITE_BEHIND", "1").lower() not in {"0", "false", "no"}
+LIVENESS_FLUSH_SECONDS = float(os.getenv("IOT_LIVENESS_FLUSH_SECONDS", "5"))
+LIVENESS_MAX_PENDING = int(os.getenv("IOT_LIVENESS_MAX_PENDING", "10000"))
+
+# Core executemany on the table; never moves last_heartbeat backwards (an immediate
+# write may have landed after the buffered one)
+_objets = models.Objet.__table__
+_FLUSH_STATEMENT = (
+    update(_objets)
+    .where(_objets.c.id_objet == bindparam("b_id_objet"))
+    .where(or_(_objets.c.last_heartbeat.is_(None), _objets.c.last_heartbeat < bindparam("b_seen_at")))
+    .values(last_heartbeat=bindparam("b_seen_at"), ip_adress=bindparam("b_ip_adress"))
+)
+
+
+class LivenessBuffer:
+    """Latest (seen_at, ip) per object, flushed in one executemany UPDATE."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        flush_seconds: float = LIVENESS_FLUSH_SECONDS,
+        max_pending: int = LIVENESS_MAX_PENDING,
+        enabled: bool = LIVENESS_WRITE_BEHIND,
+    ):
+        self.session_factory = session_factory
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.enabled = enabled
+        self.flushed = 0
+        self.failed_flushes = 0
+        self.last_flush_seconds = 0.0
+        self._pending: Dict[int, Tuple[datetime, Optional[str]]] = {}
+        # monotonic time of the oldest entry still pending
+        self._oldest: Optional[float] = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record(self, id_objet: int, seen_at: datetime, ip_adress: Optional[str]):
+        with self._lock:
+            current = self._pending.get(id_objet)
+            if current is None or current[0] <= seen_at:
+                self._pending[id_objet] = (seen_at, ip_adress)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def discard(self, id_objet: int):
+        """Drop a pending entry superseded by an immediate write."""
+        with self._lock:
+            self._pending.pop(id_objet, None)
+            if not self._pending:
+                self._oldest = None
+
+    def pending_seen_at(self, id_objet: int) -> Optional[datetime]:
+        entry = self._pending.get(id_objet)
+        return entry[0] if entry else None
+
+    def lag_seconds(self) -> float:
+        """Age of the oldest liveness update not yet in the database."""
+        oldest = self._oldest
+        return time.monotonic() - oldest if oldest is not None else 0.0
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                oldest, self._oldest = self._oldest, None
+            if not pending:
+                return 0
+
+            started = time.perf_counter()
+            db = self.session_factory()
+            try:
+                db.execute(_FLUSH_STATEMENT, [
+                    {"b_id_objet": id_objet, "b_seen_at": seen_at, "b_ip_adress": ip_adress}
+                    for id_objet, (seen_at, ip_adress) in pending.items()
+                ])
+                db.commit()
+            except SQLAlchemyError as exc:
+                db.rollback()
+                self.failed_flushes += 1
+                print(f"⚠️ Écriture des heartbeats en attente impossible ({exc}). Nouvel essai au prochain cycle.")
+                self._restore(pending, oldest)
+                return 0
+            finally:
+                db.close()
+
+            self.last_flush_seconds = time.perf_counter() - started
+            self.flushed += len(pending)
+            return len(pending)
+
+    def _restore(self, pending: Dict[int, Tuple[datetime, Optional[str]]], oldest: Optional[float]):
+        with self._lock:
+            for id_objet, entry in pending.items():
+                current = self._pending.get(id_objet)
+                if current is None or current[0] < entry[0]:
+                    self._pending[id_objet] = entry
+            if oldest is not None and (self._oldest is None or oldest < self._oldest):
+                self._oldest = oldest
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="liveness-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flush thread and write whatever is still pending."""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            thread.join()
+        self.flush()
+
+
+buffer = LivenessBuffer(SessionLocal)
+
+registry.gauge("iot_liveness_pending", "Heartbeats (objets) en attente d'écriture", lambda: len(buffer))
+registry.gauge(
+    "iot_liveness_flush_lag_seconds",
+    "Âge du plus ancien heartbeat en attente d'écriture",
+    buffer.lag_seconds,
+)
+registry.callback_counter(
+    "iot_liveness_flushed_total",
+    "Mises à jour de vie écrites par le write-behind",
+    lambda: buffer.flushed,
+)
+registry.callback_counter(
+    "iot_liveness_flush_failures_total",
+    "Écritures groupées des heartbeats en échec",
+    lambda: buffer.failed_flushes,
+)
+registry.gauge(
+    "iot_liveness_last_flush_seconds",
+    "Durée de la dernière écriture groupée",
+    lambda: buffer.last_flush_seconds,
+)
@@ -1,18 +1,56 @@
-from fastapi import FastAPI, Depends, HTTPException, Request, Query, status, Body
+from fastapi import FastAPI, Depends, HTTPException, Request, Query, status, Body, Response
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List, Optional
+from contextlib import asynccontextmanager
 from database import engine as db_engine, get_db, Base
 import models, schemas, auth
 from fastapi.security import OAuth2PasswordRequestForm
-from datetime import datetime
-from search_engine import engine as search_engine
+from datetime import datetime, timedelta
+from search_engine import engine as search_engine, decode_search_cursor, encode_search_cursor, search_fingerprint
+import metrics
+from migrations import run_migrations
+from spatial_index import Origin
+from heartbeat_ingest import HEARTBEAT_BATCH_MAX, HEARTBEAT_WRITE_ATTEMPTS, ingest_heartbeats, write_transitions
+from heartbeat_rules import STATUT_HORS_LIGNE, apply_heartbeat, needs_open_alerts
+from device_registry import devices as device_registry
+from liveness_buffer import buffer as liveness_buffer
+from offline_sweeper import sweeper as offline_sweeper
+from heartbeat_series import SERIES_HOURS, series as heartbeat_series
 from fastapi.middleware.cors import CORSMiddleware
 
 # Création des tables
 Base.metadata.create_all(bind=db_engine)
+# Colonnes / index / triggers ajoutés sur des tables existantes
+run_migrations(db_engine)
 
-app = FastAPI(title="SmartFind API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Écriture différée des heartbeats : thread de flush, puis vidage du tampon à l'arrêt
+    liveness_buffer.start()
+    # Objets muets passés Hors ligne
+    offline_sweeper.start()
+    # Historique de disponibilité : rejeu du journal, puis ajout
+    heartbeat_series.open()
+    try:
+        yield
+    finally:
+        offline_sweeper.stop()
+        liveness_buffer.stop()
+        heartbeat_series.close()
+
+
+app = FastAPI(title="SmartFind API", lifespan=lifespan)
+
+
+def _notify_status_change(objet_id: int, statut: Optional[str]):
+    # Statut écrit en base : index de recherche et registre des heartbeats
+    search_engine.objet_status_changed(objet_id, statut)
+    device_registry.set_statut(objet_id, statut)
+
+
+offline_sweeper.on_status_change = _notify_status_change
 
 # --- CONFIGURATION DU CORS (LIAISON FRONT-BACK) ---
 origins = [
@@ -28,6 +66,7 @@ app.add_middleware(
     allow_credentials=True,     # Autoriser les cookies/tokens ? OUI
     allow_methods=["*"],        # Autoriser GET, POST, PUT, DELETE...
     allow_headers=["*"],        # Autoriser tous les headers
+    expose_headers=["X-Total-Count", "X-Total-Count-Estimated", "X-Next-Cursor", "Server-Timing"],
 )
 
 # --- DEPENDANCES DE SECURITE ---
@@ -138,6 +177,9 @@ def create_objet(
     db.add(db_objet)
     db.commit()
     db.refresh(db_objet)
+    search_engine.bump_data_version()
+    search_engine.refresh_objet(db_objet)
+    device_registry.upsert_objet(db_objet.id_objet, db_objet.mac_adresse, db_objet.statut, db_objet.ip_adress)
     return db_objet
 
 # 2. LECTURE D'UN OBJET
@@ -148,6 +190,37 @@ def get_objet(objet_id: int, db: Session = Depends(get_db), current_user: models
         raise HTTPException(404, "Objet introuvable")
     return objet
 
+# 2 bis. DISPONIBILITÉ (historique des heartbeats, sans lecture d'échantillons)
+@app.get("/objets/{objet_id}/availability")
+def get_objet_availability(
+    objet_id: int,
+    hours: float = Query(24, gt=0, le=SERIES_HOURS),
+    current_user: models.Utilisateur = Depends(get_current_admin),
+    db: Session = Depends(get_db),
+):
+    """
+    Part du temps où l'objet a envoyé des heartbeats sans être en panne, sur les
+    `hours` dernières heures. Une minute sans heartbeat compte comme muette ;
+    `transitions` compte les passages en service <-> en panne (instabilité).
+    """
+    objet = db.query(models.Objet).filter(models.Objet.id_objet == objet_id).first()
+    if not objet:
+        raise HTTPException(404, "Objet introuvable")
+
+    maintenant = datetime.utcnow()
+    window = heartbeat_series.availability(objet_id, maintenant - timedelta(hours=hours), maintenant, now=maintenant)
+    return {
+        "id_objet": objet_id,
+        "window_start": window.window_start,
+        "window_end": window.window_end,
+        "availability_pct": window.availability_pct,
+        "up_minutes": window.up_minutes,
+        "down_minutes": window.down_minutes,
+        "silent_minutes": window.silent_minutes,
+        "transitions": window.transitions,
+        "resolution": window.resolution,
+    }
+
 # 3. MODIFICATION D'OBJET
 @app.put("/objets/{objet_id}", response_model=schemas.ObjetResponse)
 def update_objet(objet_id: int, update_data: schemas.ObjetUpdate, current_user: models.Utilisateur = Depends(get_current_admin), db: Session = Depends(get_db)):
@@ -160,6 +233,9 @@ def update_objet(objet_id: int, update_data: schemas.ObjetUpdate, current_user:
     
     db.commit()
     db.refresh(objet)
+    search_engine.bump_data_version()
+    search_engine.refresh_objet(objet)
+    device_registry.upsert_objet(objet.id_objet, objet.mac_adresse, objet.statut, objet.ip_adress)
     return objet
 
 # 3. SUPPRESSION D'OBJET
@@ -169,12 +245,30 @@ def delete_objet(objet_id: int, current_user: models.Utilisateur = Depends(get_c
     if not objet: raise HTTPException(404, "Objet introuvable")
     db.delete(objet)
     db.commit()
+    search_engine.bump_data_version()
+    search_engine.forget_objet(objet_id)
+    device_registry.forget_objet(objet_id)
     return {"message": "Objet supprimé avec succès"}
 # ==========================================
 # 3. RECHERCHE & CONSULTATION
 # ==========================================
+def get_search_origin(
+    origin_salle: Optional[int] = None,
+    origin_x: Optional[float] = None,
+    origin_y: Optional[float] = None,
+    origin_etage: Optional[int] = None,
+    db: Session = Depends(get_db),
+) -> Optional[Origin]:
+    # Position de l'utilisateur (salle ou x/y + étage) ; sans paramètre, l'origine historique (0, 0)
+    try:
+        return search_engine.resolve_origin(db, origin_salle, origin_x, origin_y, origin_etage)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
 @app.get("/search", response_model=List[schemas.ObjetResponse])
 def search_global(
+    response: Response,
     q: Optional[str] = None,
     etage: Optional[int] = None, salle: Optional[int] = None,
     type: Optional[str] = None, marque: Optional[str] = None,
@@ -182,9 +276,25 @@ def search_global(
     distance: bool = False,
     distance_max: Optional[float] = None,
     save_history: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    origin: Optional[Origin] = Depends(get_search_origin),
     db: Session = Depends(get_db),
     current_user: Optional[models.Utilisateur] = Depends(auth.get_current_user_optional)
 ):
+    # Curseur opaque lié à la recherche : il remplace offset pour la page suivante
+    fingerprint = search_fingerprint({
+        "q": (q or "").strip(), "etage": etage, "salle": salle, "type": type, "marque": marque,
+        "statut": statut, "fonction": fonction, "distance": distance, "distance_max": distance_max,
+        "origin": tuple(origin) if origin else None,
+    })
+    if cursor:
+        try:
+            offset = decode_search_cursor(cursor, fingerprint)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
     # Save history once for explicit search click; ignore accidental duplicate requests.
     if current_user and save_history and q and q.strip():
         query_text = q.strip()
@@ -205,7 +315,8 @@ def search_global(
             db.add(hist)
             db.commit()
 
-    return search_engine.search(
+    timer = metrics.new_timer("search")
+    page = search_engine.search_page(
         db=db,
         query=q,
         filtre_etage_id=etage,
@@ -216,22 +327,45 @@ def search_global(
         filtre_fonction=fonction,
         sort_by_distance=distance,
         max_distance=distance_max,
+        origin=origin,
+        limit=limit,
+        offset=offset,
+        timer=timer,
     )
+    if timer.enabled:
+        response.headers["Server-Timing"] = timer.server_timing()
+    # Liste brute conservée pour le front ; total (estimé si élagage top-k) et page suivante en en-têtes
+    response.headers["X-Total-Count"] = str(page.total)
+    if not page.exact:
+        response.headers["X-Total-Count-Estimated"] = "1"
+    if page.next_offset is not None:
+        response.headers["X-Next-Cursor"] = encode_search_cursor(page.next_offset, fingerprint)
+    return page.items
 
 
 @app.get("/search/suggest")
 def search_suggest(
+    response: Response,
     q: str = Query(..., min_length=1),
     limit: int = Query(8, ge=1, le=20),
     db: Session = Depends(get_db),
 ):
-    return {
-        "suggestions": search_engine.suggest(
-            db=db,
-            query=q,
-            limit=limit,
-        )
-    }
+    timer = metrics.new_timer("suggest")
+    suggestions = search_engine.suggest(
+        db=db,
+        query=q,
+        limit=limit,
+        timer=timer,
+    )
+    if timer.enabled:
+        response.headers["Server-Timing"] = timer.server_timing()
+    return {"suggestions": suggestions}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    # Histogrammes par étape au format texte Prometheus
+    return metrics.registry.render()
 
 
 @app.get("/search/filters")
@@ -341,6 +475,9 @@ def actionner_objet(objet_id: int, action: str = Query(..., description="imprime
     if objet.statut == "Panne":
         raise HTTPException(400, "Objet en panne, impossible d'actionner")
 
+    if objet.statut == STATUT_HORS_LIGNE:
+        raise HTTPException(400, "Objet hors ligne, impossible d'actionner")
+
     return {"message": f"Action '{action}' envoyée à {objet.nom_model} (IP: {objet.ip_adress})"}
 
 
@@ -393,6 +530,7 @@ def resolve_alerte(
     if not alerte: raise HTTPException(404, "Alerte introuvable")
     
     # 1. On marque l'alerte comme traitée
+    etait_ouverte = not alerte.est_resolu
     alerte.est_resolu = True
     
     # 2. On applique la décision de l'admin sur l'objet
@@ -407,6 +545,10 @@ def resolve_alerte(
              alerte.objet.description = f"EN PANNE (Confirmé par Admin via alerte #{alerte_id})"
 
     db.commit()
+    if etait_ouverte:
+        device_registry.alert_resolved(alerte.id_objet, alerte.source, alerte.niveau)
+    if alerte.objet:
+        _notify_status_change(alerte.objet.id_objet, alerte.objet.statut)
     return {"message": f"Alerte résolue. L'objet est maintenant '{nouveau_statut_objet}'"}
 
 
@@ -436,6 +578,8 @@ def signaler_probleme(
     
     db.add(new_alerte)
     db.commit()
+    device_registry.alert_opened(objet_id, new_alerte.source, new_alerte.niveau)
+    _notify_status_change(objet.id_objet, objet.statut)
     
     return {"message": "Problème signalé. L'objet est en attente de vérification."}
 # ==========================================
@@ -449,77 +593,87 @@ def receive_heartbeat(
 ):
     """
     Reçoit le signal de vie des objets connectés.
-    Gère intelligemment les pannes et les rétablissements.
+    Gère intelligemment les pannes et les rétablissements (règles : heartbeat_rules).
     """
-    # 1. Identifier l'objet
-    objet = db.query(models.Objet).filter(models.Objet.mac_adresse == heartbeat.mac_adresse).first()
-    if not objet: 
+    # 1. Identifier l'objet (registre mémoire, base seulement pour une MAC absente)
+    device = device_registry.lookup(db, heartbeat.mac_adresse)
+    if not device: 
         raise HTTPException(404, "Objet inconnu (MAC non reconnue)")
-    
-    # 2. Mise à jour technique (IP et Date)
-    objet.ip_adress = request.client.host
-    objet.last_heartbeat = datetime.utcnow()
-
-    # 3. INTELLIGENCE DES STATUTS
-    # On définit des listes de mots-clés que l'IoT pourrait envoyer
-    status_critique = ["Critical", "Panne", "Erreur", "Surchauffe", "Error"]
-    status_warning = ["Warning", "Low Battery", "Papier Bas", "Maintenance"]
-    status_ok = ["OK", "Available", "Ready", "Disponible"]
-
-    # CAS A : PROBLÈME GRAVE (Le capteur ne ment pas -> On met en Panne direct)
-    if heartbeat.statut in status_critique:
-        objet.statut = "Panne"
-        
-        # Création d'alerte si pas déjà existante
-        alerte_existante = db.query(models.Alerte).filter(
-            models.Alerte.id_objet == objet.id_objet,
-            models.Alerte.est_resolu == False,
-            models.Alerte.source == "IoT"
-        ).first()
-        
-        if not alerte_existante:
-            new_alerte = models.Alerte(
-                message=f"ALERTE CRITIQUE AUTO : {heartbeat.statut}",
-                niveau="Critical",
-                source="IoT",
-                id_objet=objet.id_objet
-            )
-            db.add(new_alerte)
 
-    # CAS B : AVERTISSEMENT (On met en Signalé/Orange)
-    elif heartbeat.statut in status_warning:
-        # On ne change le statut que s'il n'est pas déjà en Panne
-        if objet.statut != "Panne":
-            objet.statut = "Signalé"
-            
-        # On crée une alerte de niveau Warning
-        alerte_existante = db.query(models.Alerte).filter(
-            models.Alerte.id_objet == objet.id_objet,
-            models.Alerte.message.contains("Warning"), # Simple vérif pour éviter doublon
-            models.Alerte.est_resolu == False
-        ).first()
-
-        if not alerte_existante:
-            new_alerte = models.Alerte(
-                message=f"Maintenance requise : {heartbeat.statut}",
-                niveau="Warning",
-                source="IoT",
-                id_objet=objet.id_objet
-            )
-            db.add(new_alerte)
-
-    # CAS C : TOUT VA BIEN (Auto-Réparation)
-    elif heartbeat.statut in status_ok:
-        # Si l'objet était en Panne ou Signalé, on le remet en Disponible
-        if objet.statut in ["Panne", "Signalé"]:
-            objet.statut = "Disponible"
-            # (Optionnel : On pourrait aussi clore les alertes automatiquement ici)
-        
-        # NOTE IMPORTANTE : Si le statut est "Occupé" (Réservé), ON NE TOUCHE PAS.
-        # Ce n'est pas parce que l'imprimante marche qu'elle n'est pas réservée.
+    # IP de l'appelant : seul le lot d'une passerelle (/iot/heartbeats) peut en fournir une autre
+    ip_adress = request.client.host
+    maintenant = datetime.utcnow()
+
+    # 2. Statut et alerte éventuelle (les alertes ouvertes ne sont lues que si la règle en a besoin).
+    #    L'écriture est compare-and-set : si le statut a changé derrière le registre (autre
+    #    worker, balayage hors ligne), l'objet est relu et la règle rejouée.
+    for _ in range(HEARTBEAT_WRITE_ATTEMPTS):
+        open_alerts = []
+        if needs_open_alerts(heartbeat.statut):
+            open_alerts = device_registry.open_alerts(db, device.id_objet)
+        outcome = apply_heartbeat(device.statut, heartbeat.statut, open_alerts)
+
+        # 3. Simple signe de vie : écriture différée (write-behind), pas de commit ici
+        if liveness_buffer.enabled and outcome.statut == device.statut and ip_adress == device.ip_adress and not outcome.alerte:
+            heartbeat_series.record(device.id_objet, maintenant, outcome.statut)
+            liveness_buffer.record(device.id_objet, maintenant, ip_adress)
+            return {"status": "ok", "message": f"Heartbeat traité. Statut actuel : {device.statut}"}
+
+        # 4. Transition : écrite tout de suite (IP, date, statut), si le statut lu est toujours le bon
+        if write_transitions(db, [(device.id_objet, device.statut, outcome.statut, ip_adress, maintenant)]):
+            break
+        device = device_registry.refresh_many(db, [heartbeat.mac_adresse]).get(heartbeat.mac_adresse)
+        if not device:
+            raise HTTPException(404, "Objet inconnu (MAC non reconnue)")
+    else:
+        raise HTTPException(409, "Statut de l'objet modifié pendant le heartbeat, à renvoyer")
+
+    heartbeat_series.record(device.id_objet, maintenant, outcome.statut)
+    liveness_buffer.discard(device.id_objet)
+    if outcome.alerte:
+        db.add(models.Alerte(
+            message=outcome.alerte.message,
+            niveau=outcome.alerte.niveau,
+            source=outcome.alerte.source,
+            id_objet=device.id_objet,
+        ))
 
     db.commit()
-    return {"status": "ok", "message": f"Heartbeat traité. Statut actuel : {objet.statut}"}
+    device_registry.set_state(device.id_objet, outcome.statut, ip_adress)
+    if outcome.alerte:
+        device_registry.alert_opened(device.id_objet, outcome.alerte.source, outcome.alerte.niveau)
+    if outcome.statut != device.statut or ip_adress != device.ip_adress:
+        search_engine.objet_status_changed(device.id_objet, outcome.statut)
+    return {"status": "ok", "message": f"Heartbeat traité. Statut actuel : {outcome.statut}"}
+
+
+@app.post("/iot/heartbeats")
+def receive_heartbeats(
+    heartbeats: List[schemas.HeartbeatSchema],
+    request: Request,
+    compact: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    Lot de heartbeats (passerelle IoT) : mêmes règles que /iot/heartbeat, une seule transaction.
+    Les MAC inconnues sont listées sans faire échouer le lot ; `ip_adress` de chaque entrée
+    remplace l'IP de l'appelant. `compact=true` ne renvoie que les compteurs.
+    """
+    if len(heartbeats) > HEARTBEAT_BATCH_MAX:
+        raise HTTPException(413, f"Lot limité à {HEARTBEAT_BATCH_MAX} heartbeats")
+
+    result = ingest_heartbeats(
+        db, heartbeats, request.client.host,
+        liveness=liveness_buffer, registry=device_registry, series=heartbeat_series,
+    )
+    for objet_id, statut in result.changed:
+        search_engine.objet_status_changed(objet_id, statut)
+
+    response = {"status": "ok", "processed": result.processed, "unknown": len(result.unknown)}
+    if not compact:
+        response["unknown_macs"] = result.unknown
+        response["statuts"] = result.statuts
+    return response
 # ==========================================
 # ENDPOINT CATEGORIES (Pour le Menu)
 # ==========================================
@@ -637,19 +791,20 @@ def _get_my_open_reservation(db: Session, object_id: int, user_id: int):
     )
 
 
-def _compute_distance_m(objet: models.Objet):
+def _compute_distance_m(objet: models.Objet, db: Session, origin: Optional[Origin] = None):
     if not objet.salle:
         return None
 
-    x = objet.salle.coord_x
-    y = objet.salle.coord_y
-    if x is None or y is None:
-        return None
-
-    return round(((x ** 2) + (y ** 2)) ** 0.5, 2)
+    distance = search_engine.distance_m(db, origin, objet.salle.coord_x, objet.salle.coord_y, objet.salle.num_etage)
+    return None if distance is None else round(distance, 2)
 
 
-def _serialize_equipment_details(objet: models.Objet, current_user: models.Utilisateur, db: Session):
+def _serialize_equipment_details(
+    objet: models.Objet,
+    current_user: models.Utilisateur,
+    db: Session,
+    origin: Optional[Origin] = None,
+):
     salle = objet.salle
     etage = salle.etage if salle else None
 
@@ -667,7 +822,7 @@ def _serialize_equipment_details(objet: models.Objet, current_user: models.Utili
             "floor": salle.num_etage if salle else None,
             "room": salle.nom_salle if salle else None,
         },
-        "distance_m": _compute_distance_m(objet),
+        "distance_m": _compute_distance_m(objet, db, origin),
         "description": objet.description,
         "fonctionnalites": [f.nom for f in (objet.fonctionnalites or []) if f and f.nom],
         "queue_count": _count_waiting(db, objet.id_objet),
@@ -717,6 +872,7 @@ def _cancel_reservation_and_update_queue(
         message = "Réservation déjà clôturée."
 
     db.commit()
+    _notify_status_change(objet.id_objet, objet.statut)
 
     return {
         "message": message,
@@ -727,9 +883,25 @@ def _cancel_reservation_and_update_queue(
     }
 
 
+@app.get("/objects/nearest", response_model=List[schemas.ObjetResponse])
+def get_nearest_available(
+    origin_salle: int,
+    type: Optional[str] = None,
+    fonction: Optional[str] = None,
+    k: int = Query(5, ge=1, le=50),
+    db: Session = Depends(get_db),
+):
+    # Déclarée avant /objects/{object_id} ; distance de marche salle à salle, étages pénalisés
+    try:
+        return search_engine.nearest_available(db, origin_salle, type_objet=type, fonction=fonction, k=k)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
 @app.get("/objects/{object_id}", response_model=schemas.EquipmentDetailsResponse)
 def get_object_details(
     object_id: int,
+    origin: Optional[Origin] = Depends(get_search_origin),
     db: Session = Depends(get_db),
     current_user: models.Utilisateur = Depends(auth.get_current_user),
 ):
@@ -737,7 +909,7 @@ def get_object_details(
     if not objet:
         raise HTTPException(status_code=404, detail="Objet introuvable")
 
-    return _serialize_equipment_details(objet, current_user, db)
+    return _serialize_equipment_details(objet, current_user, db, origin)
 
 
 @app.get("/objects/{object_id}/queue", response_model=schemas.QueueInfoResponse)
@@ -777,6 +949,9 @@ def create_reservation(
     if objet.statut == "Panne":
         raise HTTPException(status_code=400, detail="Objet en panne, réservation impossible")
 
+    if objet.statut == STATUT_HORS_LIGNE:
+        raise HTTPException(status_code=400, detail="Objet hors ligne, réservation impossible")
+
     existing = _get_my_open_reservation(db, payload.object_id, user_id)
     if existing:
         return {
@@ -808,6 +983,7 @@ def create_reservation(
     db.add(reservation)
     db.commit()
     db.refresh(reservation)
+    _notify_status_change(objet.id_objet, objet.statut)
 
     return {
         "message": message,
@@ -0,0 +1,237 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+METRICS_ENABLED = os.getenv("SEARCH_METRICS_ENABLED", "1").lower() not in {"0", "false", "no"}
+
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+COUNT_BUCKETS = (0, 1, 10, 50, 100, 250, 420, 520, 1000, 5000)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # one slot per bucket + overflow, then sum and count
+                series = [0.0] * (len(self.buckets) + 3)
+                self._series[key] = series
+            series[bisect_left(self.buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0.0
+            for idx, bound in enumerate(self.buckets):
+                cumulative += series[idx]
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {_format_value(cumulative)}")
+            cumulative += series[len(self.buckets)]
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {repr(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {_format_value(series[-1])}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = dict(self._values)
+        for key, value in sorted(snapshot.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """Valeur lue au moment du scrape (ex: nombre d'éléments en attente, taille d'un cache)."""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float]):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.metric_type}",
+            f"{self.name} {_format_value(float(self.read()))}",
+        ]
+
+
+class CallbackCounter(Gauge):
+    """Compteur tenu par son propriétaire (hits d'un cache, lignes écrites...) et lu au moment du scrape."""
+
+    metric_type = "counter"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name: str, help_text: str, buckets: Iterable[float] = DURATION_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, buckets))
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._register(Counter(name, help_text))
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float]) -> Gauge:
+        return self._register(Gauge(name, help_text, read))
+
+    def callback_counter(self, name: str, help_text: str, read: Callable[[], float]) -> CallbackCounter:
+        return self._register(CallbackCounter(name, help_text, read))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+stage_durations = registry.histogram(
+    "search_stage_duration_seconds",
+    "Durée de chaque étape de /search et /search/suggest",
+)
+stage_counts = registry.histogram(
+    "search_stage_items",
+    "Nombre de candidats / résultats par étape",
+    buckets=COUNT_BUCKETS,
+)
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class NullTimer:
+    """Timer désactivé : aucune mesure, coût quasi nul."""
+
+    enabled = False
+
+    def stage(self, name: str):
+        return _NULL_STAGE
+
+    def count(self, name: str, value: int):
+        pass
+
+    def finish(self):
+        pass
+
+    def server_timing(self) -> str:
+        return ""
+
+
+NULL_TIMER = NullTimer()
+
+
+class _Stage:
+    __slots__ = ("timer", "name", "started")
+
+    def __init__(self, timer: "StageTimer", name: str):
+        self.timer = timer
+        self.name = name
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timer.stages.append((self.name, time.perf_counter() - self.started))
+        return False
+
+
+class StageTimer:
+    """Durées par étape et compteurs de candidats pour une requête de recherche."""
+
+    enabled = True
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.stages: List[Tuple[str, float]] = []
+        self.counts: List[Tuple[str, int]] = []
+        self._finished = False
+
+    def stage(self, name: str) -> _Stage:
+        return _Stage(self, name)
+
+    def count(self, name: str, value: int):
+        self.counts.append((name, int(value)))
+
+    def finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        for name, seconds in self.stages:
+            stage_durations.observe(seconds, operation=self.operation, stage=name)
+        for name, value in self.counts:
+            stage_counts.observe(value, operation=self.operation, stage=name)
+
+    def server_timing(self) -> str:
+        parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages]
+        parts.extend(f'{name};desc="{value}"' for name, value in self.counts)
+        return ", ".join(parts)
+
+
+def new_timer(operation: str):
+    return StageTimer(operation) if METRICS_ENABLED else NULL_TIMER
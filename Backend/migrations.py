@@ -0,0 +1,209 @@
+"""
+Migrations idempotentes appliquées au démarrage, après `create_all`.
+
+`create_all` ne crée que les tables manquantes : les colonnes, index,
+fonctions et triggers ajoutés ensuite sur des tables existantes sont
+déclarés ici (PostgreSQL uniquement, rejouables sans effet de bord).
+"""
+import sys
+import unicodedata
+from typing import List
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex
+
+import models
+
+
+def _combining_marks_class() -> str:
+    """Regex class of every combining mark, i.e. what text_normalize drops after NFKD."""
+    ranges: List[List[int]] = []
+    for code in range(sys.maxunicode + 1):
+        if unicodedata.combining(chr(code)):
+            if ranges and ranges[-1][1] == code - 1:
+                ranges[-1][1] = code
+            else:
+                ranges.append([code, code])
+
+    def escape(code: int) -> str:
+        return f"\\u{code:04x}" if code <= 0xFFFF else f"\\U{code:08x}"
+
+    return "[" + "".join(
+        escape(start) if start == end else f"{escape(start)}-{escape(end)}" for start, end in ranges
+    ) + "]"
+
+
+# Même repliement que text_normalize.normalize_text : NFKD, sans marques combinantes, minuscules
+# (normalize() : PostgreSQL 13+, base en UTF8)
+SMARTFIND_FOLD_DDL = f"""
+    CREATE OR REPLACE FUNCTION smartfind_fold(value text) RETURNS text
+    LANGUAGE sql IMMUTABLE AS $$
+        SELECT lower(regexp_replace(normalize(coalesce(value, ''), NFKD), '{_combining_marks_class()}', '', 'g'))
+    $$
+    """
+
+# --- Document de recherche dénormalisé (objet + salle + fonctionnalités) ---
+# search_text : le texte replié (filtre en sous-chaîne, index trigramme) ;
+# search_document : son tsvector (classement ts_rank_cd)
+SEARCH_DOCUMENT_DDL: List[str] = [
+    "ALTER TABLE objets ADD COLUMN IF NOT EXISTS search_document tsvector",
+    "ALTER TABLE objets ADD COLUMN IF NOT EXISTS search_text text",
+    SMARTFIND_FOLD_DDL,
+    """
+    CREATE OR REPLACE FUNCTION smartfind_search_text(
+        p_id_objet integer,
+        p_nom_model text,
+        p_type_objet text,
+        p_nom_marque text,
+        p_description text,
+        p_id_salle integer
+    ) RETURNS text
+    LANGUAGE sql STABLE AS $$
+        SELECT smartfind_fold(concat_ws(' ',
+            p_nom_model,
+            p_type_objet,
+            p_nom_marque,
+            p_description,
+            (SELECT s.nom_salle FROM salles s WHERE s.id_salle = p_id_salle),
+            (
+                SELECT string_agg(f.nom, ' ')
+                FROM association_objet_fonction a
+                JOIN fonctionnalites f ON f.id = a.id_fonction
+                WHERE a.id_objet = p_id_objet
+            )
+        ))
+    $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION smartfind_refresh_search_document(p_id_objet integer) RETURNS void
+    LANGUAGE sql AS $$
+        UPDATE objets o
+        SET search_text = t.search_text, search_document = to_tsvector('simple', t.search_text)
+        FROM (
+            SELECT smartfind_search_text(
+                o2.id_objet, o2.nom_model, o2.type_objet, o2.nom_marque, o2.description, o2.id_salle
+            ) AS search_text
+            FROM objets o2
+            WHERE o2.id_objet = p_id_objet
+        ) t
+        WHERE o.id_objet = p_id_objet
+    $$
+    """,
+    # Objet inséré / modifié : recalcul sur la ligne NEW avant écriture
+    """
+    CREATE OR REPLACE FUNCTION smartfind_objets_search_document_trg() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.search_text := smartfind_search_text(
+            NEW.id_objet, NEW.nom_model, NEW.type_objet, NEW.nom_marque, NEW.description, NEW.id_salle
+        );
+        NEW.search_document := to_tsvector('simple', NEW.search_text);
+        RETURN NEW;
+    END
+    $$
+    """,
+    "DROP FUNCTION IF EXISTS smartfind_search_document(integer, text, text, text, text, integer)",
+    "DROP TRIGGER IF EXISTS trg_objets_search_document ON objets",
+    """
+    CREATE TRIGGER trg_objets_search_document
+    BEFORE INSERT OR UPDATE OF nom_model, type_objet, nom_marque, description, id_salle ON objets
+    FOR EACH ROW EXECUTE PROCEDURE smartfind_objets_search_document_trg()
+    """,
+    # Salle renommée : tous les objets de la salle
+    """
+    CREATE OR REPLACE FUNCTION smartfind_salles_search_document_trg() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM smartfind_refresh_search_document(o.id_objet)
+        FROM objets o
+        WHERE o.id_salle = NEW.id_salle;
+        RETURN NULL;
+    END
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS trg_salles_search_document ON salles",
+    """
+    CREATE TRIGGER trg_salles_search_document
+    AFTER UPDATE OF nom_salle ON salles
+    FOR EACH ROW WHEN (OLD.nom_salle IS DISTINCT FROM NEW.nom_salle)
+    EXECUTE PROCEDURE smartfind_salles_search_document_trg()
+    """,
+    # Fonctionnalité renommée : tous les objets qui la portent
+    """
+    CREATE OR REPLACE FUNCTION smartfind_fonctions_search_document_trg() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        PERFORM smartfind_refresh_search_document(a.id_objet)
+        FROM association_objet_fonction a
+        WHERE a.id_fonction = NEW.id;
+        RETURN NULL;
+    END
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS trg_fonctionnalites_search_document ON fonctionnalites",
+    """
+    CREATE TRIGGER trg_fonctionnalites_search_document
+    AFTER UPDATE OF nom ON fonctionnalites
+    FOR EACH ROW WHEN (OLD.nom IS DISTINCT FROM NEW.nom)
+    EXECUTE PROCEDURE smartfind_fonctions_search_document_trg()
+    """,
+    # Fonctionnalité ajoutée / retirée d'un objet
+    """
+    CREATE OR REPLACE FUNCTION smartfind_association_search_document_trg() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            PERFORM smartfind_refresh_search_document(OLD.id_objet);
+        ELSE
+            PERFORM smartfind_refresh_search_document(NEW.id_objet);
+        END IF;
+        RETURN NULL;
+    END
+    $$
+    """,
+    "DROP TRIGGER IF EXISTS trg_association_search_document ON association_objet_fonction",
+    """
+    CREATE TRIGGER trg_association_search_document
+    AFTER INSERT OR DELETE ON association_objet_fonction
+    FOR EACH ROW EXECUTE PROCEDURE smartfind_association_search_document_trg()
+    """,
+    # Rattrapage des lignes existantes (search_text vide : ligne nouvelle ou repliée par l'ancien
+    # smartfind_fold), puis index GIN
+    """
+    UPDATE objets o
+    SET search_text = t.search_text, search_document = to_tsvector('simple', t.search_text)
+    FROM (
+        SELECT o2.id_objet, smartfind_search_text(
+            o2.id_objet, o2.nom_model, o2.type_objet, o2.nom_marque, o2.description, o2.id_salle
+        ) AS search_text
+        FROM objets o2
+        WHERE o2.search_text IS NULL
+    ) t
+    WHERE o.id_objet = t.id_objet
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_objets_search_document ON objets USING gin (search_document)",
+    "CREATE INDEX IF NOT EXISTS idx_objets_search_text ON objets USING gin (search_text gin_trgm_ops)",
+]
+
+
+def search_filter_index_statements(dialect=None) -> List[str]:
+    # Index des filtres de recherche de models.py, en CREATE INDEX IF NOT EXISTS
+    dialect = dialect or postgresql.dialect()
+    return [
+        str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect))
+        for index in models.SEARCH_FILTER_INDEXES
+    ]
+
+
+def postgres_statements() -> List[str]:
+    return list(SEARCH_DOCUMENT_DDL) + search_filter_index_statements()
+
+
+def run_migrations(engine: Engine):
+    if engine.dialect.name != "postgresql":
+        return
+
+    with engine.begin() as conn:
+        for statement in postgres_statements():
+            conn.exec_driver_sql(statement)
@@ -1,5 +1,6 @@
-from sqlalchemy import Table, Column, Integer, String, ForeignKey, DateTime, Boolean, Float, Index
-from sqlalchemy.orm import relationship
+from sqlalchemy import Table, BigInteger, Column, Integer, String, Text, ForeignKey, DateTime, Boolean, Float, Index, func, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 from datetime import datetime
 from database import Base
 
@@ -71,6 +72,11 @@ class Objet(Base):
     last_heartbeat = Column(DateTime, default=datetime.utcnow)
     
     url_photo = Column(String, nullable=True)
+
+    # Document de recherche (objet + salle + fonctionnalités), maintenu par triggers (cf. migrations.py)
+    search_document = deferred(Column(Text().with_variant(TSVECTOR(), "postgresql"), nullable=True))
+    # Même texte replié comme text_normalize (filtre en sous-chaîne, index trigramme)
+    search_text = deferred(Column(Text, nullable=True))
     
     # Clé étrangère indexée pour la performance
     id_salle = Column(Integer, ForeignKey("salles.id_salle"), index=True)
@@ -92,6 +98,12 @@ class Objet(Base):
             },
             postgresql_using='gin'
         ),
+        Index('idx_objets_search_document', 'search_document', postgresql_using='gin'),
+        Index(
+            'idx_objets_search_text', 'search_text',
+            postgresql_ops={'search_text': 'gin_trgm_ops'},
+            postgresql_using='gin',
+        ),
     )
 
 class Utilisateur(Base):
@@ -141,3 +153,44 @@ class Notification(Base):
     id_reservation = Column(Integer, ForeignKey("reservations.id"), nullable=True, index=True)
 
     utilisateur = relationship("Utilisateur", back_populates="notifications")
+
+
+class SearchVersion(Base):
+    """Une seule ligne (id 1) : incrémentée après chaque écriture qui change un résultat de recherche."""
+    __tablename__ = "search_versions"
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+# Statuts qu'un objet muet quitte pour "Hors ligne" (Occupé et Panne sont gardés :
+# une réservation en cours ou une panne confirmée ne sont pas écrasées)
+OFFLINE_SWEEP_PREDICATE = "statut IN ('Disponible', 'Signalé') AND mac_adresse IS NOT NULL"
+
+
+# --- INDEX DES FILTRES DE RECHERCHE (expressions insensibles à la casse) ---
+# Les requêtes filtrent sur lower(...) : un btree simple sur la colonne n'est pas utilisable.
+# Déclarés ici pour create_all, et rejoués par migrations.py sur une base existante.
+SEARCH_FILTER_INDEXES = [
+    Index("ix_objets_statut_lower", func.lower(Objet.statut)),
+    Index("ix_objets_type_objet_lower", func.lower(Objet.type_objet)),
+    Index("ix_objets_nom_marque_lower", func.lower(Objet.nom_marque)),
+    Index("ix_fonctionnalites_nom_lower", func.lower(Fonctionnalite.nom)),
+    # La clé primaire (id_objet, id_fonction) ne sert pas le chemin fonction -> objets
+    Index("ix_association_objet_fonction_fonction", association_objet_fonction.c.id_fonction),
+    # File d'attente / réservation active d'un objet : id_objet + statut, triée par date.
+    # Couvre aussi l'agrégat de la recherche (le upper(coalesce(statut)) y est dans un CASE, pas un filtre).
+    Index(
+        "ix_reservations_objet_statut_date",
+        Reservation.id_objet,
+        Reservation.statut_reservation,
+        Reservation.date_reservation,
+    ),
+    # Balayage des objets muets (offline_sweeper.py) : index partiel, seuls les objets
+    # encore balayables y figurent, la recherche des retardataires reste en O(objets muets).
+    Index(
+        "ix_objets_heartbeat_sweep",
+        Objet.last_heartbeat,
+        postgresql_where=text(OFFLINE_SWEEP_PREDICATE),
+        sqlite_where=text(OFFLINE_SWEEP_PREDICATE),
+    ),
+]
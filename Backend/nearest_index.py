@@ -0,0 +1,222 @@
+"""
+« L'équipement libre le plus proche » sans passer par le moteur texte.
+
+- RoomDistanceMatrix : distances salle -> salle précalculées (distance à plat
+  + pénalité par mètre de dénivelé, d'après Etage.hauteur_metres), chaque
+  ligne triée à la première utilisation.
+- AvailabilityIndex : (type | fonctionnalité) -> salle -> objets disponibles
+  (et, à part, les indisponibles), tenu à jour à chaque changement de statut.
+"""
+import heapq
+import math
+import os
+import threading
+from array import array
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from spatial_index import Room, SpatialIndex
+
+# Un mètre de dénivelé (escaliers) compte comme NEAREST_FLOOR_PENALTY mètres à plat
+NEAREST_FLOOR_PENALTY = float(os.getenv("SEARCH_NEAREST_FLOOR_PENALTY", "2.0"))
+# Below this share of rooms holding a match, sort those rooms instead of walking the origin's row
+SPARSE_ROOMS_RATIO = 0.25
+
+Key = Tuple[str, str]
+
+
+def _located_rooms(spatial: SpatialIndex) -> List[Room]:
+    return sorted(
+        (room for room in spatial.rooms.values() if room.x is not None and room.y is not None),
+        key=lambda room: room.id_salle,
+    )
+
+
+class RoomDistanceMatrix:
+    """Dense n x n walking distances between rooms that have coordinates."""
+
+    @staticmethod
+    def rooms_key(spatial: SpatialIndex, floor_penalty: float = NEAREST_FLOOR_PENALTY) -> tuple:
+        """Everything the distances depend on: a matrix is reusable while this key is unchanged."""
+        return floor_penalty, tuple(
+            (room.id_salle, room.x, room.y, spatial.elevation(room.num_etage)) for room in _located_rooms(spatial)
+        )
+
+    def __init__(self, spatial: SpatialIndex, floor_penalty: float = NEAREST_FLOOR_PENALTY):
+        rooms = _located_rooms(spatial)
+        self.key = self.rooms_key(spatial, floor_penalty)
+        self.room_ids = array("i", (room.id_salle for room in rooms))
+        self._position = {room.id_salle: idx for idx, room in enumerate(rooms)}
+        size = len(rooms)
+        self._size = size
+        self._distances = array("d", bytes(8 * size * size))
+        self._orders: Dict[int, array] = {}
+
+        elevations = [spatial.elevation(room.num_etage) for room in rooms]
+        for i, a in enumerate(rooms):
+            row = i * size
+            for j in range(i + 1, size):
+                b = rooms[j]
+                distance = math.sqrt((a.x - b.x) ** 2 + (a.y - b.y) ** 2) + floor_penalty * abs(elevations[i] - elevations[j])
+                self._distances[row + j] = distance
+                self._distances[j * size + i] = distance
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, id_salle: int) -> bool:
+        return id_salle in self._position
+
+    def distance(self, from_salle: int, to_salle: int) -> float:
+        i = self._position.get(from_salle)
+        j = self._position.get(to_salle)
+        if i is None or j is None:
+            return float("inf")
+        return self._distances[i * self._size + j]
+
+    def order(self, from_salle: int) -> array:
+        """Room positions of `from_salle`'s row by increasing distance (sorted once, then cached)."""
+        order = self._orders.get(from_salle)
+        if order is None:
+            i = self._position[from_salle]
+            row = self._distances[i * self._size:(i + 1) * self._size]
+            order = array("i", sorted(range(self._size), key=lambda j: (row[j], self.room_ids[j])))
+            self._orders[from_salle] = order
+        return order
+
+
+class _Entry(NamedTuple):
+    id_salle: Optional[int]
+    keys: FrozenSet[Key]
+    available: bool
+
+
+class AvailabilityIndex:
+    """Object ids per (kind, normalized value) and room, available and unavailable apart."""
+
+    def __init__(self):
+        self._rooms: Dict[Key, Dict[int, Set[int]]] = {}
+        # unavailable objects, for re-checking those freed outside this process
+        self._held: Dict[Key, Dict[int, Set[int]]] = {}
+        self._objects: Dict[int, _Entry] = {}
+
+    def __len__(self) -> int:
+        return len(self._objects)
+
+    def _link(self, object_id: int, entry: _Entry):
+        if entry.id_salle is None:
+            return
+        by_key = self._rooms if entry.available else self._held
+        for key in entry.keys:
+            by_key.setdefault(key, {}).setdefault(entry.id_salle, set()).add(object_id)
+
+    def _unlink(self, object_id: int, entry: _Entry):
+        if entry.id_salle is None:
+            return
+        by_key = self._rooms if entry.available else self._held
+        for key in entry.keys:
+            rooms = by_key.get(key)
+            members = rooms.get(entry.id_salle) if rooms else None
+            if members is None:
+                continue
+            members.discard(object_id)
+            if not members:
+                del rooms[entry.id_salle]
+                if not rooms:
+                    del by_key[key]
+
+    def upsert(self, object_id: int, id_salle: Optional[int], keys: Iterable[Key], available: bool):
+        self.remove(object_id)
+        entry = _Entry(id_salle, frozenset(keys), available)
+        self._objects[object_id] = entry
+        self._link(object_id, entry)
+
+    def remove(self, object_id: int):
+        entry = self._objects.pop(object_id, None)
+        if entry is not None:
+            self._unlink(object_id, entry)
+
+    def set_available(self, object_id: int, available: bool) -> bool:
+        entry = self._objects.get(object_id)
+        if entry is None:
+            return False
+        if entry.available != available:
+            self.upsert(object_id, entry.id_salle, entry.keys, available)
+        return True
+
+    def keys_of(self, object_id: int) -> FrozenSet[Key]:
+        entry = self._objects.get(object_id)
+        return entry.keys if entry else frozenset()
+
+    def rooms_for(self, key: Key) -> Dict[int, Set[int]]:
+        return self._rooms.get(key, {})
+
+    def held_rooms_for(self, key: Key) -> Dict[int, Set[int]]:
+        return self._held.get(key, {})
+
+
+class NearestIndex:
+    def __init__(self, matrix: RoomDistanceMatrix, availability: AvailabilityIndex):
+        self.matrix = matrix
+        self.availability = availability
+        # Status writes come from request threads while others read the same sets
+        self._lock = threading.Lock()
+
+    def set_available(self, object_id: int, available: bool) -> bool:
+        with self._lock:
+            return self.availability.set_available(object_id, available)
+
+    def nearest(
+        self,
+        from_salle: int,
+        key: Key,
+        k: int,
+        also: Optional[Key] = None,
+    ) -> List[Tuple[float, int]]:
+        """
+        Up to k (distance, object id) pairs, closest room first (ids ascending within a room).
+        `also` is a second key every object must carry (type + function).
+        """
+        with self._lock:
+            return self._nearest(from_salle, key, k, also)
+
+    def _nearest(self, from_salle: int, key: Key, k: int, also: Optional[Key]) -> List[Tuple[float, int]]:
+        rooms = self.availability.rooms_for(key)
+        if not rooms or k <= 0 or from_salle not in self.matrix:
+            return []
+
+        matrix = self.matrix
+        if len(rooms) <= SPARSE_ROOMS_RATIO * len(matrix):
+            ordered = sorted(
+                (matrix.distance(from_salle, id_salle), id_salle) for id_salle in rooms if id_salle in matrix
+            )
+        else:
+            ordered = (
+                (matrix.distance(from_salle, matrix.room_ids[j]), matrix.room_ids[j])
+                for j in matrix.order(from_salle)
+                if matrix.room_ids[j] in rooms
+            )
+
+        found: List[Tuple[float, int]] = []
+        for distance, id_salle in ordered:
+            if len(found) >= k:
+                break
+            for object_id in heapq.nsmallest(k - len(found), self._matching(rooms[id_salle], also)):
+                found.append((distance, object_id))
+        return found
+
+    def held_within(self, from_salle: int, key: Key, radius: float, also: Optional[Key] = None) -> List[int]:
+        """Unavailable objects with `key` (and `also`) in rooms at most `radius` from `from_salle`."""
+        with self._lock:
+            held = self.availability.held_rooms_for(key)
+            return sorted(
+                object_id
+                for id_salle, object_ids in held.items()
+                if self.matrix.distance(from_salle, id_salle) <= radius
+                for object_id in self._matching(object_ids, also)
+            )
+
+    def _matching(self, object_ids: Set[int], also: Optional[Key]):
+        for object_id in object_ids:
+            if also is not None and also not in self.availability.keys_of(object_id):
+                continue
+            yield object_id
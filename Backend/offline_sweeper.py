@@ -0,0 +1,202 @@
+"""
+Balayage des objets connectés muets.
+
+Un objet Disponible ou Signalé dont le dernier heartbeat date de plus de
+IOT_OFFLINE_AFTER_SECONDS passe "Hors ligne" (il sort des objets disponibles
+de la recherche) et une alerte IoT Critical est levée, sauf si une alerte
+identique (objet, IoT, Critical) est déjà ouverte.
+
+Chaque lot est un UPDATE ... RETURNING sur l'index partiel
+ix_objets_heartbeat_sweep (objets encore balayables, triés par last_heartbeat),
+borné à IOT_OFFLINE_SWEEP_BATCH objets, suivi d'un INSERT groupé des alertes :
+le travail est en O(objets muets), pas en O(objets). Les signes de vie encore
+dans le write-behind (liveness_buffer) sont écrits avant le balayage.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+from device_registry import DeviceRegistry, devices
+from heartbeat_rules import STATUT_HORS_LIGNE
+from liveness_buffer import LivenessBuffer, buffer as liveness_buffer
+from metrics import registry as metrics_registry
+
+OFFLINE_SWEEPER = os.getenv("IOT_OFFLINE_SWEEPER", "1").lower() not in {"0", "false", "no"}
+OFFLINE_AFTER_SECONDS = float(os.getenv("IOT_OFFLINE_AFTER_SECONDS", "900"))
+OFFLINE_SWEEP_SECONDS = float(os.getenv("IOT_OFFLINE_SWEEP_SECONDS", "60"))
+OFFLINE_SWEEP_BATCH = int(os.getenv("IOT_OFFLINE_SWEEP_BATCH", "500"))
+
+OFFLINE_ALERT_SOURCE = "IoT"
+OFFLINE_ALERT_NIVEAU = "Critical"
+
+_objets = models.Objet.__table__
+
+
+def sweep_statement(cutoff: datetime, batch_size: int):
+    # Same predicate as the partial index, repeated on the outer UPDATE so a row
+    # that got a heartbeat (or a reservation) since the subquery is left alone
+    sweepable = (text(models.OFFLINE_SWEEP_PREDICATE), _objets.c.last_heartbeat < cutoff)
+    stale = (
+        select(_objets.c.id_objet)
+        .where(*sweepable)
+        .order_by(_objets.c.last_heartbeat)
+        .limit(batch_size)
+    )
+    return (
+        update(_objets)
+        .where(_objets.c.id_objet.in_(stale), *sweepable)
+        .values(statut=STATUT_HORS_LIGNE)
+        .returning(_objets.c.id_objet, _objets.c.last_heartbeat)
+    )
+
+
+class OfflineSweeper:
+    """Marks silent devices offline in bounded batches; `on_status_change(id_objet, statut)` runs after each commit."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        offline_after: float = OFFLINE_AFTER_SECONDS,
+        interval: float = OFFLINE_SWEEP_SECONDS,
+        batch_size: int = OFFLINE_SWEEP_BATCH,
+        enabled: bool = OFFLINE_SWEEPER,
+        liveness: Optional[LivenessBuffer] = None,
+        registry: Optional[DeviceRegistry] = None,
+    ):
+        self.session_factory = session_factory
+        self.offline_after = offline_after
+        self.interval = interval
+        self.batch_size = batch_size
+        self.enabled = enabled
+        self.liveness = liveness
+        self.registry = registry
+        self.on_status_change: Optional[Callable[[int, Optional[str]], None]] = None
+        self.swept = 0
+        self.alerts_raised = 0
+        self.failed_sweeps = 0
+        self.last_sweep_seconds = 0.0
+        self._sweep_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sweep_batch(self, now: Optional[datetime] = None) -> List[int]:
+        """One bounded batch: ids of the objects marked offline."""
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(seconds=self.offline_after)
+        registry = self.registry or DeviceRegistry(enabled=False)
+
+        db = self.session_factory()
+        try:
+            rows = db.execute(sweep_statement(cutoff, self.batch_size)).all()
+            if not rows:
+                db.commit()
+                return []
+
+            open_alerts = registry.open_alerts_many(db, [id_objet for id_objet, _ in rows])
+            new_alerts = []
+            for id_objet, last_heartbeat in rows:
+                if any(
+                    alert.source == OFFLINE_ALERT_SOURCE and alert.niveau == OFFLINE_ALERT_NIVEAU
+                    for alert in open_alerts.get(id_objet, ())
+                ):
+                    continue
+                minutes = int((now - last_heartbeat).total_seconds() // 60)
+                new_alerts.append({
+                    "message": f"HORS LIGNE AUTO : aucun heartbeat depuis {minutes} min",
+                    "niveau": OFFLINE_ALERT_NIVEAU,
+                    "source": OFFLINE_ALERT_SOURCE,
+                    "id_objet": id_objet,
+                    "date_alerte": now,
+                    "est_resolu": False,
+                })
+            if new_alerts:
+                db.execute(insert(models.Alerte), new_alerts)
+            db.commit()
+        except SQLAlchemyError as exc:
+            db.rollback()
+            self.failed_sweeps += 1
+            print(f"⚠️ Balayage des objets hors ligne impossible ({exc}). Nouvel essai au prochain cycle.")
+            return []
+        finally:
+            db.close()
+
+        ids = [id_objet for id_objet, _ in rows]
+        for alert in new_alerts:
+            registry.alert_opened(alert["id_objet"], alert["source"], alert["niveau"])
+        if self.on_status_change is not None:
+            for id_objet in ids:
+                self.on_status_change(id_objet, STATUT_HORS_LIGNE)
+        self.swept += len(ids)
+        self.alerts_raised += len(new_alerts)
+        return ids
+
+    def sweep(self, now: Optional[datetime] = None) -> int:
+        """Batches until one comes back short; returns the number of objects marked offline."""
+        with self._sweep_lock:
+            started = time.perf_counter()
+            # A heartbeat waiting in the write-behind is still a heartbeat
+            if self.liveness is not None and self.liveness.enabled:
+                self.liveness.flush()
+
+            total = 0
+            while True:
+                ids = self.sweep_batch(now)
+                total += len(ids)
+                if len(ids) < self.batch_size:
+                    break
+            self.last_sweep_seconds = time.perf_counter() - started
+            return total
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.interval)
+            if self._stopping.is_set():
+                break
+            self.sweep()
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="offline-sweep", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            thread.join()
+
+
+sweeper = OfflineSweeper(SessionLocal, liveness=liveness_buffer, registry=devices)
+
+metrics_registry.callback_counter(
+    "iot_offline_swept_total",
+    "Objets passés Hors ligne faute de heartbeat",
+    lambda: sweeper.swept,
+)
+metrics_registry.callback_counter(
+    "iot_offline_alerts_total",
+    "Alertes Hors ligne levées par le balayage",
+    lambda: sweeper.alerts_raised,
+)
+metrics_registry.callback_counter(
+    "iot_offline_sweep_failures_total",
+    "Balayages des objets hors ligne en échec",
+    lambda: sweeper.failed_sweeps,
+)
+metrics_registry.gauge(
+    "iot_offline_last_sweep_seconds",
+    "Durée du dernier balayage des objets hors ligne",
+    lambda: sweeper.last_sweep_seconds,
+)
@@ -0,0 +1,109 @@
+from collections import deque
+from typing import Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class AhoCorasick(Generic[T]):
+    """
+    Multi-pattern substring matcher: one pass over the text yields every
+    (start, end, payload) hit, whatever the number of patterns.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, T]] = ()):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[Tuple[int, T]]] = [[]]
+        self._built = False
+        for pattern, payload in patterns:
+            self.add(pattern, payload)
+        self.build()
+
+    def add(self, pattern: str, payload: T):
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            node = next_node
+        self._outputs[node].append((len(pattern), payload))
+        self._built = False
+
+    def build(self):
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+
+        self._built = True
+
+    def iter_matches(self, text: str):
+        if not self._built:
+            self.build()
+
+        node = 0
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        for end, char in enumerate(text, start=1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, payload in outputs[node]:
+                yield end - length, end, payload
+
+
+class QueryHits:
+    """Hits of one scan, grouped by kind; `first` honours each dictionary's priority order."""
+
+    __slots__ = ("_by_kind",)
+
+    def __init__(self):
+        self._by_kind: Dict[str, List[Tuple[int, int, int, str]]] = {}
+
+    def add(self, kind: str, priority: int, start: int, end: int, value: str):
+        self._by_kind.setdefault(kind, []).append((priority, start, end, value))
+
+    def all(self, kind: str) -> List[Tuple[int, int, int, str]]:
+        return sorted(self._by_kind.get(kind, []))
+
+    def first(self, kind: str) -> Optional[str]:
+        hits = self._by_kind.get(kind)
+        if not hits:
+            return None
+        return min(hits)[3]
+
+
+class QueryMatcher:
+    """One automaton over several dictionaries: (kind, priority, value) payloads per pattern."""
+
+    def __init__(self, dictionaries: Dict[str, Iterable[Tuple[str, str]]]):
+        patterns: List[Tuple[str, Tuple[str, int, str]]] = []
+        for kind, entries in dictionaries.items():
+            for priority, (pattern, value) in enumerate(entries):
+                patterns.append((pattern, (kind, priority, value)))
+        self._automaton: AhoCorasick[Tuple[str, int, str]] = AhoCorasick(patterns)
+
+    def scan(self, text: str) -> QueryHits:
+        hits = QueryHits()
+        if text:
+            for start, end, (kind, priority, value) in self._automaton.iter_matches(text):
+                hits.add(kind, priority, start, end, value)
+        return hits
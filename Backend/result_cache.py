@@ -0,0 +1,199 @@
+"""
+Cache des résultats de recherche, borné en mémoire.
+
+Chaque entrée garde sa portée (SearchScope) : les objets candidats qu'elle a
+classés et les filtres qu'un nouvel objet devrait passer pour y entrer. Une
+écriture sur un objet (ObjectProbe) n'invalide que les entrées qui le
+contiennent ou qu'il peut désormais rejoindre.
+"""
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Dict, FrozenSet, Generic, Hashable, NamedTuple, Optional, Set, Tuple, TypeVar
+
+RESULT_CACHE_MAX_BYTES = int(float(os.getenv("SEARCH_RESULT_CACHE_MB", "32")) * 1024 * 1024)
+# Writes remembered so a result computed while they happened is not stored
+WRITE_LOG_SIZE = 1024
+
+V = TypeVar("V")
+
+
+class ObjectProbe(NamedTuple):
+    """Normalized state of an object right after a write."""
+
+    id_objet: int
+    statut: str
+    # False for status/queue writes: the other fields did not change
+    full: bool = False
+    type_objet: str = ""
+    nom_marque: str = ""
+    fonctions: FrozenSet[str] = frozenset()
+    num_etage: Optional[int] = None
+    id_salle: Optional[int] = None
+    nom_salle: str = ""
+    haystack: str = ""
+
+
+class SearchScope(NamedTuple):
+    """What a cached result depends on (normalized filter values, "" / None when unset)."""
+
+    object_ids: FrozenSet[int]
+    statut: str = ""
+    type_objet: str = ""
+    nom_marque: str = ""
+    fonction: str = ""
+    num_etage: Optional[int] = None
+    id_salle: Optional[int] = None
+    salle_text: str = ""
+    # A newcomer must contain one of these; empty: the filters alone decide
+    terms: Tuple[str, ...] = ()
+
+    def affected_by(self, probe: ObjectProbe) -> bool:
+        if probe.id_objet in self.object_ids:
+            return True
+        if not probe.full:
+            # Only a status filter can admit an object whose status alone changed
+            return bool(self.statut) and self.statut == probe.statut
+        if self.statut and self.statut != probe.statut:
+            return False
+        if self.type_objet and self.type_objet != probe.type_objet:
+            return False
+        if self.nom_marque and self.nom_marque != probe.nom_marque:
+            return False
+        if self.fonction and self.fonction not in probe.fonctions:
+            return False
+        if self.num_etage is not None and self.num_etage != probe.num_etage:
+            return False
+        if self.id_salle is not None and self.id_salle != probe.id_salle:
+            return False
+        if self.salle_text and self.salle_text not in probe.nom_salle:
+            return False
+        if self.terms and not any(term in probe.haystack for term in self.terms):
+            return False
+        return True
+
+
+class _Entry(NamedTuple):
+    value: object
+    scope: SearchScope
+    size: int
+
+
+class ResultCache(Generic[V]):
+    """Thread-safe LRU bounded by the approximate size of its values, invalidated per object."""
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.max_bytes = max(0, int(max_bytes))
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._by_object: Dict[int, Set[Hashable]] = {}
+        self._by_statut: Dict[str, Set[Hashable]] = {}
+        self._bytes = 0
+        self._generation = 0
+        # (generation, probe); probe None for clear()
+        self._writes: Deque[Tuple[int, Optional[ObjectProbe]]] = deque(maxlen=WRITE_LOG_SIZE)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    @property
+    def generation(self) -> int:
+        """Read before computing a value; put() refuses it if a relevant write happened since."""
+        return self._generation
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def put(self, key: Hashable, value: V, scope: SearchScope, size: int, generation: int) -> bool:
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            if generation != self._generation:
+                if not self._writes or self._writes[0][0] > generation + 1:
+                    return False
+                for written_at, probe in self._writes:
+                    if written_at > generation and (probe is None or scope.affected_by(probe)):
+                        return False
+
+            self._discard(key)
+            self._entries[key] = _Entry(value, scope, size)
+            self._bytes += size
+            for object_id in scope.object_ids:
+                self._by_object.setdefault(object_id, set()).add(key)
+            if scope.statut:
+                self._by_statut.setdefault(scope.statut, set()).add(key)
+
+            while self._bytes > self.max_bytes and self._entries:
+                self._discard(next(iter(self._entries)))
+        return True
+
+    def invalidate(self, probe: ObjectProbe) -> int:
+        """Drop the entries `probe`'s write may change; returns how many."""
+        with self._lock:
+            self._generation += 1
+            self._writes.append((self._generation, probe))
+
+            keys = set(self._by_object.get(probe.id_objet, ()))
+            if probe.full:
+                keys.update(key for key, entry in self._entries.items() if entry.scope.affected_by(probe))
+            else:
+                keys.update(self._by_statut.get(probe.statut, ()))
+
+            for key in keys:
+                self._discard(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._writes.append((self._generation, None))
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._by_object.clear()
+            self._by_statut.clear()
+            self._bytes = 0
+
+    def _discard(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        for object_id in entry.scope.object_ids:
+            keys = self._by_object.get(object_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_object[object_id]
+        if entry.scope.statut:
+            keys = self._by_statut.get(entry.scope.statut)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_statut[entry.scope.statut]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
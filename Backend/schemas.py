@@ -6,6 +6,9 @@ from datetime import datetime
 class HeartbeatSchema(BaseModel):
     mac_adresse: str
     statut: str
+    # Envoyé par une passerelle pour l'objet derrière elle (/iot/heartbeats uniquement) ;
+    # ignoré par /iot/heartbeat, qui garde l'IP de l'appelant
+    ip_adress: Optional[str] = None
 
 # --- Fonctionnalités ---
 class FonctionnaliteBase(BaseModel):
@@ -1,13 +1,19 @@
+import base64
+import hashlib
+import heapq
+import json
 import math
+import os
 import re
-import time
-import unicodedata
-from typing import Dict, List, Optional, Set, Tuple
+import sys
+import threading
+from types import MappingProxyType
+from typing import Callable, Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Optional, Set, Tuple
 
 try:
-    import spacy
+    import numpy as np
 except Exception:
-    spacy = None
+    np = None
 
 try:
     from rapidfuzz import fuzz, process
@@ -60,11 +66,52 @@ except Exception:
     fuzz = _FuzzFallback()
     process = _ProcessFallback()
 
-from sqlalchemy import func, or_
+from sqlalchemy import Integer, case, column, func, or_, select, update, values
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session
 
 import models
+from pattern_matcher import QueryHits, QueryMatcher
+from search_index import InvertedIndex
+from spatial_index import LEGACY_ORIGIN, Origin, SpatialIndex
+from spell_index import CorrectionIndex
+from suggest_index import SuggestionIndex
+from cache import LRUCache
+from lemma_table import DEFAULT_TABLE_PATH, FLAG_NUM, FLAG_STOP, LemmaTable
+from metrics import new_timer, registry
+from nearest_index import AvailabilityIndex, Key, NearestIndex, RoomDistanceMatrix
+from result_cache import RESULT_CACHE_MAX_BYTES, ObjectProbe, ResultCache, SearchScope
+from single_flight import SingleFlight
+from text_normalize import normalize_text as _normalize_text
+
+
+# In-process inverted index for candidate retrieval (SQL ILIKE chain stays as fallback)
+SEARCH_INDEX_ENABLED = os.getenv("SEARCH_INDEX_ENABLED", "1").lower() not in {"0", "false", "no"}
+INDEX_CANDIDATE_CAP = 5000
+# Postgres: filter on the trigger-maintained objets.search_text (substring, trigram GIN) and rank on
+# objets.search_document (tsvector), see migrations.py
+SEARCH_DOCUMENT_ENABLED = os.getenv("SEARCH_DOCUMENT_ENABLED", "1").lower() not in {"0", "false", "no"}
+# Tokenizer: "spacy" (lemmas), "table" (offline lemma table, see lemma_table.py), "rules" (regex split
+# only) or "auto" (rules for short/keyword-only queries, otherwise spaCy). The table is opt-in: its
+# context-free lemmas still differ from spaCy's on some queries (listed in tests/test_lemma_table.py)
+TOKENIZER_MODE = os.getenv("SEARCH_TOKENIZER", "auto").lower()
+LEMMA_TABLE_PATH = os.getenv("SEARCH_LEMMA_TABLE", DEFAULT_TABLE_PATH)
+SPACY_MODEL = os.getenv("SEARCH_SPACY_MODEL", "fr_core_news_sm")
+# Only is_stop, like_num, lemma_ and punct/space flags are read: the lemmatizer needs
+# tok2vec + morphologizer + attribute_ruler, never the parser or NER
+SPACY_EXCLUDED_COMPONENTS = ["parser", "ner"]
+# Parsed queries kept per data version (tokens, filters, corrections...)
+QUERY_CACHE_SIZE = int(os.getenv("SEARCH_QUERY_CACHE_SIZE", "2048"))
+# Upper bound of labels scored with WRatio per /search/suggest call
+SUGGEST_FUZZY_CANDIDATES = 200
+# Row of models.SearchVersion shared by the workers
+SHARED_VERSION_ID = 1
+# Below this many candidates the per-object loop beats the cdist/NumPy batch (thread start-up)
+BATCH_SCORING_MIN_CANDIDATES = 64
+# max_distance prefilter: up to this many rooms as an id_salle IN list, beyond it a coordinate bounding box
+SPATIAL_IN_LIST_CAP = 500
+# Slack on top-k score bounds so float rounding never prunes a candidate that ties the k-th score
+SCORE_BOUND_EPSILON = 1e-6
 
 
 STATUS_KEYWORDS = {
@@ -154,16 +201,8 @@ REGEX_FLOOR_2 = re.compile(r"(\d+)\s*(?:er|e|eme)?\s*(?:etage|étage|niveau|floo
 REGEX_ROOM = re.compile(r"(?:salle|room|قاعة|غرفة)\s*([\w\-]+)", re.IGNORECASE)
 REGEX_IP = re.compile(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$")
 REGEX_MAC = re.compile(r"^([0-9A-Fa-f]{2}[:-]){5}([0-9A-Fa-f]{2})$")
-
-
-def _strip_accents(value: str) -> str:
-    return "".join(c for c in unicodedata.normalize("NFKD", value) if not unicodedata.combining(c))
-
-
-def _normalize_text(value: Optional[str]) -> str:
-    if not value:
-        return ""
-    return _strip_accents(str(value)).lower().strip()
+# Lemma-table tokens: elided articles/pronouns kept with their apostrophe ("l'", "qu'"), then plain words
+REGEX_LEMMA_WORD = re.compile(r"(?:qu|[cdjlmnst])'(?=[a-z0-9؀-ۿ])|[a-z0-9؀-ۿ]+")
 
 
 def _split_words(value: str) -> List[str]:
@@ -174,6 +213,192 @@ def _split_words(value: str) -> List[str]:
     ]
 
 
+def _normalized_value_map(values: List[str]) -> Dict[str, str]:
+    normalized_map: Dict[str, str] = {}
+    for value in values:
+        normalized = _normalize_text(value)
+        if normalized:
+            normalized_map[normalized] = value
+    return normalized_map
+
+
+def _normalized_type_map(values: List[str]) -> Dict[str, str]:
+    return {_normalize_text(t): t for t in values}
+
+
+class FonctionRef(NamedTuple):
+    id: int
+    nom: str
+
+
+class SearchCandidate:
+    """
+    Projected search result: the columns the ranker and ObjetResponse read, room
+    fields flattened, functions aggregated in SQL. Not an ORM identity, so ranking
+    fields can be set freely.
+    """
+
+    __slots__ = (
+        "id_objet", "nom_model", "nom_marque", "type_objet", "description", "mac_adresse", "ip_adress",
+        "statut", "url_photo", "id_salle", "nom_salle", "coord_x", "coord_y", "num_etage", "fonctionnalites",
+        "distance_m", "waiting_count", "popularity_score", "relevance_score",
+    )
+
+    def __init__(
+        self, id_objet, nom_model, nom_marque, type_objet, description, mac_adresse, ip_adress,
+        statut, url_photo, id_salle, nom_salle, coord_x, coord_y, num_etage, fonctionnalites,
+    ):
+        self.id_objet = id_objet
+        self.nom_model = nom_model
+        self.nom_marque = nom_marque
+        self.type_objet = type_objet
+        self.description = description
+        self.mac_adresse = mac_adresse
+        self.ip_adress = ip_adress
+        self.statut = statut
+        self.url_photo = url_photo
+        self.id_salle = id_salle
+        self.nom_salle = nom_salle
+        self.coord_x = coord_x
+        self.coord_y = coord_y
+        self.num_etage = num_etage
+        self.fonctionnalites: Tuple[FonctionRef, ...] = fonctionnalites
+        self.distance_m: Optional[float] = None
+        self.waiting_count = 0
+        self.popularity_score: Optional[float] = None
+        self.relevance_score: Optional[float] = None
+
+    def __repr__(self) -> str:
+        return f"SearchCandidate(id_objet={self.id_objet!r}, type_objet={self.type_objet!r})"
+
+
+class _CandidateFields(NamedTuple):
+    type_objet: str
+    statut: str
+    nom_marque: str
+    fonctions: FrozenSet[str]
+
+
+class _CatalogSnapshot:
+    """Distinct types/brands/functions plus their normalized maps, valid for one data version."""
+
+    __slots__ = ("version", "types", "marques", "fonctions", "type_map", "marque_map", "fonction_map", "matcher")
+
+    def __init__(self, version: int, types: List[str], marques: List[str], fonctions: List[str]):
+        self.version = version
+        self.types = types
+        self.marques = marques
+        self.fonctions = fonctions
+        self.type_map = _normalized_type_map(types)
+        self.marque_map = _normalized_value_map(marques)
+        self.fonction_map = _normalized_value_map(fonctions)
+        self.matcher: Optional[QueryMatcher] = None
+
+
+_spacy_lock = threading.Lock()
+_spacy_pipeline = None
+_spacy_loaded = False
+
+
+def _get_spacy_pipeline():
+    """Loads the trimmed pipeline on first use, once per process (shared by all engines)."""
+    global _spacy_pipeline, _spacy_loaded
+    if _spacy_loaded:
+        return _spacy_pipeline
+
+    with _spacy_lock:
+        if not _spacy_loaded:
+            # Imported here too: `import spacy` alone costs about a second at worker start
+            try:
+                import spacy
+            except Exception:
+                spacy = None
+
+            if spacy is None:
+                print("⚠️ spaCy non installé. NLP avancé désactivé.")
+            else:
+                try:
+                    _spacy_pipeline = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDED_COMPONENTS)
+                except Exception:
+                    print(f"⚠️ Modèle spaCy {SPACY_MODEL} non trouvé. NLP avancé partiellement désactivé.")
+            _spacy_loaded = True
+    return _spacy_pipeline
+
+
+_lemma_table_lock = threading.Lock()
+_lemma_table: Optional[LemmaTable] = None
+_lemma_table_loaded = False
+
+
+def _get_lemma_table() -> Optional[LemmaTable]:
+    global _lemma_table, _lemma_table_loaded
+    if _lemma_table_loaded:
+        return _lemma_table
+
+    with _lemma_table_lock:
+        if not _lemma_table_loaded:
+            if os.path.exists(LEMMA_TABLE_PATH):
+                try:
+                    _lemma_table = LemmaTable(LEMMA_TABLE_PATH)
+                except (OSError, ValueError) as exc:
+                    print(f"⚠️ Table de lemmes illisible ({exc}). Repli sur spaCy.")
+            _lemma_table_loaded = True
+    return _lemma_table
+
+
+class ParsedQuery(NamedTuple):
+    """Front half of a search (NLP, filters, autocorrect, expansion); shared read-only via the cache."""
+
+    tokens: List[str]
+    nlp_filters: Mapping[str, object]
+    cleaned_terms: List[str]
+    corrected_terms: List[str]
+    corrections: Mapping[str, str]
+    expanded_terms: List[str]
+    inferred_type: Optional[str]
+    query_clean: str
+
+
+class SearchPage(NamedTuple):
+    items: List["SearchCandidate"]
+    # Matches before pagination; an upper-bound estimate when exact is False (top-k pruning)
+    total: int
+    exact: bool
+    offset: int
+
+    @property
+    def next_offset(self) -> Optional[int]:
+        end = self.offset + len(self.items)
+        return end if self.items and end < self.total else None
+
+
+def search_fingerprint(params: Mapping[str, object]) -> str:
+    # Ties a pagination cursor to the query and filters it was issued for
+    canonical = "&".join(f"{key}={'' if value is None else value}" for key, value in sorted(params.items()))
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:12]
+
+
+def encode_search_cursor(offset: int, fingerprint: str) -> str:
+    return base64.urlsafe_b64encode(f"{offset}:{fingerprint}".encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_search_cursor(cursor: str, fingerprint: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        offset_text, cursor_fingerprint = raw.split(":", 1)
+        offset = int(offset_text)
+    except ValueError:
+        raise ValueError("Curseur de pagination invalide")
+    if offset < 0 or cursor_fingerprint != fingerprint:
+        raise ValueError("Curseur de pagination invalide pour cette recherche")
+    return offset
+
+
+def _query_cache_key(raw_query: str) -> str:
+    # Case, accents and spacing do not change the parse
+    return " ".join(_normalize_text(raw_query).split())
+
+
 def _clean_noise_terms(terms: List[str]) -> List[str]:
     cleaned: List[str] = []
     seen: Set[str] = set()
@@ -196,17 +421,15 @@ def _clean_noise_terms(terms: List[str]) -> List[str]:
 
 
 class SmartSearchEngine:
-    def __init__(self):
+    def __init__(
+        self,
+        use_index: bool = SEARCH_INDEX_ENABLED,
+        tokenizer_mode: str = TOKENIZER_MODE,
+        session_factory: Optional[Callable[[], Session]] = None,
+    ):
         print("⚡ Chargement du Moteur de Recherche (NLP + Hybrid Ranking)...")
-        self.nlp = None
-
-        if spacy is not None:
-            try:
-                self.nlp = spacy.load("fr_core_news_sm")
-            except Exception:
-                print("⚠️ Modèle spaCy fr_core_news_sm non trouvé. NLP avancé partiellement désactivé.")
-        else:
-            print("⚠️ spaCy non installé. NLP avancé désactivé.")
+        # spaCy is loaded on the first query that needs it (see _get_spacy_pipeline)
+        self.tokenizer_mode = tokenizer_mode if tokenizer_mode in {"auto", "spacy", "table", "rules"} else "auto"
 
         self.type_alias_to_canonical: Dict[str, str] = {}
         for canonical, aliases in TYPE_KEYWORDS.items():
@@ -214,21 +437,92 @@ class SmartSearchEngine:
             for alias in aliases:
                 self.type_alias_to_canonical[_normalize_text(alias)] = canonical
 
+        self.status_patterns: List[Tuple[str, str]] = [
+            (_normalize_text(keyword), canonical)
+            for canonical, keywords in STATUS_KEYWORDS.items()
+            for keyword in keywords
+        ]
+
+        # Words a lemmatizer would leave unchanged or drop: "auto" mode tokenizes them without spaCy
+        self._rule_keywords: Set[str] = set(NOISE_TERMS)
+        for alias in self.type_alias_to_canonical:
+            self._rule_keywords.update(_split_words(alias))
+        for keyword, _ in self.status_patterns:
+            self._rule_keywords.update(_split_words(keyword))
+
         self.intent_patterns: Dict[str, List[re.Pattern]] = {
             canonical: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
             for canonical, patterns in TYPE_INTENT_PATTERNS.items()
         }
 
-        self._vocab_cache_at = 0.0
-        self._vocab_cache_terms: List[str] = []
+        # (data version, value) pairs, swapped atomically
+        self._vocab_cache: Optional[Tuple[int, List[str]]] = None
+        self._correction_index: Optional[Tuple[int, CorrectionIndex]] = None
+
+        self.index: Optional[InvertedIndex] = InvertedIndex() if use_index else None
+        self._index_build_lock = threading.Lock()
+
+        # Bumped on every object/function write; metadata caches are keyed on it (no TTL)
+        self._data_version = 0
+        self._catalog: Optional[_CatalogSnapshot] = None
+        self._catalog_lock = threading.Lock()
+        self._suggest_cache: Optional[Tuple[int, SuggestionIndex, List[int]]] = None
+        self._spatial_cache: Optional[Tuple[int, SpatialIndex]] = None
+        # Rebuilt per data version; status changes are patched in place (objet_status_changed)
+        self._nearest_cache: Optional[Tuple[int, NearestIndex]] = None
+        # Rebuilt when the rooms (ids, coordinates, floor heights) change, not on every data version
+        self._room_matrix: Optional[RoomDistanceMatrix] = None
+        self._nearest_lock = threading.Lock()
+        self.query_cache: LRUCache[ParsedQuery] = LRUCache(QUERY_CACHE_SIZE)
+        # Ranked results; invalidated per object by refresh_objet / objet_status_changed / forget_objet
+        self.result_cache: ResultCache[Tuple[List[SearchCandidate], int, bool]] = ResultCache(RESULT_CACHE_MAX_BYTES)
+        # Writes of the other workers: the hooks above bump search_versions (through session_factory)
+        # and every search compares it with the last value seen here before reading the result cache
+        self.session_factory = session_factory
+        self._shared_version: Optional[int] = None
+        # Identical searches/suggestions in flight at the same time are computed once
+        self.search_flight = SingleFlight()
+        self.suggest_flight = SingleFlight()
+
+    @property
+    def nlp(self):
+        if self.tokenizer_mode == "rules":
+            return None
+        return _get_spacy_pipeline()
+
+    @property
+    def lemma_table(self) -> Optional[LemmaTable]:
+        if self.tokenizer_mode != "table":
+            return None
+        return _get_lemma_table()
+
+    def _needs_lemmas(self, query: str) -> bool:
+        if self.tokenizer_mode != "auto":
+            return self.tokenizer_mode != "rules"
+
+        words = _split_words(query)
+        if not words:
+            return False
+        if len(words) == 1 and len(words[0]) <= 3:
+            return False
+        return not all(word.isdigit() or word in self._rule_keywords for word in words)
 
     def _extract_tokens(self, query: str) -> List[str]:
         query = (query or "").strip()
         if not query:
             return []
 
-        if self.nlp:
-            doc = self.nlp(query)
+        if not self._needs_lemmas(query):
+            return _split_words(query)
+
+        table = self.lemma_table
+        if table is not None:
+            terms = self._tokens_from_lemma_table(query, table)
+            return terms or _split_words(query)
+
+        nlp = self.nlp
+        if nlp:
+            doc = nlp(query)
             terms: List[str] = []
             for token in doc:
                 if token.is_space or token.is_punct:
@@ -256,32 +550,79 @@ class SmartSearchEngine:
 
         return _split_words(query)
 
-    def _load_available_types(self, db: Session) -> List[str]:
+    @staticmethod
+    def _tokens_from_lemma_table(query: str, table: LemmaTable) -> List[str]:
+        # Same rules as the spaCy loop above, one table lookup per word (elisions looked up as "d'")
+        terms: List[str] = []
+        for word in REGEX_LEMMA_WORD.findall(_normalize_text(query).replace("’", "'")):
+            entry = table.lookup(word)
+            if entry is None:
+                terms.append(word.rstrip("'"))
+                continue
+
+            lemma, flags = entry
+            if flags & FLAG_NUM:
+                terms.append(word.rstrip("'"))
+            elif not flags & FLAG_STOP:
+                terms.extend(lemma.split())
+        return terms
+
+    @staticmethod
+    def _load_distinct_values(db: Session, column) -> List[str]:
         rows = (
-            db.query(models.Objet.type_objet)
-            .filter(models.Objet.type_objet.isnot(None))
+            db.query(column)
+            .filter(column.isnot(None))
             .distinct()
             .all()
         )
         return [str(row[0]).strip() for row in rows if row and row[0]]
 
+    def _load_available_types(self, db: Session) -> List[str]:
+        return self._load_distinct_values(db, models.Objet.type_objet)
+
     def _load_available_marques(self, db: Session) -> List[str]:
-        rows = (
-            db.query(models.Objet.nom_marque)
-            .filter(models.Objet.nom_marque.isnot(None))
-            .distinct()
-            .all()
-        )
-        return [str(row[0]).strip() for row in rows if row and row[0]]
+        return self._load_distinct_values(db, models.Objet.nom_marque)
 
     def _load_available_fonctions(self, db: Session) -> List[str]:
-        rows = (
-            db.query(models.Fonctionnalite.nom)
-            .filter(models.Fonctionnalite.nom.isnot(None))
-            .distinct()
-            .all()
-        )
-        return [str(row[0]).strip() for row in rows if row and row[0]]
+        return self._load_distinct_values(db, models.Fonctionnalite.nom)
+
+    @property
+    def data_version(self) -> int:
+        return self._data_version
+
+    def bump_data_version(self):
+        """Invalidate catalog-derived caches after a write on objects or functions."""
+        with self._catalog_lock:
+            self._data_version += 1
+
+    def _get_catalog(self, db: Session) -> _CatalogSnapshot:
+        catalog = self._catalog
+        if catalog is not None and catalog.version == self._data_version:
+            return catalog
+
+        with self._catalog_lock:
+            version = self._data_version
+            catalog = self._catalog
+            if catalog is None or catalog.version != version:
+                catalog = _CatalogSnapshot(
+                    version,
+                    self._load_available_types(db),
+                    self._load_available_marques(db),
+                    self._load_available_fonctions(db),
+                )
+                self._catalog = catalog
+        return catalog
+
+    def _get_query_matcher(self, catalog: _CatalogSnapshot) -> QueryMatcher:
+        # One automaton per catalog (data version) for aliases, statuses, brands and functions
+        if catalog.matcher is None:
+            catalog.matcher = QueryMatcher({
+                "status": self.status_patterns,
+                "type": list(self.type_alias_to_canonical.items()),
+                "marque": [(n, v) for n, v in catalog.marque_map.items() if len(n) >= 3],
+                "fonction": [(n, v) for n, v in catalog.fonction_map.items() if len(n) >= 3],
+            })
+        return catalog.matcher
 
     @staticmethod
     def _best_value_from_query(
@@ -289,22 +630,27 @@ class SmartSearchEngine:
         normalized_query: str,
         values: List[str],
         score_cutoff: float = 88.0,
+        normalized_map: Optional[Dict[str, str]] = None,
+        hits: Optional[QueryHits] = None,
+        kind: str = "",
     ) -> Optional[str]:
         if not values:
             return None
 
-        normalized_map = {
-            _normalize_text(value): value
-            for value in values
-            if _normalize_text(value)
-        }
+        if normalized_map is None:
+            normalized_map = _normalized_value_map(values)
 
         if not normalized_map:
             return None
 
-        for normalized_value, original_value in normalized_map.items():
-            if len(normalized_value) >= 3 and normalized_value in normalized_query:
-                return original_value
+        if hits is not None:
+            direct_hit = hits.first(kind)
+            if direct_hit:
+                return direct_hit
+        else:
+            for normalized_value, original_value in normalized_map.items():
+                if len(normalized_value) >= 3 and normalized_value in normalized_query:
+                    return original_value
 
         best_value = None
         best_score = 0.0
@@ -334,11 +680,16 @@ class SmartSearchEngine:
         return best_value
 
     @staticmethod
-    def _resolve_to_available_type(canonical_type: str, available_types: List[str]) -> str:
+    def _resolve_to_available_type(
+        canonical_type: str,
+        available_types: List[str],
+        normalized_map: Optional[Dict[str, str]] = None,
+    ) -> str:
         if not canonical_type or not available_types:
             return canonical_type
 
-        normalized_map = {_normalize_text(t): t for t in available_types}
+        if normalized_map is None:
+            normalized_map = _normalized_type_map(available_types)
         target = _normalize_text(canonical_type)
 
         if target in normalized_map:
@@ -363,13 +714,14 @@ class SmartSearchEngine:
         self,
         normalized_query: str,
         available_types: List[str],
+        normalized_map: Optional[Dict[str, str]] = None,
     ) -> Optional[str]:
         if not normalized_query:
             return None
 
         for canonical, patterns in self.intent_patterns.items():
             if patterns and any(pattern.search(normalized_query) for pattern in patterns):
-                return self._resolve_to_available_type(canonical, available_types)
+                return self._resolve_to_available_type(canonical, available_types, normalized_map)
 
         return None
 
@@ -378,13 +730,22 @@ class SmartSearchEngine:
         terms: List[str],
         available_types: List[str],
         normalized_query: str,
+        normalized_map: Optional[Dict[str, str]] = None,
+        hits: Optional[QueryHits] = None,
     ) -> Optional[str]:
-        # Direct alias phrase hit in full query (example: "i want print")
-        for alias, canonical in self.type_alias_to_canonical.items():
-            if alias and alias in normalized_query:
-                return self._resolve_to_available_type(canonical, available_types)
+        normalized_available_map = normalized_map
+        if normalized_available_map is None:
+            normalized_available_map = _normalized_type_map(available_types)
 
-        normalized_available_map = {_normalize_text(t): t for t in available_types}
+        # Direct alias phrase hit in full query (example: "i want print")
+        if hits is not None:
+            canonical = hits.first("type")
+            if canonical:
+                return self._resolve_to_available_type(canonical, available_types, normalized_available_map)
+        else:
+            for alias, canonical in self.type_alias_to_canonical.items():
+                if alias and alias in normalized_query:
+                    return self._resolve_to_available_type(canonical, available_types, normalized_available_map)
 
         best_type = None
         best_score = 0.0
@@ -396,7 +757,7 @@ class SmartSearchEngine:
 
             if n_term in self.type_alias_to_canonical:
                 canonical = self.type_alias_to_canonical[n_term]
-                return self._resolve_to_available_type(canonical, available_types)
+                return self._resolve_to_available_type(canonical, available_types, normalized_available_map)
 
             if n_term in normalized_available_map:
                 return normalized_available_map[n_term]
@@ -420,15 +781,21 @@ class SmartSearchEngine:
         available_types: List[str],
         available_marques: List[str],
         available_fonctions: List[str],
+        catalog: Optional[_CatalogSnapshot] = None,
     ) -> Tuple[Dict[str, object], List[str]]:
+        if catalog is None:
+            catalog = _CatalogSnapshot(-1, available_types, available_marques, available_fonctions)
+
         filters: Dict[str, object] = {}
         normalized_query = _normalize_text(query)
+        hits = self._get_query_matcher(catalog).scan(normalized_query)
 
-        normalized_tokens = [_normalize_text(t) for t in tokens if _normalize_text(t)]
+        normalized_tokens = [n for n in map(_normalize_text, tokens) if n]
         token_set: Set[str] = set(normalized_tokens)
 
+        matched_statuses = {value for _, _, _, value in hits.all("status")}
         for canonical_status, keywords in STATUS_KEYWORDS.items():
-            if any(kw in normalized_query for kw in keywords) or any(kw in token_set for kw in keywords):
+            if canonical_status in matched_statuses or not token_set.isdisjoint(keywords):
                 filters["statut"] = canonical_status
                 break
 
@@ -445,17 +812,26 @@ class SmartSearchEngine:
 
         cleaned_terms = _clean_noise_terms(normalized_tokens)
 
-        inferred_type = self._infer_type_from_intent_patterns(normalized_query, available_types)
+        inferred_type = self._infer_type_from_intent_patterns(normalized_query, catalog.types, catalog.type_map)
         if not inferred_type:
-            inferred_type = self._infer_type_from_terms(cleaned_terms or normalized_tokens, available_types, normalized_query)
+            inferred_type = self._infer_type_from_terms(
+                cleaned_terms or normalized_tokens,
+                catalog.types,
+                normalized_query,
+                catalog.type_map,
+                hits,
+            )
         if inferred_type:
             filters["type_objet"] = inferred_type
 
         inferred_marque = self._best_value_from_query(
             cleaned_terms or normalized_tokens,
             normalized_query,
-            available_marques,
+            catalog.marques,
             score_cutoff=90,
+            normalized_map=catalog.marque_map,
+            hits=hits,
+            kind="marque",
         )
         if inferred_marque:
             filters["nom_marque"] = inferred_marque
@@ -463,8 +839,11 @@ class SmartSearchEngine:
         inferred_fonction = self._best_value_from_query(
             cleaned_terms or normalized_tokens,
             normalized_query,
-            available_fonctions,
+            catalog.fonctions,
             score_cutoff=90,
+            normalized_map=catalog.fonction_map,
+            hits=hits,
+            kind="fonction",
         )
         if inferred_fonction:
             filters["fonction"] = inferred_fonction
@@ -472,9 +851,13 @@ class SmartSearchEngine:
         return filters, cleaned_terms
 
     def _load_domain_vocabulary(self, db: Session) -> List[str]:
-        now = time.time()
-        if self._vocab_cache_terms and (now - self._vocab_cache_at) < 45:
-            return self._vocab_cache_terms
+        return self._vocabulary_snapshot(db)[1]
+
+    def _vocabulary_snapshot(self, db: Session) -> Tuple[int, List[str]]:
+        version = self._data_version
+        cached = self._vocab_cache
+        if cached is not None and cached[0] == version:
+            return cached
 
         terms: Set[str] = set()
 
@@ -530,11 +913,27 @@ class SmartSearchEngine:
             if alias and len(alias) >= 3:
                 terms.add(alias)
 
-        self._vocab_cache_terms = sorted(terms)
-        self._vocab_cache_at = now
-        return self._vocab_cache_terms
-
-    def _autocorrect_terms(self, terms: List[str], vocabulary: List[str]) -> Tuple[List[str], Dict[str, str]]:
+        snapshot = (version, sorted(terms))
+        self._vocab_cache = snapshot
+        return snapshot
+
+    def _get_correction_index(self, db: Session) -> CorrectionIndex:
+        # Keyed on the vocabulary's version: an index built from an older vocabulary by a
+        # slower thread is rebuilt instead of outliving the bump
+        version, vocabulary = self._vocabulary_snapshot(db)
+        cached = self._correction_index
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        correction_index = CorrectionIndex(vocabulary, scorer=fuzz.WRatio)
+        self._correction_index = (version, correction_index)
+        return correction_index
+
+    def _autocorrect_terms(
+        self,
+        terms: List[str],
+        vocabulary: List[str],
+        correction_index: Optional[CorrectionIndex] = None,
+    ) -> Tuple[List[str], Dict[str, str]]:
         if not terms or not vocabulary:
             return terms, {}
 
@@ -550,16 +949,21 @@ class SmartSearchEngine:
                 corrected_terms.append(normalized)
                 continue
 
-            if normalized in vocabulary:
-                corrected_terms.append(normalized)
-                continue
-
-            best = process.extractOne(
-                normalized,
-                vocabulary,
-                scorer=fuzz.WRatio,
-                score_cutoff=84,
-            )
+            if correction_index is not None:
+                if normalized in correction_index:
+                    corrected_terms.append(normalized)
+                    continue
+                best = correction_index.best_match(normalized, score_cutoff=84)
+            else:
+                if normalized in vocabulary:
+                    corrected_terms.append(normalized)
+                    continue
+                best = process.extractOne(
+                    normalized,
+                    vocabulary,
+                    scorer=fuzz.WRatio,
+                    score_cutoff=84,
+                )
 
             if best:
                 candidate = _normalize_text(best[0])
@@ -592,30 +996,290 @@ class SmartSearchEngine:
         return expanded
 
     @staticmethod
-    def _distance_from_user(obj) -> float:
-        salle = getattr(obj, "salle", None)
-        if not salle:
+    def _distance_from_user(
+        candidate: SearchCandidate,
+        origin: Origin = LEGACY_ORIGIN,
+        spatial: Optional[SpatialIndex] = None,
+    ) -> float:
+        x = candidate.coord_x
+        y = candidate.coord_y
+        if x is None or y is None:
             return float("inf")
 
-        x = getattr(salle, "coord_x", None)
-        y = getattr(salle, "coord_y", None)
+        # Floor elevations come from the spatial index; without one the distance stays planar
+        dz = spatial.vertical_offset(origin, candidate.num_etage) if spatial is not None else 0.0
+        return math.sqrt(((float(x) - origin.x) ** 2) + ((float(y) - origin.y) ** 2) + dz ** 2)
+
+    def _get_spatial_index(self, db: Session) -> SpatialIndex:
+        version = self._data_version
+        cached = self._spatial_cache
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        spatial = SpatialIndex.load(db)
+        self._spatial_cache = (version, spatial)
+        return spatial
+
+    def resolve_origin(
+        self,
+        db: Session,
+        salle_id: Optional[int] = None,
+        x: Optional[float] = None,
+        y: Optional[float] = None,
+        num_etage: Optional[int] = None,
+    ) -> Optional[Origin]:
+        """User position from a room id or x/y (+ floor); None keeps the legacy (0, 0) origin."""
+        if salle_id is not None:
+            origin = self._get_spatial_index(db).origin_for_room(salle_id)
+            if origin is None:
+                raise ValueError("Salle d'origine inconnue ou sans coordonnées")
+            return origin
+        if x is None and y is None:
+            if num_etage is not None:
+                raise ValueError("origin_etage demande aussi origin_x et origin_y")
+            return None
         if x is None or y is None:
-            return float("inf")
+            raise ValueError("origin_x et origin_y vont ensemble")
+        return Origin(float(x), float(y), num_etage)
 
-        origin_x = 0.0
-        origin_y = 0.0
+    def distance_m(
+        self,
+        db: Session,
+        origin: Optional[Origin],
+        x: Optional[float],
+        y: Optional[float],
+        num_etage: Optional[int],
+    ) -> Optional[float]:
+        if x is None or y is None:
+            return None
+        if origin is None:
+            origin, spatial = LEGACY_ORIGIN, None
+        else:
+            spatial = self._get_spatial_index(db)
+        dz = spatial.vertical_offset(origin, num_etage) if spatial is not None else 0.0
+        return math.sqrt(((float(x) - origin.x) ** 2) + ((float(y) - origin.y) ** 2) + dz ** 2)
+
+    @classmethod
+    def _is_available(cls, statut: Optional[str]) -> bool:
+        return cls._availability_score(statut) == 100.0
+
+    def _nearest_key(self, kind: str, value: str) -> Key:
+        normalized = _normalize_text(value)
+        if kind == "type":
+            # "printer" -> "Imprimante", as in the search filters
+            normalized = _normalize_text(self.type_alias_to_canonical.get(normalized, value))
+        return kind, normalized
+
+    def _get_nearest_index(self, db: Session) -> NearestIndex:
+        version = self._data_version
+        cached = self._nearest_cache
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        with self._nearest_lock:
+            cached = self._nearest_cache
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+            association = models.association_objet_fonction
+            fonction_rows = (
+                db.query(association.c.id_objet, models.Fonctionnalite.nom)
+                .join(models.Fonctionnalite, models.Fonctionnalite.id == association.c.id_fonction)
+                .all()
+            )
+            keys_by_objet: Dict[int, List[Key]] = {}
+            for object_id, nom in fonction_rows:
+                if nom:
+                    keys_by_objet.setdefault(int(object_id), []).append(("fonction", _normalize_text(nom)))
+
+            availability = AvailabilityIndex()
+            rows = db.query(
+                models.Objet.id_objet, models.Objet.id_salle, models.Objet.type_objet, models.Objet.statut,
+            ).all()
+            for object_id, id_salle, type_objet, statut in rows:
+                keys = keys_by_objet.get(int(object_id), [])
+                if type_objet:
+                    keys.append(("type", _normalize_text(type_objet)))
+                availability.upsert(int(object_id), id_salle, keys, self._is_available(statut))
+
+            nearest = NearestIndex(self._get_room_matrix(self._get_spatial_index(db)), availability)
+            self._nearest_cache = (version, nearest)
+        return nearest
+
+    def _get_room_matrix(self, spatial: SpatialIndex) -> RoomDistanceMatrix:
+        matrix = self._room_matrix
+        if matrix is None or matrix.key != RoomDistanceMatrix.rooms_key(spatial):
+            matrix = RoomDistanceMatrix(spatial)
+            self._room_matrix = matrix
+        return matrix
+
+    def objet_status_changed(self, objet_id: int, statut: Optional[str]):
+        """
+        After a status or reservation-queue write: update the nearest-available index and
+        drop the cached results that ranked the object or filter on its new status.
+        """
+        self.objets_status_changed([(objet_id, statut)])
+
+    def objets_status_changed(self, changes: Iterable[Tuple[int, Optional[str]]]):
+        """objet_status_changed for a batch, published to the other workers once."""
+        cached = self._nearest_cache
+        for objet_id, statut in changes:
+            self.result_cache.invalidate(ObjectProbe(objet_id, _normalize_text(statut)))
+            if cached is not None:
+                cached[1].set_available(objet_id, self._is_available(statut))
+        self._publish_write()
+
+    def _publish_write(self):
+        """Bump search_versions after a committed write so the other workers drop their cached results."""
+        if self.session_factory is None:
+            return
+        db = self.session_factory()
+        try:
+            version = db.execute(
+                update(models.SearchVersion)
+                .where(models.SearchVersion.id == SHARED_VERSION_ID)
+                .values(version=models.SearchVersion.version + 1)
+                .returning(models.SearchVersion.version)
+            ).scalar()
+            if version is None:
+                version = 1
+                db.add(models.SearchVersion(id=SHARED_VERSION_ID, version=version))
+            db.commit()
+        except SQLAlchemyError as exc:
+            db.rollback()
+            print(f"⚠️ Version partagée de la recherche non publiée ({exc}). Les autres workers gardent leur cache.")
+            return
+        finally:
+            db.close()
+        # Only this write since the last version seen: the per-object invalidation above covered it
+        if self._shared_version == version - 1:
+            self._shared_version = version
+
+    def _sync_shared_version(self, db: Session):
+        """Clear the result cache when another worker wrote since the last search (one primary-key read)."""
+        if self.result_cache.max_bytes == 0:
+            return
+        try:
+            with db.begin_nested():
+                version = db.execute(
+                    select(models.SearchVersion.version).where(models.SearchVersion.id == SHARED_VERSION_ID)
+                ).scalar()
+        except SQLAlchemyError:
+            version = None
+            self._shared_version = None
+            self.result_cache.clear()
+            return
+        version = version or 0
+        if version != self._shared_version:
+            self._shared_version = version
+            self.result_cache.clear()
+
+    def nearest_available(
+        self,
+        db: Session,
+        origin_salle: int,
+        type_objet: Optional[str] = None,
+        fonction: Optional[str] = None,
+        k: int = 5,
+    ) -> List[SearchCandidate]:
+        """
+        The k available objects of a type and/or with a function closest to a room, by
+        walking distance (room matrix, floors penalized); no text parsing or ranking.
+        """
+        if not type_objet and not fonction:
+            raise ValueError("Préciser un type ou une fonction")
+        nearest = self._get_nearest_index(db)
+        if origin_salle not in nearest.matrix:
+            raise ValueError("Salle d'origine inconnue ou sans coordonnées")
+
+        keys = []
+        if type_objet:
+            keys.append(self._nearest_key("type", type_objet))
+        if fonction:
+            keys.append(self._nearest_key("fonction", fonction))
+        key, also = keys[0], (keys[1] if len(keys) > 1 else None)
+
+        while True:
+            hits = nearest.nearest(origin_salle, key, k, also)
+            # Objects freed outside this process (no hook) that would rank among these k
+            radius = hits[-1][0] if len(hits) >= k else math.inf
+            held = nearest.held_within(origin_salle, key, radius, also)
+            if held:
+                freed = [
+                    object_id for object_id, statut in
+                    db.query(models.Objet.id_objet, models.Objet.statut).filter(models.Objet.id_objet.in_(held))
+                    if self._is_available(statut)
+                ]
+                for object_id in freed:
+                    nearest.set_available(object_id, True)
+                if freed:
+                    continue
+
+            candidates = {c.id_objet: c for c in self._load_candidates(db, [object_id for _, object_id in hits])}
+            found: List[SearchCandidate] = []
+            stale = False
+            for distance, object_id in hits:
+                candidate = candidates.get(object_id)
+                # Status written outside this process (or deleted): drop it and ask again
+                if candidate is None or not self._is_available(candidate.statut):
+                    nearest.set_available(object_id, False)
+                    stale = True
+                    continue
+                candidate.distance_m = round(distance, 2)
+                found.append(candidate)
+            if not stale:
+                return found
 
-        return math.sqrt(((float(x) - origin_x) ** 2) + ((float(y) - origin_y) ** 2))
+    @staticmethod
+    def _origin_distance_order(origin: Origin, spatial: Optional[SpatialIndex]):
+        # Squared distance to the origin in SQL (rooms without coordinates last)
+        dx = models.Salle.coord_x - origin.x
+        dy = models.Salle.coord_y - origin.y
+        squared = dx * dx + dy * dy
+        if spatial is not None and origin.num_etage is not None and spatial.elevations:
+            squared = squared + case(
+                {num_etage: spatial.vertical_offset(origin, num_etage) ** 2 for num_etage in spatial.elevations},
+                value=models.Salle.num_etage,
+                else_=0.0,
+            )
+        return func.coalesce(squared, 1e30).label("origin_distance")
+
+    @staticmethod
+    def _candidate_id_statement(sql, limit: int, distance_order=None, rank_order=None):
+        orders = [order for order in (distance_order, rank_order) if order is not None]
+        if not orders:
+            return sql.distinct().limit(limit).statement
+        # Nearest- / best-ranked-first cap: the `limit` best matches, not an arbitrary `limit` of them
+        ranked = (
+            sql.add_columns(*orders)
+            .distinct()
+            .order_by(*orders, models.Objet.id_objet)
+            .limit(limit)
+            .subquery()
+        )
+        return select(ranked.c.id_objet)
 
     @staticmethod
-    def _availability_score(status: Optional[str]) -> float:
-        normalized = _normalize_text(status)
+    def _index_rank_table(object_ids: List[int]):
+        """(id_objet, position) rows of the index's ranked candidates, joined instead of an IN list."""
+        return values(
+            column("id_objet", Integer), column("position", Integer), name="index_rank",
+        ).data([(object_id, position) for position, object_id in enumerate(object_ids)]).cte("index_rank")
+
+    @classmethod
+    def _availability_score(cls, status: Optional[str]) -> float:
+        return cls._availability_from_normalized(_normalize_text(status))
+
+    @staticmethod
+    def _availability_from_normalized(normalized: str) -> float:
         if "dispon" in normalized or normalized == "available":
             return 100.0
         if "occup" in normalized or "reserve" in normalized or "busy" in normalized:
             return 45.0
         if "panne" in normalized or "signal" in normalized or "error" in normalized:
             return 10.0
+        if "hors ligne" in normalized or "offline" in normalized:
+            return 5.0
         return 30.0
 
     @staticmethod
@@ -625,80 +1289,551 @@ class SmartSearchEngine:
         return max(0.0, 100.0 - (min(distance_value, 5000.0) / 50.0))
 
     @staticmethod
-    def _build_haystack(obj: models.Objet) -> str:
-        fonctionnalites = " ".join([f.nom for f in (obj.fonctionnalites or []) if f and f.nom])
-        salle_nom = obj.salle.nom_salle if obj.salle and obj.salle.nom_salle else ""
+    def _haystack_from_fields(
+        type_objet: Optional[str],
+        nom_marque: Optional[str],
+        nom_model: Optional[str],
+        description: Optional[str],
+        salle_nom: Optional[str],
+        fonctionnalites: List[str],
+    ) -> str:
         return (
-            f"{obj.type_objet or ''} "
-            f"{obj.nom_marque or ''} "
-            f"{obj.nom_model or ''} "
-            f"{obj.description or ''} "
-            f"{salle_nom} "
-            f"{fonctionnalites}"
+            f"{type_objet or ''} "
+            f"{nom_marque or ''} "
+            f"{nom_model or ''} "
+            f"{description or ''} "
+            f"{salle_nom or ''} "
+            f"{' '.join(fonctionnalites)}"
         ).lower().strip()
 
-    def _load_waiting_counts(self, db: Session, object_ids: List[int]) -> Dict[int, int]:
-        if not object_ids:
-            return {}
+    @classmethod
+    def _candidate_haystack(cls, candidate: SearchCandidate) -> str:
+        return cls._haystack_from_fields(
+            candidate.type_objet,
+            candidate.nom_marque,
+            candidate.nom_model,
+            candidate.description,
+            candidate.nom_salle or "",
+            [f.nom for f in candidate.fonctionnalites if f.nom],
+        )
 
-        status_upper = func.upper(func.coalesce(models.Reservation.statut_reservation, ""))
+    @staticmethod
+    def _candidate_fields(obj: SearchCandidate) -> "_CandidateFields":
+        # Normalized once per candidate for the availability score and the filter bonuses
+        return _CandidateFields(
+            _normalize_text(obj.type_objet),
+            _normalize_text(obj.statut),
+            _normalize_text(obj.nom_marque),
+            frozenset(_normalize_text(f.nom) for f in (obj.fonctionnalites or []) if f and f.nom),
+        )
+
+    @classmethod
+    def _build_haystack(cls, obj: models.Objet) -> str:
+        fonctionnalites = [f.nom for f in (obj.fonctionnalites or []) if f and f.nom]
+        salle_nom = obj.salle.nom_salle if obj.salle and obj.salle.nom_salle else ""
+        return cls._haystack_from_fields(
+            obj.type_objet,
+            obj.nom_marque,
+            obj.nom_model,
+            obj.description,
+            salle_nom,
+            fonctionnalites,
+        )
+
+    def _load_index_documents(self, db: Session) -> List[Tuple[int, str]]:
         rows = (
-            db.query(models.Reservation.id_objet, func.count(models.Reservation.id))
-            .filter(
-                models.Reservation.id_objet.in_(object_ids),
-                status_upper.in_(list(WAITING_STATUSES)),
+            db.query(
+                models.Objet.id_objet,
+                models.Objet.type_objet,
+                models.Objet.nom_marque,
+                models.Objet.nom_model,
+                models.Objet.description,
+                models.Salle.nom_salle,
             )
-            .group_by(models.Reservation.id_objet)
+            .outerjoin(models.Salle, models.Objet.id_salle == models.Salle.id_salle)
             .all()
         )
-        return {int(object_id): int(count or 0) for object_id, count in rows}
 
-    def _load_popularity_counts(self, db: Session, object_ids: List[int]) -> Dict[int, int]:
-        if not object_ids:
-            return {}
+        association = models.association_objet_fonction
+        fonction_rows = (
+            db.query(association.c.id_objet, models.Fonctionnalite.nom)
+            .join(models.Fonctionnalite, models.Fonctionnalite.id == association.c.id_fonction)
+            .all()
+        )
+        fonctions_by_objet: Dict[int, List[str]] = {}
+        for object_id, nom in fonction_rows:
+            if nom:
+                fonctions_by_objet.setdefault(int(object_id), []).append(nom)
+
+        return [
+            (
+                int(object_id),
+                _normalize_text(self._haystack_from_fields(
+                    type_objet,
+                    nom_marque,
+                    nom_model,
+                    description,
+                    salle_nom,
+                    fonctions_by_objet.get(int(object_id), []),
+                )),
+            )
+            for object_id, type_objet, nom_marque, nom_model, description, salle_nom in rows
+        ]
 
-        status_upper = func.upper(func.coalesce(models.Reservation.statut_reservation, ""))
+    def _ensure_index(self, db: Session) -> bool:
+        if self.index is None:
+            return False
+        if self.index.ready:
+            return True
+
+        with self._index_build_lock:
+            if not self.index.ready:
+                try:
+                    documents = self._load_index_documents(db)
+                except SQLAlchemyError:
+                    return False
+                self.index.rebuild(documents)
+        return True
+
+    def refresh_objet(self, obj: models.Objet):
+        """Re-index an object after create/update (the text index is a no-op until built)."""
+        if obj is None:
+            return
+        haystack = _normalize_text(self._build_haystack(obj))
+        salle = obj.salle
+        self.result_cache.invalidate(ObjectProbe(
+            obj.id_objet,
+            _normalize_text(obj.statut),
+            full=True,
+            type_objet=_normalize_text(obj.type_objet),
+            nom_marque=_normalize_text(obj.nom_marque),
+            fonctions=frozenset(_normalize_text(f.nom) for f in (obj.fonctionnalites or []) if f and f.nom),
+            num_etage=salle.num_etage if salle else None,
+            id_salle=obj.id_salle,
+            nom_salle=_normalize_text(salle.nom_salle) if salle else "",
+            haystack=haystack,
+        ))
+        self._publish_write()
+        cached = self._nearest_cache
+        if cached is not None:
+            cached[1].set_available(obj.id_objet, self._is_available(obj.statut))
+        if self.index is None or not self.index.ready:
+            return
+        self.index.upsert(obj.id_objet, haystack)
+
+    def forget_objet(self, objet_id: int):
+        self.result_cache.invalidate(ObjectProbe(objet_id, ""))
+        self._publish_write()
+        if self.index is not None:
+            self.index.remove(objet_id)
+
+    def _index_candidate_ids(self, db: Session, terms: List[str]) -> Optional[List[int]]:
+        if not self._ensure_index(db):
+            return None
+
+        tokens = [_normalize_text(term) for term in terms]
+        return self.index.match_any([token for token in tokens if len(token) >= 2], limit=INDEX_CANDIDATE_CAP)
+
+    @staticmethod
+    def _use_search_document(db: Session) -> bool:
+        if not SEARCH_DOCUMENT_ENABLED:
+            return False
+        engine = db.get_bind()
+        return bool(engine) and engine.dialect.name == "postgresql"
+
+    @staticmethod
+    def _fonctions_aggregate(db: Session):
+        # (id, nom) pairs of an object's functions as one JSON array per row
+        pair_fields = ("id", models.Fonctionnalite.id, "nom", models.Fonctionnalite.nom)
+        if db.get_bind().dialect.name == "postgresql":
+            return func.json_agg(func.json_build_object(*pair_fields))
+        return func.json_group_array(func.json_object(*pair_fields))
+
+    def _load_candidates(self, db: Session, object_ids) -> List[SearchCandidate]:
+        """
+        One row per object among `object_ids` (ids, or a SELECT of ids): only the columns
+        ranking and ObjetResponse need, no joinedload row fan-out nor ORM identities.
+        """
+        association = models.association_objet_fonction
         rows = (
-            db.query(models.Reservation.id_objet, func.count(models.Reservation.id))
-            .filter(
-                models.Reservation.id_objet.in_(object_ids),
-                ~status_upper.in_(list(CANCELLED_STATUSES)),
+            db.query(
+                models.Objet.id_objet,
+                models.Objet.nom_model,
+                models.Objet.nom_marque,
+                models.Objet.type_objet,
+                models.Objet.description,
+                models.Objet.mac_adresse,
+                models.Objet.ip_adress,
+                models.Objet.statut,
+                models.Objet.url_photo,
+                models.Objet.id_salle,
+                models.Salle.nom_salle,
+                models.Salle.coord_x,
+                models.Salle.coord_y,
+                models.Salle.num_etage,
+                self._fonctions_aggregate(db),
             )
-            .group_by(models.Reservation.id_objet)
+            .outerjoin(models.Salle, models.Objet.id_salle == models.Salle.id_salle)
+            .outerjoin(association, association.c.id_objet == models.Objet.id_objet)
+            .outerjoin(models.Fonctionnalite, models.Fonctionnalite.id == association.c.id_fonction)
+            .filter(models.Objet.id_objet.in_(object_ids))
+            .group_by(models.Objet.id_objet, models.Salle.id_salle)
             .all()
         )
-        return {int(object_id): int(count or 0) for object_id, count in rows}
 
-    def _load_postgres_text_ranks(self, db: Session, object_ids: List[int], query_clean: str) -> Dict[int, float]:
-        if not object_ids or not query_clean:
-            return {}
+        candidates: List[SearchCandidate] = []
+        for row in rows:
+            pairs = row[14]
+            if isinstance(pairs, str):
+                pairs = json.loads(pairs)
+            fonctions = tuple(
+                FonctionRef(int(pair["id"]), pair["nom"])
+                for pair in pairs or ()
+                if pair and pair.get("id") is not None
+            )
+            candidates.append(SearchCandidate(*row[:14], fonctions))
+        return candidates
 
-        engine = db.get_bind()
-        if not engine or engine.dialect.name != "postgresql":
-            return {}
-
-        document = func.concat_ws(
-            " ",
-            func.coalesce(models.Objet.nom_model, ""),
-            func.coalesce(models.Objet.type_objet, ""),
-            func.coalesce(models.Objet.nom_marque, ""),
-            func.coalesce(models.Objet.description, ""),
-        )
+    def _load_candidate_features(
+        self,
+        db: Session,
+        object_ids: List[int],
+        query_clean: str,
+    ) -> Tuple[Dict[int, int], Dict[int, int], Dict[int, float]]:
+        """
+        Waiting count, popularity count and (Postgres only) text rank of the
+        candidates in a single grouped round trip.
+        """
+        if not object_ids:
+            return {}, {}, {}
 
-        ts_rank = func.ts_rank_cd(
-            func.to_tsvector("simple", document),
-            func.plainto_tsquery("simple", query_clean),
-        ).label("text_rank")
+        status_upper = func.upper(func.coalesce(models.Reservation.statut_reservation, ""))
+        columns = [
+            models.Objet.id_objet,
+            # count() skips the NULL reservation id of objects without reservations
+            func.count(case((status_upper.in_(list(WAITING_STATUSES)), models.Reservation.id))),
+            func.count(case((~status_upper.in_(list(CANCELLED_STATUSES)), models.Reservation.id))),
+        ]
 
-        try:
-            rows = (
-                db.query(models.Objet.id_objet, ts_rank)
+        with_rank = False
+        if query_clean and self._use_search_document(db):
+            # Grouped by the primary key: evaluated once per object, not per reservation row
+            columns.append(func.ts_rank_cd(
+                models.Objet.search_document,
+                func.plainto_tsquery("simple", query_clean),
+            ))
+            with_rank = True
+
+        def run(selected_columns):
+            return (
+                db.query(*selected_columns)
+                .outerjoin(models.Reservation, models.Reservation.id_objet == models.Objet.id_objet)
                 .filter(models.Objet.id_objet.in_(object_ids))
+                .group_by(models.Objet.id_objet)
                 .all()
             )
-            return {int(object_id): float(rank or 0.0) for object_id, rank in rows}
-        except SQLAlchemyError:
-            return {}
+
+        if not with_rank:
+            rows = run(columns)
+        else:
+            # The ranked attempt runs in a SAVEPOINT: a failure rolls back only that,
+            # not the caller's pending work
+            try:
+                with db.begin_nested():
+                    rows = run(columns)
+            except SQLAlchemyError:
+                with_rank = False
+                rows = run(columns[:3])
+
+        waiting_counts: Dict[int, int] = {}
+        popularity_counts: Dict[int, int] = {}
+        text_ranks: Dict[int, float] = {}
+        for row in rows:
+            object_id = int(row[0])
+            waiting_counts[object_id] = int(row[1] or 0)
+            popularity_counts[object_id] = int(row[2] or 0)
+            if with_rank:
+                text_ranks[object_id] = float(row[3] or 0.0)
+        return waiting_counts, popularity_counts, text_ranks
+
+    def _score_features(
+        self,
+        haystacks: List[str],
+        query_clean: str,
+        expanded_terms: List[str],
+        corrections: Dict[str, str],
+        text_ranks: List[float],
+        availability_scores: List[float],
+        distances: List[float],
+        waiting_counts: List[int],
+        popularity_counts: List[int],
+        max_waiting: int,
+        max_popularity: int,
+        weights: Dict[str, float],
+    ) -> Tuple[List[float], List[float], List[float]]:
+        """Return (text, popularity, weighted final score before filter bonuses) per candidate."""
+        if np is not None and hasattr(process, "cdist") and len(haystacks) >= BATCH_SCORING_MIN_CANDIDATES:
+            scorer = self._score_features_batch
+        else:
+            scorer = self._score_features_loop
+        return scorer(
+            haystacks, query_clean, expanded_terms, corrections, text_ranks, availability_scores,
+            distances, waiting_counts, popularity_counts, max_waiting, max_popularity, weights,
+        )
+
+    def _score_features_loop(
+        self,
+        haystacks, query_clean, expanded_terms, corrections, text_ranks, availability_scores,
+        distances, waiting_counts, popularity_counts, max_waiting, max_popularity, weights,
+    ) -> Tuple[List[float], List[float], List[float]]:
+        text_scores: List[float] = []
+        popularity_scores: List[float] = []
+        final_scores: List[float] = []
+
+        for idx, haystack in enumerate(haystacks):
+            if query_clean:
+                token_score = float(fuzz.token_set_ratio(query_clean, haystack))
+                partial_score = float(fuzz.partial_ratio(query_clean, haystack))
+
+                coverage_hits = sum(1 for term in expanded_terms if term and term in haystack)
+                coverage_score = (coverage_hits / max(1, len(expanded_terms))) * 100.0
+
+                postgres_rank_score = min(100.0, text_ranks[idx] * 125.0)
+
+                correction_bonus = 0.0
+                for corrected in corrections.values():
+                    if corrected and corrected in haystack:
+                        correction_bonus += 4.0
+
+                text_score = (
+                    token_score * 0.40
+                    + partial_score * 0.25
+                    + coverage_score * 0.20
+                    + postgres_rank_score * 0.15
+                    + correction_bonus
+                )
+            else:
+                text_score = 0.0
+
+            distance_score = self._distance_score(distances[idx])
+            popularity_score = (popularity_counts[idx] / max_popularity * 100.0) if max_popularity > 0 else 0.0
+            waiting_score = 100.0 - ((waiting_counts[idx] / max_waiting) * 100.0) if max_waiting > 0 else 100.0
+
+            final_score = (
+                text_score * weights["text"]
+                + availability_scores[idx] * weights["availability"]
+                + distance_score * weights["distance"]
+                + popularity_score * weights["popularity"]
+                + waiting_score * weights["waiting"]
+            )
+
+            text_scores.append(text_score)
+            popularity_scores.append(popularity_score)
+            final_scores.append(final_score)
+
+        return text_scores, popularity_scores, final_scores
+
+    def _score_features_batch(
+        self,
+        haystacks, query_clean, expanded_terms, corrections, text_ranks, availability_scores,
+        distances, waiting_counts, popularity_counts, max_waiting, max_popularity, weights,
+    ) -> Tuple[List[float], List[float], List[float]]:
+        # Same formulas and operation order as _score_features_loop, so scores are bit-identical
+        count = len(haystacks)
+
+        if query_clean:
+            token_scores = process.cdist(
+                [query_clean], haystacks, scorer=fuzz.token_set_ratio, dtype=np.float64, workers=-1,
+            )[0]
+            partial_scores = process.cdist(
+                [query_clean], haystacks, scorer=fuzz.partial_ratio, dtype=np.float64, workers=-1,
+            )[0]
+
+            terms = [term for term in expanded_terms if term]
+            coverage_hits = np.fromiter(
+                (sum(1 for term in terms if term in haystack) for haystack in haystacks),
+                dtype=np.float64,
+                count=count,
+            )
+            coverage_scores = (coverage_hits / max(1, len(expanded_terms))) * 100.0
+
+            postgres_rank_scores = np.minimum(100.0, np.asarray(text_ranks, dtype=np.float64) * 125.0)
+
+            corrected_values = [corrected for corrected in corrections.values() if corrected]
+            correction_bonus = np.fromiter(
+                (4.0 * sum(1 for corrected in corrected_values if corrected in haystack) for haystack in haystacks),
+                dtype=np.float64,
+                count=count,
+            )
+
+            text_scores = (
+                token_scores * 0.40
+                + partial_scores * 0.25
+                + coverage_scores * 0.20
+                + postgres_rank_scores * 0.15
+                + correction_bonus
+            )
+        else:
+            text_scores = np.zeros(count, dtype=np.float64)
+
+        distance_values = np.asarray(distances, dtype=np.float64)
+        finite = np.isfinite(distance_values)
+        distance_scores = np.where(
+            finite,
+            np.maximum(0.0, 100.0 - (np.minimum(np.where(finite, distance_values, 0.0), 5000.0) / 50.0)),
+            0.0,
+        )
+
+        if max_popularity > 0:
+            popularity_scores = np.asarray(popularity_counts, dtype=np.float64) / max_popularity * 100.0
+        else:
+            popularity_scores = np.zeros(count, dtype=np.float64)
+
+        if max_waiting > 0:
+            waiting_scores = 100.0 - ((np.asarray(waiting_counts, dtype=np.float64) / max_waiting) * 100.0)
+        else:
+            waiting_scores = np.full(count, 100.0, dtype=np.float64)
+
+        final_scores = (
+            text_scores * weights["text"]
+            + np.asarray(availability_scores, dtype=np.float64) * weights["availability"]
+            + distance_scores * weights["distance"]
+            + popularity_scores * weights["popularity"]
+            + waiting_scores * weights["waiting"]
+        )
+
+        return text_scores.tolist(), popularity_scores.tolist(), final_scores.tolist()
+
+    def _score_upper_bounds(
+        self,
+        haystacks, expanded_terms, corrections, text_ranks, availability_scores,
+        distances, waiting_counts, popularity_counts, max_waiting, max_popularity, weights,
+    ) -> Tuple[List[float], List[float]]:
+        """
+        Upper bounds of (text score, weighted score) per candidate, without the fuzzy
+        ratios: both are counted at 100, every other term as in _score_features_loop.
+        """
+        corrected_values = [corrected for corrected in corrections.values() if corrected]
+        text_bounds: List[float] = []
+        score_bounds: List[float] = []
+
+        for idx, haystack in enumerate(haystacks):
+            coverage_hits = sum(1 for term in expanded_terms if term and term in haystack)
+            coverage_score = (coverage_hits / max(1, len(expanded_terms))) * 100.0
+            text_bound = (
+                100.0 * 0.40
+                + 100.0 * 0.25
+                + coverage_score * 0.20
+                + min(100.0, text_ranks[idx] * 125.0) * 0.15
+                + 4.0 * sum(1 for corrected in corrected_values if corrected in haystack)
+                + SCORE_BOUND_EPSILON
+            )
+
+            popularity_score = (popularity_counts[idx] / max_popularity * 100.0) if max_popularity > 0 else 0.0
+            waiting_score = 100.0 - ((waiting_counts[idx] / max_waiting) * 100.0) if max_waiting > 0 else 100.0
+
+            text_bounds.append(text_bound)
+            score_bounds.append(
+                text_bound * weights["text"]
+                + availability_scores[idx] * weights["availability"]
+                + self._distance_score(distances[idx]) * weights["distance"]
+                + popularity_score * weights["popularity"]
+                + waiting_score * weights["waiting"]
+                + SCORE_BOUND_EPSILON
+            )
+
+        return text_bounds, score_bounds
+
+    @staticmethod
+    def _top_k_ranked(score, top_k: int, sort_key, text_bounds, score_bounds, bonuses, keep_low_text: bool):
+        """
+        Score candidates by decreasing upper bound, one chunk at a time, and stop once
+        the next bound cannot reach the current k-th best score.
+
+        Returns (top k entries, match count, exact); when candidates were skipped the count
+        also includes those whose text bound still passes the 18-point cut (an estimate).
+        """
+        order = sorted(range(len(score_bounds)), key=lambda i: score_bounds[i] + bonuses[i], reverse=True)
+        chunk_size = max(top_k, BATCH_SCORING_MIN_CANDIDATES)
+        scored = []
+        best: List[float] = []  # min-heap of the k best final scores
+        position = 0
+
+        while position < len(order):
+            upcoming = order[position]
+            if len(best) >= top_k and score_bounds[upcoming] + bonuses[upcoming] < best[0]:
+                break
+
+            chunk = order[position:position + chunk_size]
+            position += len(chunk)
+            for entry in score(chunk):
+                scored.append(entry)
+                if len(best) < top_k:
+                    heapq.heappush(best, entry[0])
+                elif entry[0] > best[0]:
+                    heapq.heapreplace(best, entry[0])
+
+        skipped = sum(1 for idx in order[position:] if keep_low_text or text_bounds[idx] >= 18.0)
+        return heapq.nsmallest(top_k, scored, key=sort_key), len(scored) + skipped, skipped == 0
+
+    def _parse_query(self, db: Session, raw_query: str, timer) -> ParsedQuery:
+        key = (_query_cache_key(raw_query), self._data_version)
+        cached = self.query_cache.get(key)
+        if cached is not None:
+            timer.count("query_cache_hit", 1)
+            return cached
+
+        with timer.stage("tokens"):
+            tokens = self._extract_tokens(raw_query)
+
+        with timer.stage("metadata"):
+            catalog = self._get_catalog(db)
+            correction_index = self._get_correction_index(db)
+
+        with timer.stage("parse"):
+            nlp_filters, cleaned_terms = self._extract_filters(
+                raw_query,
+                tokens,
+                catalog.types,
+                catalog.marques,
+                catalog.fonctions,
+                catalog=catalog,
+            )
+
+            corrected_terms, corrections = self._autocorrect_terms(
+                cleaned_terms,
+                correction_index.vocabulary,
+                correction_index,
+            )
+            expanded_terms = self._expand_terms(corrected_terms)
+
+            normalized_query = _normalize_text(raw_query)
+            if not expanded_terms and normalized_query:
+                expanded_terms = self._expand_terms(_clean_noise_terms(_split_words(normalized_query)))
+
+            inferred_type = None
+            if not nlp_filters.get("type_objet"):
+                # Only applied by search() when no explicit type filter is given
+                inferred_type = self._infer_type_from_terms(
+                    expanded_terms or tokens,
+                    catalog.types,
+                    normalized_query,
+                    catalog.type_map,
+                    self._get_query_matcher(catalog).scan(normalized_query),
+                )
+
+        parsed = ParsedQuery(
+            tokens=tokens,
+            nlp_filters=MappingProxyType(nlp_filters),
+            cleaned_terms=cleaned_terms,
+            corrected_terms=corrected_terms,
+            corrections=MappingProxyType(corrections),
+            expanded_terms=expanded_terms,
+            inferred_type=inferred_type,
+            query_clean=" ".join([term for term in expanded_terms if len(term) >= 2]).strip(),
+        )
+        self.query_cache.put(key, parsed)
+        return parsed
 
     def search(
         self,
@@ -712,55 +1847,223 @@ class SmartSearchEngine:
         filtre_fonction: str = None,
         sort_by_distance: bool = False,
         max_distance: float = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        timer=None,
+        origin: Optional[Origin] = None,
     ):
+        return self.search_page(
+            db,
+            query,
+            filtre_etage_id,
+            filtre_salle_id,
+            filtre_type,
+            filtre_marque,
+            filtre_statut,
+            filtre_fonction,
+            sort_by_distance,
+            max_distance,
+            origin=origin,
+            limit=limit,
+            offset=offset,
+            timer=timer,
+        ).items
+
+    def search_page(
+        self,
+        db: Session,
+        query: str = None,
+        filtre_etage_id: int = None,
+        filtre_salle_id: int = None,
+        filtre_type: str = None,
+        filtre_marque: str = None,
+        filtre_statut: str = None,
+        filtre_fonction: str = None,
+        sort_by_distance: bool = False,
+        max_distance: float = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        timer=None,
+        origin: Optional[Origin] = None,
+    ) -> SearchPage:
+        """Ranked results offset..offset+limit (all of them when limit is None) plus the match count."""
+        # Per-stage durations/counts; the caller may pass its timer to read Server-Timing back
+        timer = timer if timer is not None else new_timer("search")
+        offset = max(0, int(offset or 0))
+        top_k = None if limit is None else offset + max(0, int(limit))
+        filters = (
+            filtre_etage_id,
+            filtre_salle_id,
+            filtre_type,
+            filtre_marque,
+            filtre_statut,
+            filtre_fonction,
+            sort_by_distance,
+            max_distance,
+            origin,
+        )
+        self._sync_shared_version(db)
+        # Raw text (IP/MAC lookups are exact); the cache generation keeps a caller that
+        # arrives after a write from sharing a computation started before it
+        flight_key = ((query or "").strip(), self._search_filters_key(*filters), top_k, self.result_cache.generation)
+        computed = False
+
+        def compute():
+            nonlocal computed
+            computed = True
+            return self._search(db, query, *filters, top_k, timer)
+
+        try:
+            ordered, total, exact = self.search_flight.do(flight_key, compute)
+            if not computed:
+                timer.count("coalesced", 1)
+            items = ordered[offset:top_k]
+            timer.count("results", len(items))
+            return SearchPage(items, total, exact, offset)
+        finally:
+            timer.finish()
+
+    def _search(
+        self,
+        db: Session,
+        query: Optional[str],
+        filtre_etage_id: Optional[int],
+        filtre_salle_id: Optional[int],
+        filtre_type: Optional[str],
+        filtre_marque: Optional[str],
+        filtre_statut: Optional[str],
+        filtre_fonction: Optional[str],
+        sort_by_distance: bool,
+        max_distance: Optional[float],
+        origin: Optional[Origin],
+        top_k: Optional[int],
+        timer,
+    ) -> Tuple[List[SearchCandidate], int, bool]:
         raw_query = (query or "").strip()
 
         if raw_query:
             if REGEX_IP.match(raw_query):
-                return db.query(models.Objet).filter(models.Objet.ip_adress == raw_query).all()
+                with timer.stage("candidates"):
+                    rows = self._load_candidates(
+                        db, db.query(models.Objet.id_objet).filter(models.Objet.ip_adress == raw_query).statement,
+                    )
+                return rows, len(rows), True
             if REGEX_MAC.match(raw_query):
-                return db.query(models.Objet).filter(models.Objet.mac_adresse == raw_query).all()
-
-        tokens = self._extract_tokens(raw_query)
-        available_types = self._load_available_types(db)
-        available_marques = self._load_available_marques(db)
-        available_fonctions = self._load_available_fonctions(db)
-
-        nlp_filters, cleaned_terms = self._extract_filters(
-            raw_query,
-            tokens,
-            available_types,
-            available_marques,
-            available_fonctions,
+                with timer.stage("candidates"):
+                    rows = self._load_candidates(
+                        db, db.query(models.Objet.id_objet).filter(models.Objet.mac_adresse == raw_query).statement,
+                    )
+                return rows, len(rows), True
+
+        parsed = self._parse_query(db, raw_query, timer)
+        filters = (
+            filtre_etage_id,
+            filtre_salle_id,
+            filtre_type,
+            filtre_marque,
+            filtre_statut,
+            filtre_fonction,
+            sort_by_distance,
+            max_distance,
+            origin,
         )
-        vocabulary = self._load_domain_vocabulary(db)
-
-        corrected_terms, corrections = self._autocorrect_terms(cleaned_terms, vocabulary)
-        expanded_terms = self._expand_terms(corrected_terms)
+        # Keyed on the parse rather than the raw text: a data version bump alone keeps entries
+        cache_key = (self._parsed_query_key(parsed), self._search_filters_key(*filters), top_k)
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            timer.count("result_cache_hit", 1)
+            return cached
+
+        generation = self.result_cache.generation
+        ordered, total, exact, scope = self._search_parsed(db, parsed, *filters, top_k, timer)
+        self.result_cache.put(cache_key, (ordered, total, exact), scope, self._result_size(ordered, scope), generation)
+        return ordered, total, exact
 
-        normalized_query = _normalize_text(raw_query)
-        if not expanded_terms and normalized_query:
-            expanded_terms = self._expand_terms(_clean_noise_terms(_split_words(normalized_query)))
-
-        if not filtre_type and not nlp_filters.get("type_objet"):
-            inferred_type = self._infer_type_from_terms(expanded_terms or tokens, available_types, normalized_query)
-            if inferred_type:
-                nlp_filters["type_objet"] = inferred_type
-
-        query_clean = " ".join([term for term in expanded_terms if len(term) >= 2]).strip()
+    @staticmethod
+    def _parsed_query_key(parsed: ParsedQuery) -> tuple:
+        return (
+            parsed.query_clean,
+            tuple(parsed.expanded_terms),
+            tuple(sorted(parsed.corrections.items())),
+            tuple(sorted((name, str(value)) for name, value in parsed.nlp_filters.items())),
+            parsed.inferred_type,
+        )
 
-        sql = (
-            db.query(models.Objet)
-            .options(joinedload(models.Objet.salle), joinedload(models.Objet.fonctionnalites))
+    @staticmethod
+    def _search_filters_key(
+        filtre_etage_id, filtre_salle_id, filtre_type, filtre_marque, filtre_statut, filtre_fonction,
+        sort_by_distance, max_distance, origin,
+    ) -> tuple:
+        # Text filters are compared lower-cased in SQL and normalized in the bonuses
+        return (
+            filtre_etage_id,
+            filtre_salle_id,
+            *(str(value).lower() if value else None for value in (filtre_type, filtre_marque, filtre_statut, filtre_fonction)),
+            bool(sort_by_distance),
+            max_distance,
+            tuple(origin) if origin is not None else None,
         )
 
+    @staticmethod
+    def _result_size(ordered: List[SearchCandidate], scope: SearchScope) -> int:
+        size = sys.getsizeof(ordered) + 64 * len(scope.object_ids) + 512
+        for obj in ordered:
+            size += sys.getsizeof(obj)
+            for name in SearchCandidate.__slots__:
+                value = getattr(obj, name)
+                size += sys.getsizeof(value) if value is not None else 0
+            size += 120 * len(obj.fonctionnalites)
+        return size
+
+    def _search_parsed(
+        self,
+        db: Session,
+        parsed: ParsedQuery,
+        filtre_etage_id: Optional[int],
+        filtre_salle_id: Optional[int],
+        filtre_type: Optional[str],
+        filtre_marque: Optional[str],
+        filtre_statut: Optional[str],
+        filtre_fonction: Optional[str],
+        sort_by_distance: bool,
+        max_distance: Optional[float],
+        origin: Optional[Origin],
+        top_k: Optional[int],
+        timer,
+    ) -> Tuple[List[SearchCandidate], int, bool, SearchScope]:
+        nlp_filters = parsed.nlp_filters
+        expanded_terms = parsed.expanded_terms
+        corrections = parsed.corrections
+        query_clean = parsed.query_clean
+
+        # Filters select candidate ids only; _load_candidates projects them in the same statement
+        sql = db.query(models.Objet.id_objet)
+
         target_etage = filtre_etage_id if filtre_etage_id is not None else nlp_filters.get("num_etage")
         target_statut = filtre_statut if filtre_statut is not None else nlp_filters.get("statut")
-        target_type = filtre_type if filtre_type else nlp_filters.get("type_objet")
+        target_type = filtre_type if filtre_type else (nlp_filters.get("type_objet") or parsed.inferred_type)
         target_marque = filtre_marque if filtre_marque else nlp_filters.get("nom_marque")
         target_fonction = filtre_fonction if filtre_fonction else nlp_filters.get("fonction")
         target_salle_text = nlp_filters.get("salle_text")
 
+        # What a newcomer must pass to join these results; candidate ids are added once loaded
+        scope = SearchScope(
+            frozenset(),
+            statut=_normalize_text(str(target_statut)) if target_statut else "",
+            type_objet=_normalize_text(str(target_type)) if target_type else "",
+            nom_marque=_normalize_text(str(target_marque)) if target_marque else "",
+            fonction=_normalize_text(str(target_fonction)) if target_fonction else "",
+            num_etage=int(target_etage) if target_etage is not None else None,
+            id_salle=filtre_salle_id,
+            salle_text=_normalize_text(target_salle_text) if target_salle_text and not filtre_salle_id else "",
+            terms=tuple(sorted({
+                word
+                for term in ([query_clean] + expanded_terms[:12] if query_clean else [])
+                for word in _split_words(term)
+                if len(word) >= 2
+            })),
+        )
+
         joined_salle = False
         joined_fonction = False
 
@@ -794,9 +2097,53 @@ class SmartSearchEngine:
         if target_fonction:
             sql = sql.filter(func.lower(models.Fonctionnalite.nom) == str(target_fonction).lower())
 
+        has_radius = max_distance is not None and max_distance >= 0
+        distance_origin = origin or LEGACY_ORIGIN
+        spatial = self._get_spatial_index(db) if origin is not None or has_radius else None
+
+        if has_radius:
+            # Rooms within reach from the grid; the exact per-object check still runs after loading
+            rooms_in_reach = spatial.within(distance_origin, max_distance)
+            if not rooms_in_reach:
+                return [], 0, True, scope
+            if len(rooms_in_reach) <= SPATIAL_IN_LIST_CAP:
+                sql = sql.filter(models.Objet.id_salle.in_(sorted(rooms_in_reach)))
+            else:
+                min_x, max_x, min_y, max_y = spatial.bbox(distance_origin, max_distance)
+                sql = sql.filter(
+                    models.Salle.coord_x.between(min_x, max_x),
+                    models.Salle.coord_y.between(min_y, max_y),
+                )
+                floors = spatial.floors_within(distance_origin, max_distance)
+                if floors is not None:
+                    sql = sql.filter(models.Salle.num_etage.in_(floors))
+
+        distance_order = self._origin_distance_order(distance_origin, spatial) if sort_by_distance else None
+
         base_sql = sql
+        index_candidate_ids = None
 
         if query_clean:
+            with timer.stage("index"):
+                index_candidate_ids = self._index_candidate_ids(db, [query_clean] + expanded_terms[:12])
+
+        rank_order = None
+        if index_candidate_ids is not None:
+            if index_candidate_ids:
+                # Joined with their index position, so the candidate cap keeps the best-ranked ids
+                index_rank = self._index_rank_table(index_candidate_ids)
+                sql = sql.join(index_rank, index_rank.c.id_objet == models.Objet.id_objet)
+                rank_order = index_rank.c.position
+        elif query_clean and self._use_search_document(db):
+            # Substring match like the ILIKE chain, on the folded document (object, room and
+            # function names) through its trigram GIN index
+            like_tokens = sorted({_normalize_text(term) for term in [query_clean] + expanded_terms[:12]})
+            like_conditions = [
+                models.Objet.search_text.contains(token, autoescape=True) for token in like_tokens if len(token) >= 2
+            ]
+            if like_conditions:
+                sql = sql.filter(or_(*like_conditions))
+        elif query_clean:
             if not joined_salle:
                 sql = sql.outerjoin(models.Salle)
                 joined_salle = True
@@ -825,131 +2172,223 @@ class SmartSearchEngine:
             if like_conditions:
                 sql = sql.filter(or_(*like_conditions))
 
-        candidates = sql.distinct().limit(420).all()
-
-        if query_clean and not candidates:
-            # Fallback pool: let fuzzy rank recover typo-heavy inputs (e.g. "sanne")
-            candidates = base_sql.distinct().limit(520).all()
-
-        if not candidates:
-            return []
-
-        object_ids = [obj.id_objet for obj in candidates]
-        waiting_count_map = self._load_waiting_counts(db, object_ids)
-        popularity_count_map = self._load_popularity_counts(db, object_ids)
-        pg_rank_map = self._load_postgres_text_ranks(db, object_ids, query_clean)
-
-        distance_map: Dict[int, float] = {
-            obj.id_objet: self._distance_from_user(obj)
-            for obj in candidates
-        }
+        with timer.stage("candidates"):
+            if index_candidate_ids == []:
+                candidates = []
+            else:
+                candidates = self._load_candidates(db, self._candidate_id_statement(sql, 420, distance_order, rank_order))
 
-        if max_distance is not None and max_distance >= 0:
-            candidates = [
-                obj for obj in candidates
-                if distance_map.get(obj.id_objet, float("inf")) <= max_distance
-            ]
+            if query_clean and not candidates:
+                # Fallback pool: let fuzzy rank recover typo-heavy inputs (e.g. "sanne")
+                candidates = self._load_candidates(db, self._candidate_id_statement(base_sql, 520, distance_order))
+                scope = scope._replace(terms=())
+        timer.count("candidates", len(candidates))
+        scope = scope._replace(object_ids=frozenset(obj.id_objet for obj in candidates))
 
         if not candidates:
-            return []
-
-        max_popularity = max(popularity_count_map.values(), default=0)
-        max_waiting = max(waiting_count_map.values(), default=0)
+            return [], 0, True, scope
+
+        with timer.stage("aggregates"):
+            object_ids = [obj.id_objet for obj in candidates]
+            waiting_count_map, popularity_count_map, pg_rank_map = self._load_candidate_features(
+                db,
+                object_ids,
+                query_clean,
+            )
 
-        if query_clean:
-            weights = {
-                "text": 0.45 if sort_by_distance else 0.60,
-                "availability": 0.18 if sort_by_distance else 0.20,
-                "distance": 0.22 if sort_by_distance else 0.05,
-                "popularity": 0.09 if sort_by_distance else 0.10,
-                "waiting": 0.06 if sort_by_distance else 0.05,
-            }
-        else:
-            weights = {
-                "text": 0.0,
-                "availability": 0.55,
-                "distance": 0.25 if sort_by_distance else 0.10,
-                "popularity": 0.12,
-                "waiting": 0.08,
+        with timer.stage("ranking"):
+            distance_map: Dict[int, float] = {
+                obj.id_objet: self._distance_from_user(obj, distance_origin, spatial)
+                for obj in candidates
             }
 
-        ranked = []
+            if has_radius:
+                candidates = [
+                    obj for obj in candidates
+                    if distance_map.get(obj.id_objet, float("inf")) <= max_distance
+                ]
 
-        for obj in candidates:
-            haystack = self._build_haystack(obj)
-            waiting_count = waiting_count_map.get(obj.id_objet, 0)
-            popularity_count = popularity_count_map.get(obj.id_objet, 0)
-            distance_value = distance_map.get(obj.id_objet, float("inf"))
+            if not candidates:
+                return [], 0, True, scope
 
-            if query_clean:
-                token_score = float(fuzz.token_set_ratio(query_clean, haystack))
-                partial_score = float(fuzz.partial_ratio(query_clean, haystack))
+            max_popularity = max(popularity_count_map.values(), default=0)
+            max_waiting = max(waiting_count_map.values(), default=0)
 
-                coverage_hits = sum(1 for term in expanded_terms if term and term in haystack)
-                coverage_score = (coverage_hits / max(1, len(expanded_terms))) * 100.0
-
-                postgres_rank_score = min(100.0, pg_rank_map.get(obj.id_objet, 0.0) * 125.0)
+            if query_clean:
+                weights = {
+                    "text": 0.45 if sort_by_distance else 0.60,
+                    "availability": 0.18 if sort_by_distance else 0.20,
+                    "distance": 0.22 if sort_by_distance else 0.05,
+                    "popularity": 0.09 if sort_by_distance else 0.10,
+                    "waiting": 0.06 if sort_by_distance else 0.05,
+                }
+            else:
+                weights = {
+                    "text": 0.0,
+                    "availability": 0.55,
+                    "distance": 0.25 if sort_by_distance else 0.10,
+                    "popularity": 0.12,
+                    "waiting": 0.08,
+                }
+
+            haystacks = [self._candidate_haystack(obj) for obj in candidates]
+            fields = [self._candidate_fields(obj) for obj in candidates]
+            waiting_counts = [waiting_count_map.get(obj.id_objet, 0) for obj in candidates]
+            distances = [distance_map.get(obj.id_objet, float("inf")) for obj in candidates]
+            availability_scores = [self._availability_from_normalized(field.statut) for field in fields]
+            text_ranks = [pg_rank_map.get(obj.id_objet, 0.0) for obj in candidates]
+            popularity_counts = [popularity_count_map.get(obj.id_objet, 0) for obj in candidates]
+
+            target_type_norm = _normalize_text(str(target_type)) if target_type else ""
+            target_statut_norm = _normalize_text(str(target_statut)) if target_statut else ""
+            target_marque_norm = _normalize_text(str(target_marque)) if target_marque else ""
+            target_fonction_norm = _normalize_text(str(target_fonction)) if target_fonction else ""
+
+            bonuses: List[Tuple[float, ...]] = []
+            for obj, field in zip(candidates, fields):
+                bonus = []
+                if target_type and field.type_objet == target_type_norm:
+                    bonus.append(8.0)
+                if target_statut and field.statut == target_statut_norm:
+                    bonus.append(6.0)
+                if target_marque and field.nom_marque == target_marque_norm:
+                    bonus.append(5.0)
+                if target_fonction and target_fonction_norm in field.fonctions:
+                    bonus.append(4.0)
+                if target_etage is not None and obj.num_etage == int(target_etage):
+                    bonus.append(5.0)
+                bonuses.append(tuple(bonus))
+
+            keep_low_text = bool(target_type or target_marque or target_fonction or target_statut or target_etage)
+
+            scored_count = 0
+
+            def score(indices: List[int]) -> List[Tuple[float, float, float, int, SearchCandidate]]:
+                nonlocal scored_count
+                scored_count += len(indices)
+                text_scores, popularity_scores, base_scores = self._score_features(
+                    haystacks=[haystacks[i] for i in indices],
+                    query_clean=query_clean,
+                    expanded_terms=expanded_terms,
+                    corrections=corrections,
+                    text_ranks=[text_ranks[i] for i in indices],
+                    availability_scores=[availability_scores[i] for i in indices],
+                    distances=[distances[i] for i in indices],
+                    waiting_counts=[waiting_counts[i] for i in indices],
+                    popularity_counts=[popularity_counts[i] for i in indices],
+                    max_waiting=max_waiting,
+                    max_popularity=max_popularity,
+                    weights=weights,
+                )
 
-                correction_bonus = 0.0
-                for corrected in corrections.values():
-                    if corrected and corrected in haystack:
-                        correction_bonus += 4.0
+                entries = []
+                for pos, idx in enumerate(indices):
+                    text_score = text_scores[pos]
+                    final_score = base_scores[pos]
+                    for bonus in bonuses[idx]:
+                        final_score += bonus
+
+                    if query_clean and text_score < 18.0 and not keep_low_text:
+                        continue
+
+                    obj = candidates[idx]
+                    distance_value = distances[idx]
+                    obj.distance_m = None if not math.isfinite(distance_value) else round(distance_value, 2)
+                    obj.waiting_count = int(waiting_counts[idx])
+                    obj.popularity_score = round(popularity_scores[pos], 2)
+                    obj.relevance_score = round(final_score, 2)
+
+                    entries.append((final_score, distance_value, availability_scores[idx], idx, obj))
+                return entries
+
+            # Candidate index last: same order as a stable sort of the candidate list
+            if sort_by_distance:
+                sort_key = lambda item: (-item[0], item[1], -item[2], item[3])  # noqa: E731
+            else:
+                sort_key = lambda item: (-item[0], -item[2], item[1], item[3])  # noqa: E731
 
-                text_score = (
-                    token_score * 0.40
-                    + partial_score * 0.25
-                    + coverage_score * 0.20
-                    + postgres_rank_score * 0.15
-                    + correction_bonus
-                )
+            if top_k is None or not query_clean or top_k >= len(candidates):
+                ranked = score(list(range(len(candidates))))
+                total, exact = len(ranked), True
+                ranked = sorted(ranked, key=sort_key) if top_k is None else heapq.nsmallest(top_k, ranked, key=sort_key)
             else:
-                text_score = 0.0
+                ranked, total, exact = self._top_k_ranked(
+                    score,
+                    top_k,
+                    sort_key,
+                    *self._score_upper_bounds(
+                        haystacks=haystacks,
+                        expanded_terms=expanded_terms,
+                        corrections=corrections,
+                        text_ranks=text_ranks,
+                        availability_scores=availability_scores,
+                        distances=distances,
+                        waiting_counts=waiting_counts,
+                        popularity_counts=popularity_counts,
+                        max_waiting=max_waiting,
+                        max_popularity=max_popularity,
+                        weights=weights,
+                    ),
+                    bonuses=[sum(bonus) for bonus in bonuses],
+                    keep_low_text=keep_low_text,
+                )
+            timer.count("scored", scored_count)
 
-            availability_score = self._availability_score(obj.statut)
-            distance_score = self._distance_score(distance_value)
-            popularity_score = (popularity_count / max_popularity * 100.0) if max_popularity > 0 else 0.0
-            waiting_score = 100.0 - ((waiting_count / max_waiting) * 100.0) if max_waiting > 0 else 100.0
+            return [item[4] for item in ranked], total, exact, scope
 
-            final_score = (
-                text_score * weights["text"]
-                + availability_score * weights["availability"]
-                + distance_score * weights["distance"]
-                + popularity_score * weights["popularity"]
-                + waiting_score * weights["waiting"]
-            )
+    def _get_suggestion_index(self, db: Session) -> Tuple[SuggestionIndex, List[int]]:
+        version = self._data_version
+        cached = self._suggest_cache
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
 
-            if target_type and _normalize_text(obj.type_objet) == _normalize_text(str(target_type)):
-                final_score += 8.0
-            if target_statut and _normalize_text(obj.statut) == _normalize_text(str(target_statut)):
-                final_score += 6.0
-            if target_marque and _normalize_text(obj.nom_marque) == _normalize_text(str(target_marque)):
-                final_score += 5.0
-            if target_fonction and any(_normalize_text(f.nom) == _normalize_text(str(target_fonction)) for f in (obj.fonctionnalites or []) if f and f.nom):
-                final_score += 4.0
-            if target_etage is not None and obj.salle and obj.salle.num_etage == int(target_etage):
-                final_score += 5.0
-
-            if query_clean and text_score < 18.0 and not (target_type or target_marque or target_fonction or target_statut or target_etage):
-                continue
+        catalog = self._get_catalog(db)
+        entries: List[Tuple[str, str, float]] = []
 
-            obj.distance_m = None if not math.isfinite(distance_value) else round(distance_value, 2)
-            obj.waiting_count = int(waiting_count)
-            obj.popularity_score = round(popularity_score, 2)
-            obj.relevance_score = round(final_score, 2)
+        def add_entries(values: List[str], base_score: float):
+            for value in values:
+                entries.append((value, _normalize_text(value), base_score))
 
-            ranked.append((final_score, distance_value, availability_score, obj))
+        # Same base weights as the former per-keystroke DISTINCT queries
+        add_entries(self._load_distinct_values(db, models.Objet.nom_model), 16.0)
+        add_entries(catalog.types, 18.0)
+        add_entries(catalog.marques, 8.0)
+        add_entries(self._load_distinct_values(db, models.Salle.nom_salle), 7.0)
+        add_entries(catalog.fonctions, 7.0)
 
-        if not ranked:
-            return []
+        etage_rows = (
+            db.query(models.Salle.num_etage)
+            .filter(models.Salle.num_etage.isnot(None))
+            .distinct()
+            .order_by(models.Salle.num_etage.asc())
+            .limit(10)
+            .all()
+        )
+        floors = [row[0] for row in etage_rows if row and row[0] is not None]
 
-        if sort_by_distance:
-            ranked.sort(key=lambda item: (-item[0], item[1], -item[2]))
-        else:
-            ranked.sort(key=lambda item: (-item[0], -item[2], item[1]))
+        suggestion_index = SuggestionIndex(entries)
+        self._suggest_cache = (version, suggestion_index, floors)
+        return suggestion_index, floors
+
+    def suggest(self, db: Session, query: str, limit: int = 8, timer=None) -> List[str]:
+        timer = timer if timer is not None else new_timer("suggest")
+        computed = False
 
-        return [item[3] for item in ranked]
+        def compute():
+            nonlocal computed
+            computed = True
+            return self._suggest(db, query, limit, timer)
 
-    def suggest(self, db: Session, query: str, limit: int = 8) -> List[str]:
+        try:
+            suggestions = self.suggest_flight.do((query, limit, self._data_version), compute)
+            if not computed:
+                timer.count("coalesced", 1)
+            timer.count("results", len(suggestions))
+            return suggestions
+        finally:
+            timer.finish()
+
+    def _suggest(self, db: Session, query: str, limit: int, timer) -> List[str]:
         raw_query = (query or "").strip()
         if not raw_query:
             return []
@@ -985,92 +2424,64 @@ class SmartSearchEngine:
 
             candidates.append((score, clean_label, norm_label))
 
-        # Dynamic values from database
-        models_rows = (
-            db.query(models.Objet.nom_model)
-            .filter(models.Objet.nom_model.isnot(None))
-            .distinct()
-            .limit(120)
-            .all()
-        )
-        for row in models_rows:
-            add_candidate(row[0] if row else None, 16.0)
-
-        types_rows = (
-            db.query(models.Objet.type_objet)
-            .filter(models.Objet.type_objet.isnot(None))
-            .distinct()
-            .limit(80)
-            .all()
-        )
-        for row in types_rows:
-            add_candidate(row[0] if row else None, 18.0)
-
-        marques_rows = (
-            db.query(models.Objet.nom_marque)
-            .filter(models.Objet.nom_marque.isnot(None))
-            .distinct()
-            .limit(80)
-            .all()
-        )
-        for row in marques_rows:
-            add_candidate(row[0] if row else None, 8.0)
-
-        salle_rows = (
-            db.query(models.Salle.nom_salle)
-            .filter(models.Salle.nom_salle.isnot(None))
-            .distinct()
-            .limit(80)
-            .all()
-        )
-        for row in salle_rows:
-            add_candidate(row[0] if row else None, 7.0)
-
-        fonction_rows = (
-            db.query(models.Fonctionnalite.nom)
-            .filter(models.Fonctionnalite.nom.isnot(None))
-            .distinct()
-            .limit(80)
-            .all()
-        )
-        for row in fonction_rows:
-            add_candidate(row[0] if row else None, 7.0)
+        # Labels answered from the in-memory suggestion index (one build per data version)
+        with timer.stage("metadata"):
+            suggestion_index, floors = self._get_suggestion_index(db)
+            catalog = self._get_catalog(db)
+            correction_index = self._get_correction_index(db)
+        result_limit = max(1, min(limit, 20))
+
+        with timer.stage("candidates"):
+            label_ids = suggestion_index.prefix_ids(q_for_matching, result_limit)
+            # Prefix hits (120 + base) outrank any substring/fuzzy hit: only look further when short
+            if len(label_ids) < result_limit:
+                seen_ids = set(label_ids)
+                label_ids = label_ids + suggestion_index.substring_ids(q_for_matching, result_limit, seen_ids)
+                seen_ids.update(label_ids)
+                label_ids = label_ids + suggestion_index.fuzzy_ids(q_for_matching, SUGGEST_FUZZY_CANDIDATES, seen_ids)
+        timer.count("candidates", len(label_ids))
+
+        with timer.stage("ranking"):
+            for label_id in label_ids:
+                add_candidate(suggestion_index.labels[label_id], suggestion_index.base_scores[label_id])
+
+        with timer.stage("parse"):
+            # If query hints a known type via intent/synonyms, boost canonical suggestion
+            inferred_type = self._infer_type_from_intent_patterns(q_for_matching, catalog.types, catalog.type_map)
+            if not inferred_type:
+                inferred_type = self._infer_type_from_terms(
+                    cleaned_q_tokens or _split_words(q_norm),
+                    catalog.types,
+                    q_norm,
+                    catalog.type_map,
+                    self._get_query_matcher(catalog).scan(q_norm),
+                )
+            if inferred_type:
+                add_candidate(inferred_type, 24.0)
 
-        # If query hints a known type via intent/synonyms, boost canonical suggestion
-        available_types = self._load_available_types(db)
-        inferred_type = self._infer_type_from_intent_patterns(q_for_matching, available_types)
-        if not inferred_type:
-            inferred_type = self._infer_type_from_terms(cleaned_q_tokens or _split_words(q_norm), available_types, q_norm)
-        if inferred_type:
-            add_candidate(inferred_type, 24.0)
-
-        # Typo correction suggestion (ex: "sanne" -> "scanner")
-        vocabulary = self._load_domain_vocabulary(db)
-        corrected_terms, _ = self._autocorrect_terms(cleaned_q_tokens or _split_words(q_norm), vocabulary)
-        corrected_phrase = " ".join(corrected_terms).strip()
-        if corrected_phrase and corrected_phrase != q_for_matching:
-            add_candidate(corrected_phrase, 22.0)
-            inferred_from_corrected = self._infer_type_from_terms(
-                corrected_terms,
-                available_types,
-                corrected_phrase,
+            # Typo correction suggestion (ex: "sanne" -> "scanner")
+            corrected_terms, _ = self._autocorrect_terms(
+                cleaned_q_tokens or _split_words(q_norm),
+                correction_index.vocabulary,
+                correction_index,
             )
-            if inferred_from_corrected:
-                add_candidate(inferred_from_corrected, 30.0)
-
-        # Floor helper suggestions
-        if any(keyword in q_norm for keyword in ["etage", "étage", "floor", "طابق"]):
-            etage_rows = (
-                db.query(models.Salle.num_etage)
-                .filter(models.Salle.num_etage.isnot(None))
-                .distinct()
-                .order_by(models.Salle.num_etage.asc())
-                .limit(10)
-                .all()
-            )
-            for row in etage_rows:
-                if row and row[0] is not None:
-                    add_candidate(f"Étage {row[0]}", 12.0)
+            corrected_phrase = " ".join(corrected_terms).strip()
+            if corrected_phrase and corrected_phrase != q_for_matching:
+                add_candidate(corrected_phrase, 22.0)
+                inferred_from_corrected = self._infer_type_from_terms(
+                    corrected_terms,
+                    catalog.types,
+                    corrected_phrase,
+                    catalog.type_map,
+                    self._get_query_matcher(catalog).scan(corrected_phrase),
+                )
+                if inferred_from_corrected:
+                    add_candidate(inferred_from_corrected, 30.0)
+
+            # Floor helper suggestions
+            if any(keyword in q_norm for keyword in ["etage", "étage", "floor", "طابق"]):
+                for num_etage in floors:
+                    add_candidate(f"Étage {num_etage}", 12.0)
 
         # Deduplicate by normalized label, keep highest score
         best_by_label: Dict[str, Tuple[float, str]] = {}
@@ -1083,7 +2494,45 @@ class SmartSearchEngine:
             key=lambda item: (-item[0], len(item[1]))
         )
 
-        return [label for _, label in ordered[: max(1, min(limit, 20))]]
+        return [label for _, label in ordered[:result_limit]]
 
 
 engine = SmartSearchEngine()
+
+registry.callback_counter(
+    "search_query_cache_hits_total",
+    "Requêtes dont l'analyse (NLP, filtres, corrections) vient du cache",
+    lambda: engine.query_cache.hits,
+)
+registry.callback_counter(
+    "search_query_cache_misses_total",
+    "Requêtes analysées entièrement",
+    lambda: engine.query_cache.misses,
+)
+registry.gauge("search_query_cache_size", "Entrées du cache d'analyse de requêtes", lambda: len(engine.query_cache))
+registry.callback_counter(
+    "search_result_cache_hits_total",
+    "Recherches servies depuis le cache de résultats",
+    lambda: engine.result_cache.hits,
+)
+registry.callback_counter(
+    "search_result_cache_misses_total",
+    "Recherches classées entièrement",
+    lambda: engine.result_cache.misses,
+)
+registry.callback_counter(
+    "search_result_cache_invalidations_total",
+    "Entrées du cache de résultats invalidées par une écriture",
+    lambda: engine.result_cache.invalidations,
+)
+registry.gauge("search_result_cache_bytes", "Taille estimée du cache de résultats", lambda: engine.result_cache.bytes)
+registry.callback_counter(
+    "search_coalesced_total",
+    "Recherches identiques en cours servies par le calcul d'une autre requête",
+    lambda: engine.search_flight.deduplicated,
+)
+registry.callback_counter(
+    "suggest_coalesced_total",
+    "Suggestions identiques en cours servies par le calcul d'une autre requête",
+    lambda: engine.suggest_flight.deduplicated,
+)
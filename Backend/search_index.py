@@ -0,0 +1,122 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+def _ngrams(text: str, size: int) -> Set[str]:
+    if len(text) < size:
+        return set()
+    return {text[idx:idx + size] for idx in range(len(text) - size + 1)}
+
+
+class InvertedIndex:
+    """
+    In-process inverted index (word -> ids, trigram -> ids) over normalized documents.
+
+    `lookup(term)` has the same semantics as `ILIKE '%term%'` on the indexed text:
+    trigram postings narrow the candidates, then each one is verified by substring.
+    """
+
+    def __init__(self, ngram_size: int = 3):
+        self.ngram_size = ngram_size
+        self.ready = False
+        self._lock = threading.RLock()
+        self._documents: Dict[int, str] = {}
+        self._words: Dict[str, Set[int]] = {}
+        self._grams: Dict[str, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def rebuild(self, documents: Iterable[Tuple[int, str]]):
+        with self._lock:
+            self._documents = {}
+            self._words = {}
+            self._grams = {}
+            for doc_id, text in documents:
+                self._add(doc_id, text)
+            self.ready = True
+
+    def upsert(self, doc_id: int, text: str):
+        with self._lock:
+            self._remove(doc_id)
+            self._add(doc_id, text)
+
+    def remove(self, doc_id: int):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _add(self, doc_id: int, text: str):
+        text = text or ""
+        self._documents[doc_id] = text
+        for word in set(text.split()):
+            self._words.setdefault(word, set()).add(doc_id)
+        for gram in _ngrams(text, self.ngram_size):
+            self._grams.setdefault(gram, set()).add(doc_id)
+
+    def _remove(self, doc_id: int):
+        text = self._documents.pop(doc_id, None)
+        if text is None:
+            return
+        for word in set(text.split()):
+            postings = self._words.get(word)
+            if postings is not None:
+                postings.discard(doc_id)
+                if not postings:
+                    del self._words[word]
+        for gram in _ngrams(text, self.ngram_size):
+            postings = self._grams.get(gram)
+            if postings is not None:
+                postings.discard(doc_id)
+                if not postings:
+                    del self._grams[gram]
+
+    def lookup(self, term: str) -> Set[int]:
+        if not term:
+            return set()
+
+        with self._lock:
+            if len(term) < self.ngram_size:
+                # Short terms (ex: "hp") cannot span a word boundary: scan distinct words only.
+                matched: Set[int] = set()
+                for word, postings in self._words.items():
+                    if term in word:
+                        matched |= postings
+                return matched
+
+            postings_lists = []
+            for gram in _ngrams(term, self.ngram_size):
+                postings = self._grams.get(gram)
+                if not postings:
+                    return set()
+                postings_lists.append(postings)
+
+            postings_lists.sort(key=len)
+            candidates = set(postings_lists[0])
+            for postings in postings_lists[1:]:
+                candidates &= postings
+                if not candidates:
+                    return set()
+
+            return {doc_id for doc_id in candidates if term in self._documents.get(doc_id, "")}
+
+    def similar(self, text: str, limit: int) -> List[int]:
+        """Documents sharing the most n-grams with `text` (bounded candidate set for fuzzy scoring)."""
+        counts: Dict[int, int] = {}
+        with self._lock:
+            for gram in _ngrams(text, self.ngram_size):
+                for doc_id in self._grams.get(gram, ()):
+                    counts[doc_id] = counts.get(doc_id, 0) + 1
+
+        return sorted(counts, key=lambda doc_id: (-counts[doc_id], doc_id))[:limit]
+
+    def match_any(self, terms: Iterable[str], limit: Optional[int] = None) -> List[int]:
+        hits: Dict[int, int] = {}
+        for term in terms:
+            for doc_id in self.lookup(term):
+                hits[doc_id] = hits.get(doc_id, 0) + 1
+
+        # Documents matching more terms first, so a capped list keeps the best candidates
+        ordered = sorted(hits, key=lambda doc_id: (-hits[doc_id], doc_id))
+        if limit is not None:
+            ordered = ordered[:limit]
+        return ordered
@@ -0,0 +1,112 @@
+"""
+Coalescence des calculs identiques en cours (« single flight »).
+
+Le premier appelant d'une clé calcule ; les doublons concurrents attendent son
+résultat (ou son exception) au lieu de relancer tout le pipeline. Fonctionne
+depuis les threads d'uvicorn (endpoints sync, `do`) comme depuis la boucle
+asyncio (`do_async`), et les deux peuvent partager une même clé.
+"""
+import asyncio
+import inspect
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "futures")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        # (loop, future) of the asyncio callers waiting on this call
+        self.futures: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def outcome(self):
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def _resolve(future: asyncio.Future, result, error: Optional[BaseException]):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class SingleFlight:
+    """In-flight calls by key; counts leaders (computed) and deduplicated (waited) calls."""
+
+    def __init__(self):
+        self.leaders = 0
+        self.deduplicated = 0
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def _join(self, key: Hashable) -> Tuple[_Call, bool]:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.deduplicated += 1
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            self.leaders += 1
+            return call, True
+
+    def _finish(self, key: Hashable, call: _Call, result, error: Optional[BaseException]):
+        with self._lock:
+            call.result = result
+            call.error = error
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            futures, call.futures = call.futures, []
+            call.done.set()
+        for loop, future in futures:
+            loop.call_soon_threadsafe(_resolve, future, result, error)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]):
+        """Run `fn` unless a call with `key` is in flight, in which case wait for its outcome."""
+        call, leader = self._join(key)
+        if not leader:
+            call.done.wait()
+            return call.outcome()
+
+        try:
+            result = fn()
+        except BaseException as exc:
+            self._finish(key, call, None, exc)
+            raise
+        self._finish(key, call, result, None)
+        return result
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Union[Any, Awaitable[Any]]]):
+        """
+        Same as `do` without blocking the event loop. `fn` may return an awaitable;
+        blocking work should be handed to a thread (e.g. `lambda: asyncio.to_thread(work)`).
+        """
+        call, leader = self._join(key)
+        if not leader:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            with self._lock:
+                if call.done.is_set():
+                    return call.outcome()
+                call.futures.append((loop, future))
+            return await future
+
+        try:
+            result = fn()
+            if inspect.isawaitable(result):
+                result = await result
+        except BaseException as exc:
+            self._finish(key, call, None, exc)
+            raise
+        self._finish(key, call, result, None)
+        return result
@@ -0,0 +1,190 @@
+"""
+Index spatial des salles pour le tri / filtre par distance.
+
+Grille uniforme sur (coord_x, coord_y) ; chaque étage a une altitude cumulée
+(somme des `Etage.hauteur_metres` des étages inférieurs), si bien qu'une
+origine avec étage mesure une distance 3D. Sans étage, la distance reste
+planaire, comme l'ancien calcul depuis (0, 0).
+"""
+import heapq
+import math
+import os
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+import models
+
+GRID_CELL_SIZE = float(os.getenv("SEARCH_SPATIAL_CELL_SIZE", "25"))
+# Hauteur retenue pour un étage sans hauteur_metres
+DEFAULT_FLOOR_HEIGHT = 3.0
+
+
+class Origin(NamedTuple):
+    x: float
+    y: float
+    # None: planar distance only
+    num_etage: Optional[int] = None
+
+
+LEGACY_ORIGIN = Origin(0.0, 0.0)
+
+
+class Room(NamedTuple):
+    id_salle: int
+    x: float
+    y: float
+    num_etage: Optional[int]
+
+
+def floor_elevations(etages: Iterable[Tuple[int, Optional[float]]]) -> Dict[int, float]:
+    # Floor n sits on top of every lower floor
+    elevations: Dict[int, float] = {}
+    elevation = 0.0
+    for num_etage, hauteur in sorted(etages, key=lambda row: row[0]):
+        elevations[num_etage] = elevation
+        elevation += hauteur if hauteur and hauteur > 0 else DEFAULT_FLOOR_HEIGHT
+    return elevations
+
+
+class SpatialIndex:
+    """Rooms bucketed in square cells; radius and nearest-first queries only visit nearby cells."""
+
+    def __init__(self, rooms: Iterable[Room], elevations: Dict[int, float], cell_size: float = GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.elevations = dict(elevations)
+        self.rooms: Dict[int, Room] = {}
+        self._cells: Dict[Tuple[int, int], List[Room]] = {}
+
+        for room in rooms:
+            self.rooms[room.id_salle] = room
+            if room.x is not None and room.y is not None:
+                self._cells.setdefault(self._cell(room.x, room.y), []).append(room)
+
+        if self._cells:
+            columns = [cell[0] for cell in self._cells]
+            rows = [cell[1] for cell in self._cells]
+            self._bounds = (min(columns), max(columns), min(rows), max(rows))
+        else:
+            self._bounds = (0, -1, 0, -1)
+
+    @classmethod
+    def load(cls, db: Session) -> "SpatialIndex":
+        etages = db.query(models.Etage.num_etage, models.Etage.hauteur_metres).all()
+        salles = db.query(
+            models.Salle.id_salle, models.Salle.coord_x, models.Salle.coord_y, models.Salle.num_etage,
+        ).all()
+        return cls(
+            (
+                Room(
+                    int(id_salle),
+                    None if x is None else float(x),
+                    None if y is None else float(y),
+                    num_etage,
+                )
+                for id_salle, x, y, num_etage in salles
+            ),
+            floor_elevations(etages),
+        )
+
+    def __len__(self) -> int:
+        return len(self.rooms)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def elevation(self, num_etage: Optional[int]) -> float:
+        return self.elevations.get(num_etage, 0.0) if num_etage is not None else 0.0
+
+    def origin_for_room(self, id_salle: int) -> Optional[Origin]:
+        room = self.rooms.get(id_salle)
+        if room is None or room.x is None or room.y is None:
+            return None
+        return Origin(room.x, room.y, room.num_etage)
+
+    def vertical_offset(self, origin: Origin, num_etage: Optional[int]) -> float:
+        if origin.num_etage is None or num_etage is None:
+            return 0.0
+        return self.elevation(num_etage) - self.elevation(origin.num_etage)
+
+    def distance(self, origin: Origin, x: Optional[float], y: Optional[float], num_etage: Optional[int]) -> float:
+        if x is None or y is None:
+            return float("inf")
+        dz = self.vertical_offset(origin, num_etage)
+        return math.sqrt(((float(x) - origin.x) ** 2) + ((float(y) - origin.y) ** 2) + dz ** 2)
+
+    def room_distance(self, origin: Origin, room: Room) -> float:
+        return self.distance(origin, room.x, room.y, room.num_etage)
+
+    def bbox(self, origin: Origin, radius: float) -> Tuple[float, float, float, float]:
+        return origin.x - radius, origin.x + radius, origin.y - radius, origin.y + radius
+
+    def floors_within(self, origin: Origin, radius: float) -> Optional[List[int]]:
+        # None: no floor constraint (planar origin)
+        if origin.num_etage is None:
+            return None
+        return [
+            num_etage for num_etage in self.elevations
+            if abs(self.vertical_offset(origin, num_etage)) <= radius
+        ]
+
+    def within(self, origin: Origin, radius: float) -> Dict[int, float]:
+        """id_salle -> distance for every room at most `radius` away."""
+        if radius < 0:
+            return {}
+        min_x, max_x, min_y, max_y = self.bbox(origin, radius)
+        low = self._cell(min_x, min_y)
+        high = self._cell(max_x, max_y)
+        columns = range(max(low[0], self._bounds[0]), min(high[0], self._bounds[1]) + 1)
+        rows = range(max(low[1], self._bounds[2]), min(high[1], self._bounds[3]) + 1)
+
+        if len(columns) * len(rows) > len(self._cells):
+            cells = self._cells.values()
+        else:
+            cells = [self._cells[cell] for cell in ((c, r) for c in columns for r in rows) if cell in self._cells]
+
+        found: Dict[int, float] = {}
+        for bucket in cells:
+            for room in bucket:
+                distance = self.room_distance(origin, room)
+                if distance <= radius:
+                    found[room.id_salle] = distance
+        return found
+
+    def nearest(self, origin: Origin) -> Iterator[Tuple[float, Room]]:
+        """Rooms by increasing distance, visiting the grid ring by ring around the origin."""
+        if not self._cells:
+            return
+        center_col, center_row = self._cell(origin.x, origin.y)
+        max_ring = max(
+            abs(center_col - self._bounds[0]), abs(center_col - self._bounds[1]),
+            abs(center_row - self._bounds[2]), abs(center_row - self._bounds[3]),
+        )
+
+        pending: List[Tuple[float, int, Room]] = []
+        for ring in range(max_ring + 1):
+            for cell in _ring_cells(center_col, center_row, ring):
+                for room in self._cells.get(cell, ()):
+                    heapq.heappush(pending, (self.room_distance(origin, room), room.id_salle, room))
+
+            # Every room in a further ring is at least `ring * cell_size` away in the plane
+            reachable = ring * self.cell_size
+            while pending and pending[0][0] <= reachable:
+                distance, _, room = heapq.heappop(pending)
+                yield distance, room
+
+        while pending:
+            distance, _, room = heapq.heappop(pending)
+            yield distance, room
+
+
+def _ring_cells(center_col: int, center_row: int, ring: int) -> Iterator[Tuple[int, int]]:
+    if ring == 0:
+        yield center_col, center_row
+        return
+    for col in range(center_col - ring, center_col + ring + 1):
+        yield col, center_row - ring
+        yield col, center_row + ring
+    for row in range(center_row - ring + 1, center_row + ring):
+        yield center_col - ring, row
+        yield center_col + ring, row
@@ -0,0 +1,82 @@
+from itertools import combinations
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from rapidfuzz import process
+except Exception:
+    process = None
+
+
+def _deletes(word: str, max_distance: int) -> Set[str]:
+    variants: Set[str] = {word}
+    for distance in range(1, min(max_distance, len(word) - 1) + 1):
+        for positions in combinations(range(len(word)), distance):
+            skip = set(positions)
+            variants.add("".join(c for idx, c in enumerate(word) if idx not in skip))
+    return variants
+
+
+def _trigrams(word: str) -> Set[str]:
+    padded = f" {word} "
+    return {padded[idx:idx + 3] for idx in range(len(padded) - 2)}
+
+
+class CorrectionIndex:
+    """
+    Autocorrect dictionary built once per vocabulary version.
+
+    Candidates come from a symmetric-delete table (insert/delete/substitute typos)
+    and from every word sharing a trigram with the term (partial/prefix matches); words
+    sharing none cannot reach the autocorrect cutoff, so only that set is scored, with the
+    same scorer and tie-breaking as `process.extractOne` over the sorted vocabulary.
+    """
+
+    def __init__(
+        self,
+        vocabulary: Iterable[str],
+        scorer: Callable[[str, str], float],
+        max_distance: int = 2,
+    ):
+        self.vocabulary: List[str] = sorted(set(vocabulary))
+        self.scorer = scorer
+        self.max_distance = max_distance
+
+        self._positions: Dict[str, int] = {word: idx for idx, word in enumerate(self.vocabulary)}
+        self._deletes: Dict[str, List[int]] = {}
+        self._trigrams: Dict[str, List[int]] = {}
+
+        for idx, word in enumerate(self.vocabulary):
+            for variant in _deletes(word, max_distance):
+                self._deletes.setdefault(variant, []).append(idx)
+            for gram in _trigrams(word):
+                self._trigrams.setdefault(gram, []).append(idx)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._positions
+
+    def __len__(self) -> int:
+        return len(self.vocabulary)
+
+    def _candidates(self, term: str) -> List[int]:
+        positions: Set[int] = set()
+        for variant in _deletes(term, self.max_distance):
+            positions.update(self._deletes.get(variant, ()))
+
+        for gram in _trigrams(term):
+            positions.update(self._trigrams.get(gram, ()))
+
+        return sorted(positions)
+
+    def best_match(self, term: str, score_cutoff: float = 0.0) -> Optional[Tuple[str, float]]:
+        choices = [self.vocabulary[idx] for idx in self._candidates(term)]
+        if process is not None:
+            # Scored in one native call; candidates keep vocabulary order, so ties break alike
+            found = process.extractOne(term, choices, scorer=self.scorer, score_cutoff=score_cutoff)
+            return (found[0], float(found[1])) if found else None
+
+        best: Optional[Tuple[str, float]] = None
+        for candidate in choices:
+            score = float(self.scorer(term, candidate))
+            if score >= score_cutoff and (best is None or score > best[1]):
+                best = (candidate, score)
+        return best
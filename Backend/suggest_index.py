@@ -0,0 +1,86 @@
+import heapq
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Set, Tuple
+
+from search_index import InvertedIndex
+
+
+class SuggestionIndex:
+    """
+    In-memory index of suggestion labels (normalized, sorted) with their base scores.
+
+    Prefix hits come from a bisect over the sorted labels (short prefixes are precomputed),
+    substring hits from the trigram index, and fuzzy candidates are bounded to the labels
+    sharing the most trigrams with the query.
+    """
+
+    def __init__(
+        self,
+        entries: Iterable[Tuple[str, str, float]],
+        prefix_cache_depth: int = 3,
+        top_k: int = 20,
+    ):
+        # Keep one entry per normalized label: highest base score, first label at ties
+        best: Dict[str, Tuple[float, int, str]] = {}
+        for order, (label, norm_label, base_score) in enumerate(entries):
+            if not norm_label:
+                continue
+            current = best.get(norm_label)
+            if current is None or base_score > current[0]:
+                best[norm_label] = (base_score, order if current is None else current[1], label)
+
+        ordered = sorted(best.items())
+        self.norms: List[str] = [norm for norm, _ in ordered]
+        self.labels: List[str] = [value[2] for _, value in ordered]
+        self.base_scores: List[float] = [value[0] for _, value in ordered]
+        self._order: List[int] = [value[1] for _, value in ordered]
+
+        self.prefix_cache_depth = prefix_cache_depth
+        self.top_k = top_k
+
+        self._ngrams = InvertedIndex()
+        self._ngrams.rebuild(enumerate(self.norms))
+
+        self._prefix_top: Dict[str, List[int]] = {}
+        self._prefix_memo: Dict[str, List[int]] = {}
+        buckets: Dict[str, List[int]] = {}
+        for label_id, norm in enumerate(self.norms):
+            for size in range(1, min(prefix_cache_depth, len(norm)) + 1):
+                buckets.setdefault(norm[:size], []).append(label_id)
+        for prefix, label_ids in buckets.items():
+            self._prefix_top[prefix] = heapq.nsmallest(top_k, label_ids, key=self._rank_key)
+
+    def __len__(self) -> int:
+        return len(self.norms)
+
+    def _rank_key(self, label_id: int) -> Tuple[float, int, int]:
+        # Within one match class the score only varies with the base score
+        return (-self.base_scores[label_id], len(self.labels[label_id]), self._order[label_id])
+
+    def prefix_ids(self, query: str, limit: int) -> List[int]:
+        if not query:
+            return []
+        if len(query) <= self.prefix_cache_depth and limit <= self.top_k:
+            return self._prefix_top.get(query, [])[:limit]
+
+        cached = self._prefix_memo.get(query)
+        if cached is not None and limit <= self.top_k:
+            return cached[:limit]
+
+        start = bisect_left(self.norms, query)
+        end = bisect_left(self.norms, query + "\U0010ffff", lo=start)
+        label_ids = heapq.nsmallest(max(limit, self.top_k), range(start, end), key=self._rank_key)
+
+        # The index is immutable, so wide prefix ranges are memoized (bounded)
+        if end - start > 256 and len(self._prefix_memo) < 10000:
+            self._prefix_memo[query] = label_ids
+        return label_ids[:limit]
+
+    def substring_ids(self, query: str, limit: int, exclude: Set[int]) -> List[int]:
+        if not query:
+            return []
+        matched = [label_id for label_id in self._ngrams.lookup(query) if label_id not in exclude]
+        return heapq.nsmallest(limit, matched, key=self._rank_key)
+
+    def fuzzy_ids(self, query: str, limit: int, exclude: Set[int]) -> List[int]:
+        return [label_id for label_id in self._ngrams.similar(query, limit + len(exclude)) if label_id not in exclude][:limit]
@@ -0,0 +1,102 @@
+import random
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import models
+from database import Base
+
+
+def make_session():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+
+@contextmanager
+def count_selects(db, with_parameters=False):
+    statements = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        is_dml = context.isinsert or context.isupdate or context.isdelete
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")) and not is_dml:
+            statements.append((statement, parameters) if with_parameters else statement)
+
+    bind = db.get_bind()
+    event.listen(bind, "before_cursor_execute", before_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, "before_cursor_execute", before_execute)
+
+
+def seed_inventory(db):
+    etage = models.Etage(num_etage=1, nom_building="A", hauteur_metres=3.0)
+    salle_a = models.Salle(id_salle=1, nom_salle="Salle Atlas", coord_x=10.0, coord_y=0.0, num_etage=1)
+    salle_b = models.Salle(id_salle=2, nom_salle="Salle Borealis", coord_x=40.0, coord_y=30.0, num_etage=1)
+    scan = models.Fonctionnalite(nom="Scan A4")
+    pdf = models.Fonctionnalite(nom="PDF")
+
+    objets = [
+        models.Objet(
+            id_objet=1, nom_model="LaserJet Pro", nom_marque="HP", type_objet="Imprimante",
+            mac_adresse="AA:AA:AA:AA:AA:01", statut="Disponible", id_salle=1, fonctionnalites=[scan, pdf],
+        ),
+        models.Objet(
+            id_objet=2, nom_model="ScanSnap", nom_marque="Fujitsu", type_objet="Scanner",
+            mac_adresse="AA:AA:AA:AA:AA:02", statut="Occupé", id_salle=2, fonctionnalites=[scan],
+        ),
+        models.Objet(
+            id_objet=3, nom_model="EB-W51", nom_marque="Epson", type_objet="Projecteur",
+            description="Projecteur salle de réunion", mac_adresse="AA:AA:AA:AA:AA:03",
+            statut="Panne", id_salle=2,
+        ),
+    ]
+
+    db.add(etage)
+    db.add_all([salle_a, salle_b])
+    db.add_all(objets)
+    db.commit()
+    return objets
+
+
+BULK_TYPES = ["Imprimante", "Scanner", "Projecteur", "Ecran", "Routeur"]
+BULK_MARQUES = ["HP", "Canon", "Epson", "Brother", "Dell", "Cisco"]
+BULK_WORDS = ["couleur", "laser", "recto", "verso", "wifi", "hdmi", "pdf", "a4", "reunion", "rapide"]
+BULK_STATUTS = ["Disponible", "Occupé", "Panne"]
+BULK_FONCTIONS = ["Wifi", "Scan A4", "PDF", "Recto verso", "HDMI"]
+
+
+def seed_bulk_inventory(db, count, seed=0):
+    """`count` pseudo-random objects spread over 3 floors / 12 rooms with 0-3 functions (ids from 1)."""
+    rng = random.Random(seed)
+    fonctions = [models.Fonctionnalite(nom=nom) for nom in BULK_FONCTIONS]
+    db.add_all(fonctions)
+    db.add_all([models.Etage(num_etage=n, nom_building="A", hauteur_metres=3.0) for n in (1, 2, 3)])
+    db.add_all([
+        models.Salle(
+            id_salle=n, nom_salle=f"Salle {n}", coord_x=float(10 * n), coord_y=float(5 * (n % 4)), num_etage=1 + n % 3,
+        )
+        for n in range(1, 13)
+    ])
+    db.add_all([
+        models.Objet(
+            id_objet=n,
+            nom_model=f"{rng.choice(BULK_WORDS).title()} {n}",
+            nom_marque=rng.choice(BULK_MARQUES),
+            type_objet=rng.choice(BULK_TYPES),
+            description=" ".join(rng.sample(BULK_WORDS, 3)),
+            mac_adresse=f"BB:00:00:{n >> 16 & 255:02X}:{n >> 8 & 255:02X}:{n & 255:02X}",
+            statut=rng.choice(BULK_STATUTS),
+            id_salle=rng.randint(1, 12),
+            fonctionnalites=rng.sample(fonctions, rng.randint(0, 3)),
+        )
+        for n in range(1, count + 1)
+    ])
+    db.commit()
@@ -0,0 +1,151 @@
+import random
+import unittest
+
+import models
+import schemas
+from db_fixtures import count_selects, make_session, seed_bulk_inventory
+from device_registry import DeviceRegistry, DeviceState
+from heartbeat_ingest import ingest_heartbeats
+from heartbeat_rules import STATUS_CRITIQUE, STATUS_OK, STATUS_WARNING, OpenAlert
+from test_heartbeats import NOW, legacy_heartbeat, snapshot
+
+
+class DeviceRegistryTests(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        seed_bulk_inventory(self.db, 40)
+        self.db.add(models.Alerte(message="Bourrage", niveau="Warning", source="Utilisateur", id_objet=3))
+        self.db.add(models.Alerte(message="Bourrage bis", niveau="Warning", source="Utilisateur", id_objet=3))
+        self.db.add(models.Alerte(message="Vieille", niveau="Critical", source="IoT", id_objet=4, est_resolu=True))
+        self.db.commit()
+        self.registry = DeviceRegistry()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_loaded_once_then_no_select(self):
+        with count_selects(self.db) as statements:
+            self.registry.lookup(self.db, "BB:00:00:00:00:01")
+        self.assertEqual(len(statements), 2)
+
+        with count_selects(self.db) as statements:
+            state = self.registry.lookup(self.db, "BB:00:00:00:00:03")
+            alerts = self.registry.open_alerts(self.db, 3)
+            self.registry.open_alerts(self.db, 4)
+        self.assertEqual(statements, [])
+        objet = self.db.get(models.Objet, 3)
+        self.assertEqual(state, DeviceState(3, objet.statut, objet.ip_adress))
+        self.assertEqual(alerts, [OpenAlert("Utilisateur", "Warning")])
+        self.assertEqual(self.registry.open_alert_keys(), [(3, "Utilisateur", "Warning")])
+
+    def test_unknown_mac_falls_back_to_database(self):
+        self.registry.lookup(self.db, "BB:00:00:00:00:01")
+        objet = models.Objet(nom_model="Nouveau", type_objet="Scanner", mac_adresse="CC:00:00:00:00:01", statut="Disponible")
+        self.db.add(objet)
+        self.db.commit()
+        id_objet = objet.id_objet
+
+        with count_selects(self.db) as statements:
+            self.assertIsNone(self.registry.lookup(self.db, "CC:00:00:00:00:99"))
+            self.assertEqual(self.registry.lookup(self.db, "CC:00:00:00:00:01").id_objet, id_objet)
+        self.assertEqual(len(statements), 3)
+        with count_selects(self.db) as statements:
+            self.registry.lookup(self.db, "CC:00:00:00:00:01")
+        self.assertEqual(statements, [])
+        self.assertEqual(self.registry.misses, 2)
+
+    def test_maintained_on_writes(self):
+        self.registry.lookup(self.db, "BB:00:00:00:00:01")
+        self.registry.upsert_objet(5, "DD:00:00:00:00:05", "Disponible", None)
+        self.registry.set_statut(5, "Panne")
+        self.registry.forget_objet(6)
+        self.registry.alert_resolved(3, "Utilisateur", "Warning")
+        self.registry.alert_opened(7, "IoT", "Critical")
+
+        with count_selects(self.db) as statements:
+            self.assertIsNone(self.registry.lookup_many(self.db, []).get("BB:00:00:00:00:05"))
+            self.assertEqual(self.registry.lookup(self.db, "DD:00:00:00:00:05"), DeviceState(5, "Panne", None))
+        self.assertEqual(statements, [])
+        # the old MAC is gone from the registry; the database still has it
+        self.assertEqual(self.registry.lookup(self.db, "BB:00:00:00:00:05").id_objet, 5)
+        self.assertEqual(
+            self.registry.open_alert_keys(),
+            [(3, "Utilisateur", "Warning"), (7, "IoT", "Critical")],
+        )
+        self.registry.alert_resolved(3, "Utilisateur", "Warning")
+        self.assertEqual(self.registry.open_alerts(self.db, 3), [])
+
+    def test_batches_through_registry_match_legacy(self):
+        legacy_db = make_session()
+        seed_bulk_inventory(legacy_db, 40)
+        legacy_db.add(models.Alerte(message="Bourrage", niveau="Warning", source="Utilisateur", id_objet=3))
+        legacy_db.add(models.Alerte(message="Bourrage bis", niveau="Warning", source="Utilisateur", id_objet=3))
+        legacy_db.add(models.Alerte(message="Vieille", niveau="Critical", source="IoT", id_objet=4, est_resolu=True))
+        legacy_db.commit()
+
+        rng = random.Random(23)
+        statuts = sorted(STATUS_CRITIQUE | STATUS_WARNING | STATUS_OK)
+        heartbeats = [
+            schemas.HeartbeatSchema(
+                mac_adresse=f"BB:00:00:00:00:{rng.randint(1, 45):02X}",
+                statut=rng.choice(statuts),
+                ip_adress=rng.choice([None, "10.0.0.7"]),
+            )
+            for _ in range(300)
+        ]
+        for start in range(0, len(heartbeats), 25):
+            ingest_heartbeats(self.db, heartbeats[start:start + 25], "10.0.0.1", now=NOW, registry=self.registry)
+        for heartbeat in heartbeats:
+            legacy_heartbeat(legacy_db, heartbeat, heartbeat.ip_adress or "10.0.0.1")
+
+        self.assertEqual(snapshot(self.db), snapshot(legacy_db))
+        fresh = DeviceRegistry()
+        for mac in (f"BB:00:00:00:00:{n:02X}" for n in range(1, 41)):
+            self.assertEqual(self.registry.lookup(self.db, mac), fresh.lookup(self.db, mac))
+        self.assertEqual(self.registry.open_alert_keys(), fresh.open_alert_keys())
+        legacy_db.close()
+
+    def test_stale_registry_is_refreshed_before_writing(self):
+        self.db.query(models.Objet).filter(models.Objet.id_objet == 1).update({models.Objet.statut: "Panne"})
+        self.db.query(models.Objet).filter(models.Objet.id_objet == 2).update({models.Objet.statut: "Disponible"})
+        self.db.commit()
+        self.registry.lookup(self.db, "BB:00:00:00:00:01")
+
+        # Another worker: object 1 got reserved, object 2 went down with its IoT alert
+        self.db.query(models.Objet).filter(models.Objet.id_objet == 1).update({models.Objet.statut: "Occupé"})
+        self.db.query(models.Objet).filter(models.Objet.id_objet == 2).update({models.Objet.statut: "Panne"})
+        self.db.add(models.Alerte(message="ALERTE CRITIQUE AUTO : Error", niveau="Critical", source="IoT", id_objet=2))
+        self.db.commit()
+
+        result = ingest_heartbeats(self.db, [
+            schemas.HeartbeatSchema(mac_adresse="BB:00:00:00:00:01", statut="OK"),
+            schemas.HeartbeatSchema(mac_adresse="BB:00:00:00:00:02", statut="Critical"),
+            schemas.HeartbeatSchema(mac_adresse="BB:00:00:00:00:03", statut="Critical"),
+        ], "10.0.0.1", now=NOW, registry=self.registry)
+
+        self.assertEqual(
+            result.statuts,
+            {"BB:00:00:00:00:01": "Occupé", "BB:00:00:00:00:02": "Panne", "BB:00:00:00:00:03": "Panne"},
+        )
+        self.db.expire_all()
+        self.assertEqual(self.db.get(models.Objet, 1).statut, "Occupé")
+        self.assertEqual(self.db.get(models.Objet, 1).last_heartbeat, NOW)
+        self.assertEqual(self.db.query(models.Alerte).filter_by(id_objet=2, source="IoT").count(), 1)
+        self.assertEqual(self.db.query(models.Alerte).filter_by(id_objet=3, source="IoT").count(), 1)
+        fresh = DeviceRegistry()
+        for mac in ("BB:00:00:00:00:01", "BB:00:00:00:00:02", "BB:00:00:00:00:03"):
+            self.assertEqual(self.registry.lookup(self.db, mac), fresh.lookup(self.db, mac))
+        self.assertEqual(self.registry.open_alert_keys(), fresh.open_alert_keys())
+
+    def test_disabled_reads_database(self):
+        registry = DeviceRegistry(enabled=False)
+        with count_selects(self.db) as statements:
+            registry.lookup(self.db, "BB:00:00:00:00:03")
+            registry.lookup(self.db, "BB:00:00:00:00:03")
+            self.assertEqual(len(registry.open_alerts(self.db, 3)), 2)
+        self.assertEqual(len(statements), 3)
+        self.assertFalse(registry.loaded)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,204 @@
+import os
+import random
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import schemas
+from db_fixtures import make_session, seed_bulk_inventory
+from heartbeat_ingest import ingest_heartbeats
+from heartbeat_series import _DELTA, _HEADER, _HOUR, _RECORD, _RECORD_V1, HeartbeatSeries, minute_of
+
+T0 = datetime(2026, 5, 4, 6, 0, 0)
+
+
+def brute_force(samples, start, end):
+    # Minute states straight from the raw samples: DOWN wins within a minute
+    states = {}
+    for seen_at, statut in samples:
+        minute = minute_of(seen_at)
+        if minute_of(start) <= minute < minute_of(end):
+            states[minute] = "down" if statut == "Panne" or states.get(minute) == "down" else "up"
+    total = minute_of(end) - minute_of(start)
+    up = sum(state == "up" for state in states.values())
+    down = sum(state == "down" for state in states.values())
+    return up, down, total - up - down
+
+
+class HeartbeatSeriesTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "series.log")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def feed(self, series, hours=6, seed=5):
+        rng = random.Random(seed)
+        samples = []
+        moment = T0
+        while moment < T0 + timedelta(hours=hours):
+            minute = (moment - T0).total_seconds() / 60
+            if 90 <= minute < 130:
+                statut = "Panne"
+            elif 200 <= minute < 230:
+                statut = None  # silent: no heartbeat at all
+            else:
+                statut = rng.choice(["Disponible", "Occupé", "Disponible", "Signalé"])
+            if statut is not None:
+                series.record(7, moment, statut)
+                samples.append((moment, statut))
+            moment += timedelta(seconds=rng.choice([20, 30, 45]))
+        return samples
+
+    def test_availability_matches_raw_samples(self):
+        series = HeartbeatSeries(path=None, minute_slots=180, hour_slots=48)
+        samples = self.feed(series)
+        now = T0 + timedelta(hours=6)
+
+        for start, end in [
+            (T0, now),
+            (T0 + timedelta(minutes=17), now - timedelta(minutes=3)),
+            (now - timedelta(minutes=50), now - timedelta(minutes=10)),
+        ]:
+            with self.subTest(start=start, end=end):
+                window = series.availability(7, start, end, now=now)
+                expected = brute_force(samples, window.window_start, window.window_end)
+                self.assertEqual((window.up_minutes, window.down_minutes, window.silent_minutes), expected)
+
+        window = series.availability(7, T0, now, now=now)
+        self.assertEqual(window.transitions, 2)
+        self.assertEqual(window.down_minutes, 40)
+        self.assertAlmostEqual(window.availability_pct, round(100 * window.up_minutes / 360, 2))
+
+    def test_old_edges_are_widened_to_hours(self):
+        series = HeartbeatSeries(path=None, minute_slots=60, hour_slots=48)
+        samples = self.feed(series)
+        now = T0 + timedelta(hours=6)
+        window = series.availability(7, T0 + timedelta(minutes=95), T0 + timedelta(minutes=150), now=now)
+        self.assertEqual(window.resolution, "hour")
+        self.assertEqual((window.window_start, window.window_end), (T0 + timedelta(hours=1), T0 + timedelta(hours=3)))
+        self.assertEqual(
+            (window.up_minutes, window.down_minutes, window.silent_minutes),
+            brute_force(samples, window.window_start, window.window_end),
+        )
+        # memory does not grow with the number of samples
+        self.assertEqual(series.bytes(), 60 * 6 + 48 * 8)
+        self.assertFalse(series.record(7, T0, "Disponible"))
+
+    def journal(self):
+        with open(self.path, "rb") as handle:
+            data = handle.read()
+        self.assertEqual((len(data) - _HEADER.size) % _RECORD.size, 0)
+        return list(_RECORD.iter_unpack(data[_HEADER.size:]))
+
+    def test_journal_is_replayed_and_compacted(self):
+        series = HeartbeatSeries(path=self.path, minute_slots=180, hour_slots=4)
+        series.open(now=T0)
+        samples = self.feed(series)
+        series.close()
+        now = T0 + timedelta(hours=6)
+        self.assertLessEqual(series.records_written, 2 * 6 * 60)
+        self.assertLess(series.records_written, len(samples))
+
+        with open(self.path, "ab") as handle:
+            handle.write(b"\x01\x02\x03")  # torn record
+        replayed = HeartbeatSeries(path=self.path, minute_slots=180, hour_slots=4)
+        replayed.open(now=now)
+        replayed.close()
+        for start in (now - timedelta(hours=3), now - timedelta(minutes=170), now - timedelta(minutes=20)):
+            with self.subTest(start=start):
+                self.assertEqual(
+                    replayed.availability(7, start, now, now=now)[:6],
+                    series.availability(7, start, now, now=now)[:6],
+                )
+        # only the 4 retained hours (the current one included) are left in the file
+        records = self.journal()
+        self.assertTrue(records)
+        self.assertTrue(all(
+            (moment if kind == _HOUR else moment // 60) >= minute_of(now) // 60 - 3 for kind, _, moment, _, _, _ in records
+        ))
+
+    def test_closed_hours_replace_their_minutes(self):
+        series = HeartbeatSeries(path=self.path, minute_slots=60, hour_slots=4)
+        series.open(now=T0)
+        self.feed(series, hours=30)
+        series._log.flush()
+        # hour rollups, the minute ring and the deltas of the current hour: bounded by the retention
+        records = self.journal()
+        self.assertLessEqual(sum(kind == _HOUR for kind, *_ in records), 4)
+        self.assertLessEqual(len(records), 4 + 60 + 2 * 60)
+        self.assertGreater(series.records_written, 5 * len(records))
+
+        now = T0 + timedelta(hours=30)
+        replayed = HeartbeatSeries(path=None, minute_slots=60, hour_slots=4)
+        for record in records:
+            replayed._restore(*record)
+        start = now - timedelta(hours=3, minutes=20)
+        self.assertEqual(
+            replayed.availability(7, start, now, now=now)[:6],
+            series.availability(7, start, now, now=now)[:6],
+        )
+        series.close()
+
+    def test_version_1_journal_is_replayed(self):
+        source = HeartbeatSeries(path=None, minute_slots=180, hour_slots=48)
+        source.record(7, T0, "Disponible")
+        source.record(7, T0 + timedelta(minutes=1), "Panne")
+        with open(self.path, "wb") as handle:
+            handle.write(_HEADER.pack(b"HBTS", 1))
+            handle.write(_RECORD_V1.pack(7, minute_of(T0), 0, 1, 0))
+            handle.write(_RECORD_V1.pack(7, minute_of(T0) + 1, 0, 2, 1))
+
+        now = T0 + timedelta(minutes=5)
+        series = HeartbeatSeries(path=self.path, minute_slots=180, hour_slots=48)
+        series.open(now=now)
+        series.close()
+        self.assertEqual(series.availability(7, T0, now, now=now), source.availability(7, T0, now, now=now))
+        self.assertNotIn(_DELTA, {kind for kind, *_ in self.journal()})
+
+    def test_a_second_process_does_not_take_the_journal(self):
+        owner = HeartbeatSeries(path=self.path)
+        owner.open(now=T0)
+        other = HeartbeatSeries(path=self.path)
+        other.open(now=T0)
+        self.assertIsNone(other._log)
+        other.record(2, T0, "Disponible")
+
+        owner.record(1, T0, "Disponible")
+        owner.close()
+        other.close()
+        self.assertEqual([record[1] for record in self.journal()], [1])
+
+        # released on close
+        other.open(now=T0)
+        self.assertIsNotNone(other._log)
+        other.close()
+
+    def test_invalid_journal_is_set_aside(self):
+        with open(self.path, "wb") as handle:
+            handle.write(b"not a journal")
+        series = HeartbeatSeries(path=self.path)
+        series.open(now=T0)
+        series.record(1, T0, "Disponible")
+        series.close()
+        self.assertTrue(os.path.exists(self.path + ".invalide"))
+        self.assertEqual(os.path.getsize(self.path), _HEADER.size + _RECORD.size)
+
+    def test_batches_feed_the_series(self):
+        db = make_session()
+        seed_bulk_inventory(db, 10)
+        series = HeartbeatSeries(path=None)
+        heartbeats = [
+            schemas.HeartbeatSchema(mac_adresse="BB:00:00:00:00:01", statut="Error"),
+            schemas.HeartbeatSchema(mac_adresse="BB:00:00:00:00:02", statut="OK"),
+        ]
+        ingest_heartbeats(db, heartbeats, "10.0.0.1", now=T0, series=series)
+        window = series.availability(1, T0, T0 + timedelta(minutes=1), now=T0)
+        self.assertEqual((window.down_minutes, window.up_minutes), (1, 0))
+        self.assertEqual(series.availability(2, T0, T0 + timedelta(minutes=1), now=T0).up_minutes, 1)
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
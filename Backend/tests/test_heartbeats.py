@@ -0,0 +1,133 @@
+import random
+import unittest
+from datetime import datetime
+
+import models
+import schemas
+from db_fixtures import count_selects, make_session, seed_bulk_inventory
+from heartbeat_ingest import ingest_heartbeats
+from heartbeat_rules import STATUS_CRITIQUE, STATUS_OK, STATUS_WARNING, NewAlert, OpenAlert, apply_heartbeat
+
+NOW = datetime(2026, 1, 5, 12, 0, 0)
+
+
+def legacy_heartbeat(db, heartbeat, ip_adress):
+    # Former /iot/heartbeat body, one query per lookup (warning dedup on open Warning-level alerts)
+    objet = db.query(models.Objet).filter(models.Objet.mac_adresse == heartbeat.mac_adresse).first()
+    if not objet:
+        return
+    objet.ip_adress = ip_adress
+    objet.last_heartbeat = NOW
+    if heartbeat.statut in STATUS_CRITIQUE:
+        objet.statut = "Panne"
+        existing = db.query(models.Alerte).filter(
+            models.Alerte.id_objet == objet.id_objet,
+            models.Alerte.est_resolu == False,  # noqa: E712
+            models.Alerte.source == "IoT",
+        ).first()
+        if not existing:
+            db.add(models.Alerte(
+                message=f"ALERTE CRITIQUE AUTO : {heartbeat.statut}", niveau="Critical", source="IoT",
+                id_objet=objet.id_objet,
+            ))
+    elif heartbeat.statut in STATUS_WARNING:
+        if objet.statut != "Panne":
+            objet.statut = "Signalé"
+        existing = db.query(models.Alerte).filter(
+            models.Alerte.id_objet == objet.id_objet,
+            models.Alerte.niveau == "Warning",
+            models.Alerte.est_resolu == False,  # noqa: E712
+        ).first()
+        if not existing:
+            db.add(models.Alerte(
+                message=f"Maintenance requise : {heartbeat.statut}", niveau="Warning", source="IoT",
+                id_objet=objet.id_objet,
+            ))
+    elif heartbeat.statut in STATUS_OK:
+        if objet.statut in ["Panne", "Signalé"]:
+            objet.statut = "Disponible"
+    db.commit()
+
+
+def snapshot(db):
+    objets = db.query(models.Objet.id_objet, models.Objet.statut, models.Objet.ip_adress).order_by(models.Objet.id_objet).all()
+    alertes = (
+        db.query(models.Alerte.id_objet, models.Alerte.message, models.Alerte.niveau, models.Alerte.source)
+        .order_by(models.Alerte.id_alerte)
+        .all()
+    )
+    return [tuple(row) for row in objets], [tuple(row) for row in alertes]
+
+
+class HeartbeatRulesTests(unittest.TestCase):
+    def test_rules(self):
+        self.assertEqual(
+            apply_heartbeat("Disponible", "Surchauffe"),
+            ("Panne", NewAlert("ALERTE CRITIQUE AUTO : Surchauffe", "Critical")),
+        )
+        self.assertEqual(apply_heartbeat("Occupé", "Error", [OpenAlert("IoT", "Warning")]), ("Panne", None))
+        self.assertEqual(apply_heartbeat("Panne", "Papier Bas"), ("Panne", NewAlert("Maintenance requise : Papier Bas", "Warning")))
+        self.assertEqual(apply_heartbeat("Occupé", "Warning", [OpenAlert("Utilisateur", "Warning")]), ("Signalé", None))
+        self.assertEqual(
+            apply_heartbeat("Occupé", "Warning", [OpenAlert("IoT", "Critical")]),
+            ("Signalé", NewAlert("Maintenance requise : Warning", "Warning")),
+        )
+        self.assertEqual(apply_heartbeat("Signalé", "OK"), ("Disponible", None))
+        self.assertEqual(apply_heartbeat("Occupé", "Ready"), ("Occupé", None))
+        self.assertEqual(apply_heartbeat("Panne", "???"), ("Panne", None))
+
+
+class HeartbeatBatchTests(unittest.TestCase):
+    def setUp(self):
+        self.batch_db = make_session()
+        self.legacy_db = make_session()
+        for db in (self.batch_db, self.legacy_db):
+            seed_bulk_inventory(db, 120)
+            db.add(models.Alerte(message="Warning imprimante", source="Utilisateur", id_objet=4, est_resolu=False))
+            db.add(models.Alerte(
+                message="ALERTE CRITIQUE AUTO : Error", niveau="Critical", source="IoT", id_objet=5, est_resolu=False,
+            ))
+            db.commit()
+
+    def tearDown(self):
+        self.batch_db.close()
+        self.legacy_db.close()
+
+    def test_batch_matches_one_heartbeat_at_a_time(self):
+        rng = random.Random(11)
+        statuts = sorted(STATUS_CRITIQUE | STATUS_WARNING | STATUS_OK) + ["Inconnu"]
+        macs = [f"BB:00:00:00:00:{n:02X}" for n in range(1, 140)]
+        heartbeats = [
+            schemas.HeartbeatSchema(
+                mac_adresse=rng.choice(macs),
+                statut=rng.choice(statuts),
+                ip_adress=rng.choice([None, f"10.0.0.{rng.randint(1, 250)}"]),
+            )
+            for _ in range(600)
+        ]
+
+        result = ingest_heartbeats(self.batch_db, heartbeats, "192.168.1.2", now=NOW)
+        for heartbeat in heartbeats:
+            legacy_heartbeat(self.legacy_db, heartbeat, heartbeat.ip_adress or "192.168.1.2")
+
+        self.assertEqual(snapshot(self.batch_db), snapshot(self.legacy_db))
+        self.assertEqual(result.processed + len(result.unknown), len(heartbeats))
+        self.assertTrue(all(int(mac[-2:], 16) > 120 for mac in result.unknown))
+        self.assertTrue(result.changed)
+
+    def test_two_selects_per_batch(self):
+        heartbeats = [
+            schemas.HeartbeatSchema(mac_adresse=f"BB:00:00:00:00:{n:02X}", statut="Critical" if n % 2 else "OK")
+            for n in range(1, 101)
+        ]
+        with count_selects(self.batch_db) as statements:
+            result = ingest_heartbeats(self.batch_db, heartbeats, "10.1.1.1", now=NOW)
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(result.processed, 100)
+        self.assertEqual(result.statuts["BB:00:00:00:00:01"], "Panne")
+        last = self.batch_db.get(models.Objet, 2)
+        self.assertEqual((last.ip_adress, last.last_heartbeat), ("10.1.1.1", NOW))
+
+
+if __name__ == "__main__":
+    unittest.main()
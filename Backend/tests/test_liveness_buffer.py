@@ -0,0 +1,93 @@
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+import models
+import schemas
+from db_fixtures import make_session, seed_bulk_inventory
+from heartbeat_ingest import ingest_heartbeats
+from liveness_buffer import LivenessBuffer
+
+T0 = datetime(2026, 3, 1, 8, 0, 0)
+
+
+class LivenessBufferTests(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        seed_bulk_inventory(self.db, 60)
+        self.db.query(models.Objet).update({models.Objet.last_heartbeat: T0, models.Objet.ip_adress: "10.0.0.1"})
+        self.db.commit()
+        self.buffer = LivenessBuffer(sessionmaker(bind=self.db.get_bind()), flush_seconds=60)
+
+        self.updates = []
+        event.listen(self.db.get_bind(), "before_cursor_execute", self._record_update)
+
+    def tearDown(self):
+        event.remove(self.db.get_bind(), "before_cursor_execute", self._record_update)
+        self.buffer.stop()
+        self.db.close()
+
+    def _record_update(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("UPDATE"):
+            self.updates.append((statement, executemany))
+
+    def last_heartbeat(self, id_objet):
+        self.db.expire_all()
+        return self.db.get(models.Objet, id_objet).last_heartbeat
+
+    def test_updates_are_coalesced_per_object_and_flushed_together(self):
+        for second in range(5):
+            for id_objet in (1, 2, 3):
+                self.buffer.record(id_objet, T0 + timedelta(seconds=second + 1), "10.0.0.1")
+        self.assertEqual(len(self.buffer), 3)
+        self.assertGreater(self.buffer.lag_seconds(), 0.0)
+        self.assertEqual(self.updates, [])
+
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(len(self.updates), 1)
+        self.assertTrue(self.updates[0][1])
+        self.assertEqual(self.last_heartbeat(2), T0 + timedelta(seconds=5))
+        self.assertEqual((len(self.buffer), self.buffer.lag_seconds(), self.buffer.flushed), (0, 0.0, 3))
+
+    def test_flush_never_moves_last_heartbeat_backwards(self):
+        self.buffer.record(1, T0 + timedelta(seconds=10), "10.0.0.1")
+        objet = self.db.get(models.Objet, 1)
+        objet.last_heartbeat = T0 + timedelta(seconds=20)
+        self.db.commit()
+        self.buffer.flush()
+        self.assertEqual(self.last_heartbeat(1), T0 + timedelta(seconds=20))
+
+    def test_batch_defers_liveness_only_heartbeats(self):
+        disponibles = [
+            objet for objet in self.db.query(models.Objet).filter(models.Objet.statut == "Disponible").limit(4)
+        ]
+        panne = self.db.query(models.Objet).filter(models.Objet.statut == "Panne").first()
+        heartbeats = [schemas.HeartbeatSchema(mac_adresse=objet.mac_adresse, statut="OK") for objet in disponibles]
+        heartbeats.append(schemas.HeartbeatSchema(mac_adresse=panne.mac_adresse, statut="OK"))
+        now = T0 + timedelta(minutes=1)
+
+        result = ingest_heartbeats(self.db, heartbeats, "10.0.0.1", now=now, liveness=self.buffer)
+        self.assertEqual(result.changed, [(panne.id_objet, "Disponible")])
+        self.assertEqual(len(self.buffer), len(disponibles))
+        self.assertEqual(self.last_heartbeat(panne.id_objet), now)
+        self.assertEqual(self.last_heartbeat(disponibles[0].id_objet), T0)
+
+        self.buffer.stop()
+        self.assertEqual(self.last_heartbeat(disponibles[0].id_objet), now)
+
+    def test_background_thread_flushes_when_full(self):
+        self.buffer = LivenessBuffer(sessionmaker(bind=self.db.get_bind()), flush_seconds=60, max_pending=2)
+        self.buffer.start()
+        self.buffer.record(1, T0 + timedelta(seconds=1), "10.0.0.1")
+        self.buffer.record(2, T0 + timedelta(seconds=1), "10.0.0.1")
+        deadline = time.monotonic() + 5
+        while self.buffer.flushed < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.buffer.flushed, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+
+import metrics
+from db_fixtures import make_session, seed_inventory
+from search_engine import SmartSearchEngine
+
+
+class HistogramTests(unittest.TestCase):
+    def test_prometheus_rendering_is_cumulative(self):
+        registry = metrics.MetricsRegistry()
+        histogram = registry.histogram("demo_seconds", "demo", buckets=(0.01, 0.1))
+        histogram.observe(0.005, stage="sql")
+        histogram.observe(0.05, stage="sql")
+        histogram.observe(3.0, stage="sql")
+
+        text = registry.render()
+        self.assertIn('demo_seconds_bucket{stage="sql",le="0.01"} 1', text)
+        self.assertIn('demo_seconds_bucket{stage="sql",le="0.1"} 2', text)
+        self.assertIn('demo_seconds_bucket{stage="sql",le="+Inf"} 3', text)
+        self.assertIn('demo_seconds_count{stage="sql"} 3', text)
+
+
+class CallbackCounterTests(unittest.TestCase):
+    def test_read_at_scrape_time_as_a_counter(self):
+        registry = metrics.MetricsRegistry()
+        hits = [3]
+        registry.callback_counter("demo_hits_total", "demo", lambda: hits[0])
+        hits[0] += 2
+
+        text = registry.render()
+        self.assertIn("# TYPE demo_hits_total counter", text)
+        self.assertIn("demo_hits_total 5", text)
+
+
+class SearchTimingTests(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        seed_inventory(self.db)
+        self.engine = SmartSearchEngine()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_search_records_each_stage(self):
+        timer = metrics.StageTimer("search")
+        results = self.engine.search(self.db, query="imprimante hp", timer=timer)
+
+        stages = [name for name, _ in timer.stages]
+        for stage in ("tokens", "metadata", "parse", "candidates", "aggregates", "ranking"):
+            self.assertIn(stage, stages)
+        self.assertIn(("results", len(results)), timer.counts)
+        self.assertRegex(timer.server_timing(), r'^tokens;dur=\d+\.\d{2}, ')
+
+    def test_suggest_records_candidates(self):
+        timer = metrics.StageTimer("suggest")
+        self.engine.suggest(self.db, "scan", timer=timer)
+        self.assertIn("candidates", dict(timer.counts))
+
+    def test_null_timer_records_nothing(self):
+        self.engine.search(self.db, query="scanner", timer=metrics.NULL_TIMER)
+        self.assertEqual(metrics.NULL_TIMER.server_timing(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
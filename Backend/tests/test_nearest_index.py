@@ -0,0 +1,150 @@
+import math
+import unittest
+
+import models
+from db_fixtures import make_session, seed_bulk_inventory
+from nearest_index import AvailabilityIndex, NearestIndex, RoomDistanceMatrix
+from search_engine import SmartSearchEngine
+from spatial_index import Room, SpatialIndex, floor_elevations
+
+
+class RoomDistanceMatrixTests(unittest.TestCase):
+    def setUp(self):
+        rooms = [Room(1, 0.0, 0.0, 0), Room(2, 3.0, 4.0, 0), Room(3, 0.0, 0.0, 1), Room(4, None, None, 0)]
+        self.spatial = SpatialIndex(rooms, floor_elevations([(0, 4.0), (1, 3.0)]))
+        self.matrix = RoomDistanceMatrix(self.spatial, floor_penalty=2.0)
+
+    def test_distances_are_planar_plus_floor_penalty(self):
+        self.assertEqual(len(self.matrix), 3)
+        self.assertNotIn(4, self.matrix)
+        self.assertEqual(self.matrix.distance(1, 2), 5.0)
+        self.assertEqual(self.matrix.distance(2, 1), 5.0)
+        self.assertEqual(self.matrix.distance(1, 3), 8.0)
+        self.assertEqual(self.matrix.distance(2, 3), 13.0)
+        self.assertEqual(self.matrix.distance(1, 4), math.inf)
+
+    def test_nearest_on_sparse_and_dense_keys(self):
+        availability = AvailabilityIndex()
+        availability.upsert(10, 3, [("type", "scanner")], True)
+        availability.upsert(11, 2, [("type", "scanner"), ("fonction", "pdf")], True)
+        availability.upsert(12, 2, [("type", "scanner")], False)
+        availability.upsert(13, 1, [("type", "ecran")], True)
+        nearest = NearestIndex(self.matrix, availability)
+
+        self.assertEqual(nearest.nearest(1, ("type", "scanner"), 5), [(5.0, 11), (8.0, 10)])
+        self.assertEqual(nearest.nearest(1, ("type", "scanner"), 5, ("fonction", "pdf")), [(5.0, 11)])
+        self.assertEqual(nearest.nearest(3, ("type", "ecran"), 1), [(8.0, 13)])
+
+        nearest.set_available(12, True)
+        nearest.set_available(11, False)
+        self.assertEqual(nearest.nearest(1, ("type", "scanner"), 5), [(5.0, 12), (8.0, 10)])
+
+
+class NearestAvailableTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = make_session()
+        seed_bulk_inventory(cls.db, 1500)
+        cls.engine = SmartSearchEngine()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.close()
+
+    def brute_force(self, origin_salle, type_objet=None, fonction=None, k=5):
+        matrix = self.engine._get_nearest_index(self.db).matrix
+        query = self.db.query(models.Objet).filter(models.Objet.statut == "Disponible")
+        if type_objet:
+            query = query.filter(models.Objet.type_objet == type_objet)
+        matches = [
+            obj for obj in query.all()
+            if fonction is None or any(f.nom == fonction for f in obj.fonctionnalites)
+        ]
+        # Equidistant rooms come by room id, objects by id within a room
+        ranked = sorted((matrix.distance(origin_salle, obj.id_salle), obj.id_salle, obj.id_objet) for obj in matches)
+        return [(round(distance, 2), object_id) for distance, _, object_id in ranked[:k]]
+
+    def test_matches_brute_force(self):
+        for origin_salle in (1, 6, 12):
+            for type_objet, fonction in (("Scanner", None), (None, "HDMI"), ("Imprimante", "PDF")):
+                for k in (1, 5, 40):
+                    results = self.engine.nearest_available(
+                        self.db, origin_salle, type_objet=type_objet, fonction=fonction, k=k,
+                    )
+                    self.assertEqual(
+                        [(obj.distance_m, obj.id_objet) for obj in results],
+                        self.brute_force(origin_salle, type_objet, fonction, k),
+                        (origin_salle, type_objet, fonction, k),
+                    )
+
+    def test_type_aliases_and_invalid_requests(self):
+        by_alias = self.engine.nearest_available(self.db, 3, type_objet="printer", k=3)
+        by_name = self.engine.nearest_available(self.db, 3, type_objet="imprimante", k=3)
+        self.assertEqual([obj.id_objet for obj in by_alias], [obj.id_objet for obj in by_name])
+        with self.assertRaises(ValueError):
+            self.engine.nearest_available(self.db, 3)
+        with self.assertRaises(ValueError):
+            self.engine.nearest_available(self.db, 404, type_objet="Scanner")
+
+    def test_status_changes_update_the_index(self):
+        first = self.engine.nearest_available(self.db, 2, type_objet="Projecteur", k=1)[0]
+        objet = self.db.get(models.Objet, first.id_objet)
+
+        objet.statut = "Occupé"
+        self.db.commit()
+        self.engine.objet_status_changed(objet.id_objet, objet.statut)
+        ids = [obj.id_objet for obj in self.engine.nearest_available(self.db, 2, type_objet="Projecteur", k=5)]
+        self.assertNotIn(objet.id_objet, ids)
+
+        objet.statut = "Disponible"
+        self.db.commit()
+        self.engine.objet_status_changed(objet.id_objet, objet.statut)
+        again = self.engine.nearest_available(self.db, 2, type_objet="Projecteur", k=1)
+        self.assertEqual(again[0].id_objet, objet.id_objet)
+
+        # Written without the hook: the database check drops it and the next one fills in
+        objet.statut = "Panne"
+        self.db.commit()
+        results = self.engine.nearest_available(self.db, 2, type_objet="Projecteur", k=5)
+        self.assertNotIn(objet.id_objet, [obj.id_objet for obj in results])
+        self.assertEqual(len(results), 5)
+
+        objet.statut = "Disponible"
+        self.db.commit()
+        self.engine.objet_status_changed(objet.id_objet, objet.statut)
+
+    def test_objects_freed_elsewhere_come_back(self):
+        first = self.engine.nearest_available(self.db, 4, type_objet="Scanner", k=1)[0]
+        objet = self.db.get(models.Objet, first.id_objet)
+        objet.statut = "Occupé"
+        self.db.commit()
+        self.engine.objet_status_changed(objet.id_objet, objet.statut)
+        self.assertNotEqual(self.engine.nearest_available(self.db, 4, type_objet="Scanner", k=1)[0].id_objet, objet.id_objet)
+
+        # Freed by another process: no hook in this one
+        objet.statut = "Disponible"
+        self.db.commit()
+        again = self.engine.nearest_available(self.db, 4, type_objet="Scanner", k=3)
+        self.assertEqual(again[0].id_objet, objet.id_objet)
+        self.assertEqual([(obj.distance_m, obj.id_objet) for obj in again], self.brute_force(4, "Scanner", k=3))
+
+    def test_room_matrix_outlives_data_versions(self):
+        matrix = self.engine._get_nearest_index(self.db).matrix
+        self.engine.bump_data_version()
+        self.assertIs(self.engine._get_nearest_index(self.db).matrix, matrix)
+
+        salle = self.db.get(models.Salle, 3)
+        salle.coord_x += 1.0
+        self.db.commit()
+        self.engine.bump_data_version()
+        moved = self.engine._get_nearest_index(self.db).matrix
+        self.assertIsNot(moved, matrix)
+        self.assertNotEqual(moved.distance(3, 4), matrix.distance(3, 4))
+
+        salle.coord_x -= 1.0
+        self.db.commit()
+        self.engine.bump_data_version()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import sessionmaker
+
+import models
+import schemas
+from db_fixtures import make_session, seed_bulk_inventory
+from device_registry import DeviceRegistry
+from heartbeat_ingest import ingest_heartbeats
+from heartbeat_rules import STATUT_HORS_LIGNE
+from liveness_buffer import LivenessBuffer
+from offline_sweeper import OfflineSweeper
+
+NOW = datetime(2026, 4, 1, 12, 0, 0)
+STALE = NOW - timedelta(hours=2)
+
+
+class OfflineSweeperTests(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        seed_bulk_inventory(self.db, 60)
+        self.db.query(models.Objet).update({models.Objet.last_heartbeat: NOW - timedelta(minutes=1)})
+        self.db.query(models.Objet).filter(models.Objet.id_objet <= 20).update({models.Objet.last_heartbeat: STALE})
+        self.db.query(models.Objet).filter(models.Objet.id_objet == 2).update({models.Objet.statut: "Signalé"})
+        self.db.add(models.Alerte(message="ALERTE CRITIQUE AUTO : Error", niveau="Critical", source="IoT", id_objet=2))
+        self.db.commit()
+        self.sessions = sessionmaker(bind=self.db.get_bind())
+        self.changes = []
+
+        self.statements = []
+        event.listen(self.db.get_bind(), "before_cursor_execute", self._record)
+
+    def tearDown(self):
+        event.remove(self.db.get_bind(), "before_cursor_execute", self._record)
+        self.db.close()
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    def make_sweeper(self, **options):
+        sweeper = OfflineSweeper(self.sessions, offline_after=900, enabled=False, **options)
+
+        def on_status_change(id_objet, statut):
+            self.changes.append((id_objet, statut))
+            if sweeper.registry is not None:
+                sweeper.registry.set_statut(id_objet, statut)
+
+        sweeper.on_status_change = on_status_change
+        return sweeper
+
+    def expected_offline(self):
+        return sorted(
+            id_objet for id_objet, statut in self.db.query(models.Objet.id_objet, models.Objet.statut)
+            if id_objet <= 20 and statut in ("Disponible", "Signalé")
+        )
+
+    def open_offline_alerts(self):
+        return sorted(
+            id_objet for (id_objet,) in self.db.query(models.Alerte.id_objet).filter(
+                models.Alerte.est_resolu == False,  # noqa: E712
+                models.Alerte.niveau == "Critical",
+                models.Alerte.source == "IoT",
+            )
+        )
+
+    def test_marks_stale_devices_offline_once(self):
+        expected = self.expected_offline()
+        occupied = {id_objet for (id_objet,) in self.db.query(models.Objet.id_objet).filter(models.Objet.statut != "Disponible")}
+        sweeper = self.make_sweeper()
+
+        self.assertEqual(sweeper.sweep(NOW), len(expected))
+        self.db.expire_all()
+        offline = sorted(
+            id_objet for (id_objet,) in self.db.query(models.Objet.id_objet).filter(models.Objet.statut == STATUT_HORS_LIGNE)
+        )
+        self.assertEqual(offline, expected)
+        self.assertEqual(sorted(self.changes), [(id_objet, STATUT_HORS_LIGNE) for id_objet in expected])
+        # object 2 already had an open IoT Critical alert
+        self.assertEqual(self.open_offline_alerts(), expected)
+        self.assertEqual(sweeper.alerts_raised, len(expected) - 1)
+        self.assertFalse(occupied.difference({2}).intersection(offline))
+
+        self.assertEqual(sweeper.sweep(NOW + timedelta(minutes=5)), 0)
+
+    def test_batches_are_bounded(self):
+        expected = self.expected_offline()
+        sweeper = self.make_sweeper(batch_size=3)
+        self.statements.clear()
+        self.assertEqual(sweeper.sweep(NOW), len(expected))
+        updates = [statement for statement, _ in self.statements if statement.lstrip().upper().startswith("UPDATE")]
+        self.assertEqual(len(updates), len(expected) // 3 + 1)
+
+    def test_sweep_reads_the_partial_index(self):
+        # With statistics (as on PostgreSQL) the low-cardinality ix_objets_statut loses to the partial index
+        self.db.execute(text("ANALYZE"))
+        self.db.commit()
+        self.make_sweeper().sweep_batch(NOW)
+        statement, parameters = next(
+            (statement, parameters) for statement, parameters in self.statements
+            if statement.lstrip().upper().startswith("UPDATE")
+        )
+        plan = [row[3] for row in self.db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+        self.assertTrue(any("ix_objets_heartbeat_sweep" in step for step in plan), plan)
+        self.assertFalse(any(step.startswith("SCAN objets") for step in plan), plan)
+
+    def test_pending_liveness_counts_as_a_heartbeat(self):
+        liveness = LivenessBuffer(self.sessions, flush_seconds=60)
+        liveness.record(1, NOW, "10.0.0.1")
+        sweeper = self.make_sweeper(liveness=liveness)
+        sweeper.sweep(NOW)
+        self.db.expire_all()
+        self.assertNotEqual(self.db.get(models.Objet, 1).statut, STATUT_HORS_LIGNE)
+        self.assertEqual(self.db.get(models.Objet, 1).last_heartbeat, NOW)
+
+    def test_heartbeat_brings_device_back_and_alert_is_not_duplicated(self):
+        registry = DeviceRegistry()
+        sweeper = self.make_sweeper(registry=registry)
+        id_objet = self.expected_offline()[0]
+        sweeper.sweep(NOW)
+        mac = self.db.get(models.Objet, id_objet).mac_adresse
+        self.assertEqual(registry.lookup(self.db, mac).statut, STATUT_HORS_LIGNE)
+
+        result = ingest_heartbeats(
+            self.db, [schemas.HeartbeatSchema(mac_adresse=mac, statut="Ready")], "10.0.0.1",
+            now=NOW + timedelta(minutes=1), registry=registry,
+        )
+        self.assertEqual(result.statuts[mac], "Disponible")
+
+        sweeper.sweep(NOW + timedelta(hours=1))
+        self.db.expire_all()
+        self.assertEqual(self.db.get(models.Objet, id_objet).statut, STATUT_HORS_LIGNE)
+        self.assertEqual(self.open_offline_alerts().count(id_objet), 1)
+        fresh = DeviceRegistry()
+        fresh.lookup(self.db, mac)
+        self.assertEqual(registry.open_alert_keys(), fresh.open_alert_keys())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+from pattern_matcher import AhoCorasick, QueryMatcher
+from search_engine import SmartSearchEngine, _CatalogSnapshot, _normalize_text
+
+
+class AhoCorasickTests(unittest.TestCase):
+    def test_overlapping_patterns_with_positions(self):
+        automaton = AhoCorasick([("he", 1), ("she", 2), ("his", 3), ("hers", 4)])
+        hits = sorted(automaton.iter_matches("ushers"))
+        self.assertEqual(hits, [(1, 4, 2), (2, 4, 1), (2, 6, 4)])
+
+    def test_query_matcher_priority(self):
+        matcher = QueryMatcher({
+            "status": [("dispo", "Disponible"), ("libre", "Disponible"), ("hs", "Panne")],
+        })
+        hits = matcher.scan("imprimante hs ou dispo")
+        self.assertEqual(hits.first("status"), "Disponible")
+        self.assertEqual([hit[3] for hit in hits.all("status")], ["Disponible", "Panne"])
+        self.assertIsNone(hits.first("type"))
+
+
+class MatcherParityTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = SmartSearchEngine()
+        cls.catalog = _CatalogSnapshot(
+            0,
+            ["Scanner", "Imprimante", "Projecteur"],
+            ["HP", "Canon", "Epson"],
+            ["Scan A4", "PDF", "Recto verso"],
+        )
+        cls.matcher = cls.engine._get_query_matcher(cls.catalog)
+
+    def test_same_results_as_per_alias_loops(self):
+        queries = [
+            "je veux scanner hp etage 1",
+            "imprimante canon recto verso dispo",
+            "i want print",
+            "projector epson busy",
+            "اريد شي لطباعة ورقة",
+            "ecran libre salle b12",
+            "scan a4 en panne",
+        ]
+        for query in queries:
+            normalized = _normalize_text(query)
+            hits = self.matcher.scan(normalized)
+            terms = normalized.split()
+            with self.subTest(query=query):
+                self.assertEqual(
+                    self.engine._infer_type_from_terms(terms, self.catalog.types, normalized, hits=hits),
+                    self.engine._infer_type_from_terms(terms, self.catalog.types, normalized),
+                )
+                for kind, values in (("marque", self.catalog.marques), ("fonction", self.catalog.fonctions)):
+                    self.assertEqual(
+                        self.engine._best_value_from_query(terms, normalized, values, 90, hits=hits, kind=kind),
+                        self.engine._best_value_from_query(terms, normalized, values, 90),
+                    )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import re
+import unittest
+
+import models
+from db_fixtures import count_selects, make_session, seed_inventory
+from search_engine import SmartSearchEngine
+
+# "SCAN objets" sans index = parcours séquentiel ; "SCAN anon_1" / "(join-2)" = sous-requêtes déjà filtrées
+SEQ_SCAN = re.compile(r"^SCAN (objets|fonctionnalites|reservations|association_objet_fonction)\b(?!.*USING)")
+
+
+def _plan(db, statement, parameters):
+    rows = db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+    return [row[3] for row in rows]
+
+
+class SearchFilterPlanTests(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        seed_inventory(self.db)
+        self.db.add_all([
+            models.Reservation(id_objet=1, statut_reservation="ACTIVE"),
+            models.Reservation(id_objet=1, statut_reservation="WAITING"),
+        ])
+        self.db.commit()
+        self.engine = SmartSearchEngine()
+
+    def tearDown(self):
+        self.db.close()
+
+    def _search_plans(self, **filters):
+        self.engine.search(self.db, **filters)
+        # Warm parse caches, but plan the ranking path rather than a result cache hit
+        self.engine.result_cache.clear()
+        with count_selects(self.db, with_parameters=True) as statements:
+            self.engine.search(self.db, **filters)
+        # The shared version read is a primary-key lookup, planned apart
+        version_read = statements.pop(0)
+        self.assertIn("FROM search_versions", version_read[0])
+        self.assertIn("USING INTEGER PRIMARY KEY", " ".join(_plan(self.db, *version_read)))
+        return [_plan(self.db, statement, parameters) for statement, parameters in statements]
+
+    def test_hot_filters_use_indexes(self):
+        cases = {
+            "ix_objets_statut_lower": {"filtre_statut": "disponible"},
+            "ix_objets_type_objet_lower": {"filtre_type": "imprimante"},
+            "ix_objets_nom_marque_lower": {"filtre_marque": "hp"},
+            "ix_fonctionnalites_nom_lower": {"filtre_fonction": "pdf"},
+        }
+        for index_name, filters in cases.items():
+            with self.subTest(filters=filters):
+                plans = self._search_plans(**filters)
+                self.assertEqual(len(plans), 2)
+                candidate_plan, feature_plan = plans
+                self.assertTrue(any(index_name in step for step in candidate_plan), candidate_plan)
+                for plan in plans:
+                    for step in plan:
+                        self.assertIsNone(SEQ_SCAN.match(step), plan)
+                self.assertTrue(any("SEARCH reservations USING" in step for step in feature_plan), feature_plan)
+
+    def test_reservation_queue_lookup_uses_index(self):
+        # Même forme que _get_oldest_waiting_reservation / _count_waiting dans main.py
+        with count_selects(self.db, with_parameters=True) as statements:
+            (
+                self.db.query(models.Reservation)
+                .filter(
+                    models.Reservation.id_objet == 1,
+                    models.Reservation.statut_reservation.in_(["WAITING", "Waiting"]),
+                )
+                .order_by(models.Reservation.date_reservation.asc())
+                .first()
+            )
+        plan = _plan(self.db, *statements[0])
+        self.assertTrue(any("ix_reservations_objet_statut" in step for step in plan), plan)
+        for step in plan:
+            self.assertIsNone(SEQ_SCAN.match(step), plan)
+
+
+if __name__ == "__main__":
+    unittest.main()
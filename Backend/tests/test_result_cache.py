@@ -0,0 +1,125 @@
+import unittest
+
+import models
+from db_fixtures import count_selects, make_session, seed_bulk_inventory
+from result_cache import ObjectProbe, ResultCache, SearchScope
+from search_engine import SmartSearchEngine
+
+
+class ResultCacheTests(unittest.TestCase):
+    def test_bounded_by_bytes(self):
+        cache = ResultCache(max_bytes=250)
+        for n in range(4):
+            self.assertTrue(cache.put(n, [n], SearchScope(frozenset({n})), 100, cache.generation))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.bytes, 200)
+        self.assertIsNone(cache.get(0))
+        self.assertEqual(cache.get(3), [3])
+        self.assertFalse(cache.put("big", [], SearchScope(frozenset()), 251, cache.generation))
+
+    def test_status_writes_only_reach_dependents_and_status_filters(self):
+        cache = ResultCache()
+        cache.put("a", "a", SearchScope(frozenset({1, 2})), 10, cache.generation)
+        cache.put("b", "b", SearchScope(frozenset({3}), statut="disponible"), 10, cache.generation)
+        cache.put("c", "c", SearchScope(frozenset({4}), statut="panne"), 10, cache.generation)
+
+        self.assertEqual(cache.invalidate(ObjectProbe(2, "occupe")), 1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.invalidate(ObjectProbe(9, "disponible")), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "c")
+
+    def test_full_writes_reach_entries_the_object_can_join(self):
+        cache = ResultCache()
+        cache.put("scanner", 1, SearchScope(frozenset({1}), type_objet="scanner", terms=("pdf",)), 10, cache.generation)
+        cache.put("ecran", 2, SearchScope(frozenset({2}), type_objet="ecran"), 10, cache.generation)
+
+        probe = ObjectProbe(7, "disponible", full=True, type_objet="scanner", haystack="scanner canon wifi")
+        self.assertEqual(cache.invalidate(probe), 0)
+        self.assertEqual(cache.invalidate(probe._replace(haystack="scanner canon pdf")), 1)
+        self.assertIsNone(cache.get("scanner"))
+        self.assertEqual(cache.get("ecran"), 2)
+
+    def test_results_computed_across_a_relevant_write_are_not_stored(self):
+        cache = ResultCache()
+        generation = cache.generation
+        cache.invalidate(ObjectProbe(5, "panne"))
+        self.assertTrue(cache.put("other", 1, SearchScope(frozenset({6})), 10, generation))
+        self.assertFalse(cache.put("stale", 1, SearchScope(frozenset({5})), 10, generation))
+        cache.clear()
+        self.assertFalse(cache.put("after_clear", 1, SearchScope(frozenset({6})), 10, generation))
+
+
+class SearchResultCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        seed_bulk_inventory(self.db, 800)
+        self.engine = SmartSearchEngine()
+
+    def tearDown(self):
+        self.db.close()
+
+    def fresh(self, **arguments):
+        self.engine.result_cache.clear()
+        return [(obj.id_objet, obj.statut, obj.relevance_score) for obj in self.engine.search(self.db, **arguments)]
+
+    def cached(self, **arguments):
+        return [(obj.id_objet, obj.statut, obj.relevance_score) for obj in self.engine.search(self.db, **arguments)]
+
+    def set_statut(self, objet, statut):
+        objet.statut = statut
+        self.db.commit()
+        self.engine.objet_status_changed(objet.id_objet, objet.statut)
+
+    def test_repeated_search_is_served_from_the_cache(self):
+        arguments = {"query": "imprimante hp", "limit": 10}
+        first = self.cached(**arguments)
+        with count_selects(self.db) as statements:
+            second = self.cached(**arguments)
+        self.assertEqual(second, first)
+        self.assertEqual(statements, [])
+        self.assertEqual(self.engine.result_cache.hits, 1)
+
+    def test_status_change_of_a_result_is_never_served_stale(self):
+        arguments = {"query": "scanner", "limit": 10}
+        top = self.db.get(models.Objet, self.cached(**arguments)[0][0])
+        self.set_statut(top, "Panne" if top.statut != "Panne" else "Disponible")
+        after = self.cached(**arguments)
+        self.assertEqual(after, self.fresh(**arguments))
+        self.assertNotEqual(after[0][0], top.id_objet)
+
+    def test_unrelated_status_change_keeps_the_entry(self):
+        arguments = {"filtre_type": "Ecran", "limit": 5}
+        self.cached(**arguments)
+        outsider = self.db.query(models.Objet).filter(models.Objet.type_objet == "Routeur").first()
+        self.set_statut(outsider, "Occupé" if outsider.statut != "Occupé" else "Disponible")
+        with count_selects(self.db) as statements:
+            self.cached(**arguments)
+        self.assertEqual(statements, [])
+
+    def test_object_entering_a_status_filter_invalidates(self):
+        arguments = {"filtre_statut": "Disponible", "filtre_type": "Projecteur"}
+        before = self.cached(**arguments)
+        broken = (
+            self.db.query(models.Objet)
+            .filter(models.Objet.type_objet == "Projecteur", models.Objet.statut == "Panne")
+            .first()
+        )
+        self.set_statut(broken, "Disponible")
+        after = self.cached(**arguments)
+        self.assertEqual(len(after), len(before) + 1)
+        self.assertEqual(after, self.fresh(**arguments))
+
+    def test_update_that_moves_an_object_into_a_filter_invalidates(self):
+        arguments = {"query": "routeur", "limit": 20}
+        self.cached(**arguments)
+        objet = self.db.query(models.Objet).filter(models.Objet.type_objet == "Ecran").first()
+        objet.type_objet = "Routeur"
+        self.db.commit()
+        self.engine.bump_data_version()
+        self.engine.refresh_objet(objet)
+        self.assertEqual(self.cached(**arguments), self.fresh(**arguments))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,21 @@
+import re
+import unicodedata
 import unittest
 
-from search_engine import SmartSearchEngine, _clean_noise_terms
+import models
+import metrics
+import schemas
+from db_fixtures import count_selects, make_session, seed_bulk_inventory, seed_inventory
+from migrations import SMARTFIND_FOLD_DDL, postgres_statements, run_migrations
+from search_engine import (
+    SmartSearchEngine,
+    _clean_noise_terms,
+    decode_search_cursor,
+    encode_search_cursor,
+    np,
+    search_fingerprint,
+)
+from text_normalize import normalize_text
 
 
 class SearchEngineBehaviorTests(unittest.TestCase):
@@ -53,5 +68,284 @@ class SearchEngineBehaviorTests(unittest.TestCase):
         self.assertIn("hp", cleaned)
 
 
+class CatalogCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        seed_inventory(self.db)
+        self.engine = SmartSearchEngine()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_catalog_is_reused_until_data_version_bump(self):
+        catalog = self.engine._get_catalog(self.db)
+        self.assertIn("Scanner", catalog.types)
+        self.assertEqual(catalog.marque_map.get("hp"), "HP")
+
+        with count_selects(self.db) as statements:
+            self.assertIs(self.engine._get_catalog(self.db), catalog)
+        self.assertEqual(statements, [])
+
+        self.engine.bump_data_version()
+        with count_selects(self.db) as statements:
+            refreshed = self.engine._get_catalog(self.db)
+        self.assertIsNot(refreshed, catalog)
+        self.assertEqual(len(statements), 3)
+
+
+class TokenizerModeTests(unittest.TestCase):
+    def test_auto_mode_skips_spacy_for_short_or_keyword_queries(self):
+        engine = SmartSearchEngine(tokenizer_mode="auto")
+        self.assertFalse(engine._needs_lemmas("hp"))
+        self.assertFalse(engine._needs_lemmas("imprimante dispo 2"))
+        self.assertFalse(engine._needs_lemmas("i want print"))
+        self.assertTrue(engine._needs_lemmas("imprimantes couleur au deuxième étage"))
+
+    def test_rules_mode_never_uses_spacy(self):
+        engine = SmartSearchEngine(tokenizer_mode="rules")
+        self.assertIsNone(engine.nlp)
+        self.assertFalse(engine._needs_lemmas("imprimantes couleur au deuxième étage"))
+        self.assertEqual(engine._extract_tokens("Imprimante HP, étage 2"), ["imprimante", "hp", "etage", "2"])
+
+
+class QueryCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        seed_inventory(self.db)
+        self.engine = SmartSearchEngine()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_repeated_queries_skip_parsing(self):
+        first = [obj.id_objet for obj in self.engine.search(self.db, query="imprimante hp dispo")]
+        self.assertEqual(self.engine.query_cache.stats()["misses"], 1)
+
+        calls = []
+        original = self.engine._extract_tokens
+        self.engine._extract_tokens = lambda text: calls.append(text) or original(text)
+
+        again = [obj.id_objet for obj in self.engine.search(self.db, query="  Imprimante  HP dispo ")]
+        self.assertEqual(again, first)
+        self.assertEqual(calls, [])
+        self.assertEqual(self.engine.query_cache.hits, 1)
+
+        self.engine.bump_data_version()
+        self.engine.search(self.db, query="imprimante hp dispo")
+        self.assertEqual(len(calls), 1)
+
+    def test_explicit_type_filter_overrides_cached_inference(self):
+        self.engine.search(self.db, query="scanner")
+        results = self.engine.search(self.db, query="scanner", filtre_type="Imprimante")
+        self.assertTrue(all(obj.type_objet == "Imprimante" for obj in results))
+
+
+class CandidateFeatureTests(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        seed_inventory(self.db)
+        self.db.add_all([
+            models.Reservation(id_objet=2, statut_reservation="Active"),
+            models.Reservation(id_objet=2, statut_reservation="En attente"),
+            models.Reservation(id_objet=2, statut_reservation="WAITING"),
+            models.Reservation(id_objet=2, statut_reservation="Cancelled"),
+            models.Reservation(id_objet=3, statut_reservation=None),
+        ])
+        self.db.commit()
+        self.engine = SmartSearchEngine()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_waiting_and_popularity_in_one_query(self):
+        with count_selects(self.db) as statements:
+            waiting, popularity, ranks = self.engine._load_candidate_features(self.db, [1, 2, 3], "scanner")
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(waiting, {1: 0, 2: 2, 3: 0})
+        self.assertEqual(popularity, {1: 0, 2: 3, 3: 1})
+        self.assertEqual(ranks, {})
+
+    def test_failed_rank_keeps_the_callers_transaction(self):
+        # ts_rank_cd does not exist on SQLite: the ranked attempt fails as it would without the column
+        self.engine._use_search_document = lambda db: True
+        self.db.add(models.Reservation(id_objet=1, statut_reservation="En attente"))
+        waiting, popularity, ranks = self.engine._load_candidate_features(self.db, [1, 2, 3], "scanner")
+        self.assertEqual(waiting, {1: 1, 2: 2, 3: 0})
+        self.assertEqual(ranks, {})
+        self.db.commit()
+        self.assertEqual(self.db.query(models.Reservation).filter_by(id_objet=1).count(), 1)
+
+    def test_warm_search_makes_two_selects(self):
+        self.engine.search(self.db, query="scanner fujitsu")
+        self.engine.result_cache.clear()
+        with count_selects(self.db) as statements:
+            results = self.engine.search(self.db, query="scanner fujitsu")
+        self.assertEqual(results[0].id_objet, 2)
+        self.assertEqual(results[0].waiting_count, 2)
+        self.assertEqual(len(statements), 2)
+
+
+class CandidateLoaderTests(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        seed_inventory(self.db)
+        self.engine = SmartSearchEngine()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_one_record_per_object_with_aggregated_functions(self):
+        with count_selects(self.db) as statements:
+            candidates = self.engine._load_candidates(self.db, [1, 2, 3])
+        self.assertEqual(len(statements), 1)
+        by_id = {candidate.id_objet: candidate for candidate in candidates}
+        self.assertEqual(sorted(by_id), [1, 2, 3])
+        self.assertEqual(sorted(f.nom for f in by_id[1].fonctionnalites), ["PDF", "Scan A4"])
+        self.assertEqual(by_id[3].fonctionnalites, ())
+        self.assertEqual((by_id[2].nom_salle, by_id[2].coord_x, by_id[2].num_etage), ("Salle Borealis", 40.0, 1))
+        with self.assertRaises(AttributeError):
+            by_id[1].unknown = True
+
+    def test_results_serialize_as_objet_response(self):
+        result = self.engine.search(self.db, query="imprimante hp")[0]
+        response = schemas.ObjetResponse.model_validate(result)
+        self.assertEqual(response.id_objet, 1)
+        self.assertEqual(sorted(f.nom for f in response.fonctionnalites), ["PDF", "Scan A4"])
+        self.assertEqual(response.relevance_score, result.relevance_score)
+
+
+class SearchDocumentTests(unittest.TestCase):
+    def test_sql_fold_matches_normalize_text(self):
+        # smartfind_fold = lower(regexp_replace(normalize(value, NFKD), <marks>, '', 'g')), replayed in Python
+        marks = re.search(r"'(\[.*\])'", SMARTFIND_FOLD_DDL).group(1)
+        self.assertIn("normalize(coalesce(value, ''), NFKD)", SMARTFIND_FOLD_DDL)
+
+        def sql_fold(value):
+            return re.sub(marks, "", unicodedata.normalize("NFKD", value)).lower()
+
+        for value in ["Écran Œuvre Æther", "İstanbul ½ ǅ", "طابِعة ليزر", "ﻻ إضاءة", "Naïve façade", "LaserJet"]:
+            with self.subTest(value=value):
+                self.assertEqual(sql_fold(value), normalize_text(value))
+
+    def test_document_filter_keeps_substring_semantics(self):
+        db = make_session()
+        seed_inventory(db)
+        # what the trigger stores: the folded object, room and function names
+        for objet in db.query(models.Objet):
+            parts = [objet.nom_model, objet.type_objet, objet.nom_marque, objet.description]
+            parts.append(objet.salle.nom_salle if objet.salle else None)
+            parts.append(" ".join(f.nom for f in objet.fonctionnalites) or None)
+            objet.search_text = normalize_text(" ".join(part for part in parts if part))
+        db.commit()
+
+        engine = SmartSearchEngine(use_index=False)
+        engine._use_search_document = lambda db: True
+        try:
+            with count_selects(db) as statements:
+                results = engine.search(db, query="jet")
+            self.assertEqual([obj.id_objet for obj in results], [1])
+            self.assertTrue(any("objets.search_text LIKE '%' || ? || '%' ESCAPE '/'" in statement for statement in statements))
+            self.assertEqual([obj.id_objet for obj in engine.search(db, query="boreal")], [2, 3])
+        finally:
+            db.close()
+
+    def test_migrations_are_postgres_only_and_idempotent(self):
+        statements = postgres_statements()
+        for statement in statements:
+            head = " ".join(statement.split()[:3]).upper()
+            self.assertTrue(
+                head.startswith((
+                    "CREATE OR REPLACE", "DROP TRIGGER IF", "DROP FUNCTION IF", "CREATE TRIGGER", "UPDATE",
+                    "CREATE INDEX IF",
+                ))
+                or "IF NOT EXISTS" in statement.upper(),
+                head,
+            )
+        self.assertIn(
+            "CREATE INDEX IF NOT EXISTS idx_objets_search_text ON objets USING gin (search_text gin_trgm_ops)",
+            statements,
+        )
+
+        db = make_session()
+        try:
+            with count_selects(db) as executed:
+                run_migrations(db.get_bind())
+            self.assertEqual(executed, [])
+        finally:
+            db.close()
+
+
+class TopKPaginationTests(unittest.TestCase):
+    QUERIES = ["imprimante couleur", "hp laser", "scanner pdf", "projecteur hdmi reunion", "ecran"]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.db = make_session()
+        seed_bulk_inventory(cls.db, 400)
+        cls.engine = SmartSearchEngine()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.close()
+
+    def ids(self, results):
+        return [obj.id_objet for obj in results]
+
+    def test_pages_match_the_full_ranking(self):
+        for query in self.QUERIES:
+            for sort_by_distance in (False, True):
+                full = self.ids(self.engine.search(self.db, query=query, sort_by_distance=sort_by_distance))
+                for offset, limit in ((0, 20), (20, 20), (0, 1), (35, 7)):
+                    page = self.engine.search_page(
+                        self.db, query=query, sort_by_distance=sort_by_distance, limit=limit, offset=offset,
+                    )
+                    self.assertEqual(self.ids(page.items), full[offset:offset + limit], (query, offset, limit))
+                    self.assertGreaterEqual(page.total, len(full))
+                    if page.exact:
+                        self.assertEqual(page.total, len(full))
+
+    def test_scoring_stops_before_all_candidates(self):
+        timer = metrics.StageTimer("search")
+        page = self.engine.search_page(self.db, query="imprimante couleur", limit=5, timer=timer)
+        counts = dict(timer.counts)
+        self.assertEqual(len(page.items), 5)
+        self.assertLess(counts["scored"], counts["candidates"])
+        self.assertEqual(page.next_offset, 5)
+
+    def test_cursor_roundtrip_is_bound_to_the_search(self):
+        fingerprint = search_fingerprint({"q": "hp", "type": None})
+        cursor = encode_search_cursor(40, fingerprint)
+        self.assertEqual(decode_search_cursor(cursor, fingerprint), 40)
+        with self.assertRaises(ValueError):
+            decode_search_cursor(cursor, search_fingerprint({"q": "scanner", "type": None}))
+        with self.assertRaises(ValueError):
+            decode_search_cursor("not a cursor", fingerprint)
+
+
+@unittest.skipIf(np is None, "numpy non installé")
+class BatchScoringTests(unittest.TestCase):
+    def test_batch_scores_match_per_object_loop(self):
+        engine = SmartSearchEngine(use_index=False)
+        inputs = dict(
+            haystacks=["imprimante hp laserjet salle atlas", "scanner fujitsu scansnap", "projecteur epson", ""],
+            query_clean="imprimante hp",
+            expanded_terms=["imprimante", "hp"],
+            corrections={"imprimnte": "imprimante"},
+            text_ranks=[0.4, 0.0, 0.1, 0.0],
+            availability_scores=[100.0, 45.0, 10.0, 30.0],
+            distances=[10.0, 50.0, float("inf"), 7000.0],
+            waiting_counts=[0, 2, 1, 0],
+            popularity_counts=[3, 0, 7, 1],
+            max_waiting=2,
+            max_popularity=7,
+            weights={"text": 0.60, "availability": 0.20, "distance": 0.05, "popularity": 0.10, "waiting": 0.05},
+        )
+
+        self.assertEqual(engine._score_features_batch(**inputs), engine._score_features_loop(**inputs))
+
+        inputs.update(query_clean="", expanded_terms=[], corrections={}, max_waiting=0, max_popularity=0)
+        self.assertEqual(engine._score_features_batch(**inputs), engine._score_features_loop(**inputs))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+
+import models
+from db_fixtures import make_session, seed_bulk_inventory, seed_inventory
+from search_engine import SmartSearchEngine
+from search_index import InvertedIndex
+
+
+class InvertedIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.index = InvertedIndex()
+        self.index.rebuild([
+            (1, "imprimante hp laserjet pro salle atlas scan a4 pdf"),
+            (2, "scanner fujitsu scansnap salle borealis scan a4"),
+        ])
+
+    def test_lookup_has_substring_semantics(self):
+        self.assertEqual(self.index.lookup("laserj"), {1})
+        self.assertEqual(self.index.lookup("scan"), {1, 2})
+        self.assertEqual(self.index.lookup("hp"), {1})
+        self.assertEqual(self.index.lookup("salle atlas"), {1})
+        self.assertEqual(self.index.lookup("canon"), set())
+
+    def test_incremental_upsert_and_remove(self):
+        self.index.upsert(1, "imprimante canon")
+        self.assertEqual(self.index.lookup("canon"), {1})
+        self.assertEqual(self.index.lookup("laserjet"), set())
+
+        self.index.remove(2)
+        self.assertEqual(self.index.lookup("fujitsu"), set())
+        self.assertEqual(len(self.index), 1)
+
+    def test_match_any_orders_by_hits(self):
+        self.assertEqual(self.index.match_any(["scan", "fujitsu"]), [2, 1])
+
+
+class SearchEngineIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        seed_inventory(self.db)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_index_and_sql_paths_return_same_objects(self):
+        indexed = SmartSearchEngine(use_index=True)
+        sql_only = SmartSearchEngine(use_index=False)
+
+        for query in ["laserjet", "fujitsu", "borealis", "pdf"]:
+            with self.subTest(query=query):
+                from_index = [obj.id_objet for obj in indexed.search(self.db, query=query)]
+                from_sql = [obj.id_objet for obj in sql_only.search(self.db, query=query)]
+                self.assertEqual(from_index, from_sql)
+                self.assertTrue(from_index)
+
+    def test_refresh_objet_updates_candidates(self):
+        engine = SmartSearchEngine(use_index=True)
+        engine.search(self.db, query="laserjet")
+
+        objet = self.db.get(models.Objet, 2)
+        objet.description = "Numérisation rapide couleur"
+        self.db.commit()
+        engine.refresh_objet(objet)
+
+        self.assertEqual(engine.index.lookup("numerisation"), {2})
+        engine.forget_objet(2)
+        self.assertEqual(engine.index.lookup("numerisation"), set())
+
+
+class IndexCandidateCapTests(unittest.TestCase):
+    def test_cap_keeps_the_best_ranked_index_candidates(self):
+        db = make_session()
+        seed_bulk_inventory(db, 600)
+        engine = SmartSearchEngine(use_index=True)
+        # index order deliberately unlike primary-key order
+        ranked = sorted(range(1, 601), key=lambda id_objet: (id_objet * 37) % 601)
+        index_rank = engine._index_rank_table(ranked)
+        sql = db.query(models.Objet.id_objet).join(index_rank, index_rank.c.id_objet == models.Objet.id_objet)
+
+        statement = engine._candidate_id_statement(sql, 420, rank_order=index_rank.c.position)
+        kept = {id_objet for (id_objet,) in db.execute(statement)}
+        self.assertEqual(kept, set(ranked[:420]))
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
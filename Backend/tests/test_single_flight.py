@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from search_engine import SmartSearchEngine
+from single_flight import SingleFlight
+
+
+class SingleFlightTests(unittest.TestCase):
+    def test_concurrent_threads_share_one_computation(self):
+        flight = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return ["result"]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(flight.do, "key", compute) for _ in range(8)]
+            while flight.deduplicated < 7:
+                time.sleep(0.001)
+            release.set()
+            results = [future.result(5) for future in futures]
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual((flight.leaders, flight.deduplicated), (1, 7))
+        self.assertEqual(len(flight), 0)
+
+    def test_errors_reach_every_waiter_and_are_not_kept(self):
+        flight = SingleFlight()
+        release = threading.Event()
+
+        def fail():
+            release.wait(5)
+            raise ValueError("boom")
+
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = [pool.submit(flight.do, "key", fail) for _ in range(3)]
+            while flight.deduplicated < 2:
+                time.sleep(0.001)
+            release.set()
+            for future in futures:
+                with self.assertRaises(ValueError):
+                    future.result(5)
+
+        self.assertEqual(flight.do("key", lambda: "again"), "again")
+
+    def test_async_callers_share_one_computation(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        async def main():
+            return await asyncio.gather(*(flight.do_async("key", compute) for _ in range(5)))
+
+        self.assertEqual(asyncio.run(main()), ["result"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.deduplicated, 4)
+
+    def test_async_caller_waits_on_a_thread_leader(self):
+        flight = SingleFlight()
+        release = threading.Event()
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            leader = pool.submit(flight.do, "key", lambda: release.wait(5) and "from thread")
+            while len(flight) == 0:
+                time.sleep(0.001)
+
+            async def follower():
+                waiting = asyncio.ensure_future(flight.do_async("key", lambda: "not run"))
+                await asyncio.sleep(0.01)
+                release.set()
+                return await waiting
+
+            self.assertEqual(asyncio.run(follower()), "from thread")
+            self.assertEqual(leader.result(5), "from thread")
+
+
+class CoalescedSearchTests(unittest.TestCase):
+    def test_identical_searches_run_once(self):
+        engine = SmartSearchEngine()
+        calls = []
+        release = threading.Event()
+
+        def slow_search(db, query, *arguments):
+            calls.append(query)
+            release.wait(5)
+            return [], 0, True
+
+        engine._search = slow_search
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            futures = [pool.submit(engine.search_page, None, "imprimante", limit=10) for _ in range(4)]
+            other = pool.submit(engine.search_page, None, "imprimante", limit=20)
+            while engine.search_flight.deduplicated < 3 or len(calls) < 2:
+                time.sleep(0.001)
+            release.set()
+            for future in futures + [other]:
+                future.result(5)
+
+        self.assertEqual(calls, ["imprimante", "imprimante"])
+        self.assertEqual(engine.search_flight.deduplicated, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
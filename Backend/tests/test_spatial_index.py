@@ -0,0 +1,91 @@
+import random
+import unittest
+
+import models
+from db_fixtures import count_selects, make_session, seed_bulk_inventory
+from search_engine import SmartSearchEngine
+from spatial_index import DEFAULT_FLOOR_HEIGHT, Origin, Room, SpatialIndex, floor_elevations
+
+
+class SpatialIndexTests(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(3)
+        self.rooms = [
+            Room(n, rng.uniform(-200, 200), rng.uniform(-200, 200), rng.choice([0, 1, 2]))
+            for n in range(1, 301)
+        ]
+        self.rooms.append(Room(999, None, None, 1))
+        self.index = SpatialIndex(self.rooms, floor_elevations([(0, 4.0), (1, None), (2, 3.5)]), cell_size=20.0)
+
+    def test_floor_elevations_accumulate_heights(self):
+        self.assertEqual(floor_elevations([(2, 3.5), (0, 4.0), (1, None)]), {0: 0.0, 1: 4.0, 2: 4.0 + DEFAULT_FLOOR_HEIGHT})
+
+    def test_within_matches_brute_force(self):
+        for origin in (Origin(0.0, 0.0), Origin(35.0, -80.0, 2), Origin(500.0, 500.0, 0)):
+            for radius in (0.0, 15.0, 60.0, 400.0):
+                expected = {
+                    room.id_salle
+                    for room in self.rooms
+                    if self.index.room_distance(origin, room) <= radius
+                }
+                self.assertEqual(set(self.index.within(origin, radius)), expected, (origin, radius))
+
+    def test_nearest_yields_rooms_by_increasing_distance(self):
+        origin = Origin(12.0, 7.0, 1)
+        nearest = list(self.index.nearest(origin))
+        expected = sorted(
+            (self.index.room_distance(origin, room), room.id_salle)
+            for room in self.rooms
+            if room.x is not None
+        )
+        self.assertEqual([(distance, room.id_salle) for distance, room in nearest], expected)
+
+
+class SearchOriginTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = make_session()
+        seed_bulk_inventory(cls.db, 1500)
+        cls.engine = SmartSearchEngine()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.close()
+
+    def test_resolve_origin(self):
+        self.assertIsNone(self.engine.resolve_origin(self.db))
+        self.assertEqual(self.engine.resolve_origin(self.db, salle_id=5), Origin(50.0, 5.0, 3))
+        self.assertEqual(self.engine.resolve_origin(self.db, x=1, y=2, num_etage=2), Origin(1.0, 2.0, 2))
+        for arguments in ({"salle_id": 404}, {"x": 1.0}, {"num_etage": 1}):
+            with self.assertRaises(ValueError):
+                self.engine.resolve_origin(self.db, **arguments)
+
+    def test_max_distance_is_prefiltered_in_sql(self):
+        origin = self.engine.resolve_origin(self.db, salle_id=5)
+        everything = self.engine.search(self.db, query="imprimante", origin=origin)
+        expected = sorted(obj.id_objet for obj in everything if obj.distance_m is not None and obj.distance_m <= 25)
+
+        with count_selects(self.db, with_parameters=True) as statements:
+            results = self.engine.search(self.db, query="imprimante", origin=origin, max_distance=25)
+        self.assertEqual(sorted(obj.id_objet for obj in results), expected)
+        self.assertTrue(any("objets.id_salle IN" in statement for statement, _ in statements))
+
+    def test_distance_sort_loads_the_nearest_matches_first(self):
+        origin = self.engine.resolve_origin(self.db, salle_id=9)
+        spatial = self.engine._get_spatial_index(self.db)
+        matching = self.db.query(models.Objet).filter(models.Objet.statut == "Disponible").all()
+        # More matches than the 420-candidate cap
+        self.assertGreater(len(matching), 420)
+        closest = min(
+            spatial.distance(origin, obj.salle.coord_x, obj.salle.coord_y, obj.salle.num_etage) for obj in matching
+        )
+
+        results = self.engine.search(
+            self.db, filtre_statut="Disponible", origin=origin, sort_by_distance=True, limit=5,
+        )
+        self.assertEqual(len(results), 5)
+        self.assertAlmostEqual(results[0].distance_m, round(closest, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
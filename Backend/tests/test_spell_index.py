@@ -0,0 +1,105 @@
+import random
+import string
+import unittest
+
+from search_engine import SmartSearchEngine, fuzz, process
+from spell_index import CorrectionIndex
+
+
+class CorrectionIndexParityTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = SmartSearchEngine()
+        aliases = {alias for alias in cls.engine.type_alias_to_canonical if len(alias) >= 3}
+        domain = {
+            "laserjet", "officejet", "scansnap", "epson", "fujitsu", "canon", "brother",
+            "atlas", "borealis", "reunion", "couleur", "recto", "verso", "numerisation",
+            "bluetooth", "ethernet", "hdmi", "usb", "pdf",
+        }
+        cls.vocabulary = sorted(aliases | domain)
+        cls.index = CorrectionIndex(cls.vocabulary, scorer=fuzz.WRatio)
+
+    def test_same_corrections_as_full_scan(self):
+        typos = [
+            "sanne", "scaner", "prnter", "imprimnte", "projectr", "ecrann", "routr",
+            "wfi", "laserjt", "fujitsuu", "borelis", "numerisaton", "xyzzy", "imprim",
+        ]
+
+        for typo in typos:
+            with self.subTest(typo=typo):
+                expected = self.engine._autocorrect_terms([typo], self.vocabulary)
+                actual = self.engine._autocorrect_terms([typo], self.vocabulary, self.index)
+                self.assertEqual(actual, expected)
+
+    def test_sanne_resolves_to_scanner(self):
+        expected = self.engine._autocorrect_terms(["sanne"], self.vocabulary)
+        corrected, corrections = self.engine._autocorrect_terms(["sanne"], self.vocabulary, self.index)
+
+        self.assertEqual((corrected, corrections), expected)
+        self.assertIn("scanner", self.engine._expand_terms(corrected))
+
+    def test_known_words_are_kept(self):
+        self.assertIn("scanner", self.index)
+        corrected, corrections = self.engine._autocorrect_terms(["scanner", "hp"], self.vocabulary, self.index)
+        self.assertEqual(corrected, ["scanner", "hp"])
+        self.assertEqual(corrections, {})
+
+
+class CorrectionIndexRandomParityTests(unittest.TestCase):
+    SYLLABLES = [
+        "pro", "jec", "teur", "im", "pri", "man", "te", "scan", "ner", "ecr", "an", "rou", "ter",
+        "las", "er", "jet", "port", "able", "cla", "vier", "sou", "ris", "ca", "me", "ra", "mi",
+        "cro", "phone", "ta", "ble", "tte",
+    ]
+
+    def test_matches_extract_one_on_a_large_vocabulary(self):
+        rng = random.Random(3)
+
+        def word():
+            value = "".join(rng.choice(self.SYLLABLES) for _ in range(rng.randint(2, 4)))
+            if rng.random() < 0.5:
+                value += "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(1, 3)))
+            return value
+
+        def typo(value):
+            letters = list(value)
+            for _ in range(rng.randint(1, 2)):
+                operation, position = rng.random(), rng.randrange(len(letters))
+                if operation < 0.33:
+                    del letters[position]
+                elif operation < 0.66:
+                    letters.insert(position, rng.choice(string.ascii_lowercase))
+                else:
+                    letters[position] = rng.choice(string.ascii_lowercase)
+            return "".join(letters)
+
+        vocabulary = sorted({word() for _ in range(3200)})[:3000]
+        index = CorrectionIndex(vocabulary, scorer=fuzz.WRatio)
+        # the first two used to lose their best candidate to a cap on trigram candidates
+        queries = ["imprimnte", "projecteru"] + [typo(rng.choice(vocabulary)) for _ in range(400)]
+
+        for query in queries:
+            if query in index:
+                continue
+            expected = process.extractOne(query, vocabulary, scorer=fuzz.WRatio, score_cutoff=84)
+            with self.subTest(query=query):
+                self.assertEqual(index.best_match(query, score_cutoff=84), expected and (expected[0], float(expected[1])))
+
+
+class CorrectionIndexVersionTests(unittest.TestCase):
+    def test_index_from_an_older_vocabulary_is_not_served(self):
+        engine = SmartSearchEngine()
+        engine._vocabulary_snapshot = lambda db: (engine._data_version, ["scanner", "imprimante"])
+        first = engine._get_correction_index(None)
+        self.assertIs(engine._get_correction_index(None), first)
+
+        engine.bump_data_version()
+        # A slower thread finishing its build for the old version after the bump
+        engine._correction_index = (engine._data_version - 1, first)
+        second = engine._get_correction_index(None)
+        self.assertIsNot(second, first)
+        self.assertIs(engine._get_correction_index(None), second)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+from db_fixtures import count_selects, make_session, seed_inventory
+from search_engine import SmartSearchEngine
+from suggest_index import SuggestionIndex
+
+
+class SuggestionIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.index = SuggestionIndex([
+            ("LaserJet Pro", "laserjet pro", 16.0),
+            ("Laser", "laser", 7.0),
+            ("Scanner", "scanner", 18.0),
+            ("ScanSnap", "scansnap", 16.0),
+            ("Scan A4", "scan a4", 7.0),
+            ("scanner", "scanner", 7.0),
+        ])
+
+    def test_duplicate_labels_keep_highest_base_score(self):
+        self.assertEqual(len(self.index), 5)
+        label_id = self.index.norms.index("scanner")
+        self.assertEqual(self.index.labels[label_id], "Scanner")
+        self.assertEqual(self.index.base_scores[label_id], 18.0)
+
+    def test_prefix_hits_are_ranked_by_base_score_then_length(self):
+        labels = [self.index.labels[i] for i in self.index.prefix_ids("sca", 3)]
+        self.assertEqual(labels, ["Scanner", "ScanSnap", "Scan A4"])
+
+        labels = [self.index.labels[i] for i in self.index.prefix_ids("scans", 5)]
+        self.assertEqual(labels, ["ScanSnap"])
+
+    def test_substring_and_fuzzy_candidates(self):
+        labels = [self.index.labels[i] for i in self.index.substring_ids("jet", 5, set())]
+        self.assertEqual(labels, ["LaserJet Pro"])
+
+        fuzzy = [self.index.labels[i] for i in self.index.fuzzy_ids("lasrjet", 5, set())]
+        self.assertIn("LaserJet Pro", fuzzy)
+
+
+class SearchSuggestTests(unittest.TestCase):
+    def setUp(self):
+        self.db = make_session()
+        seed_inventory(self.db)
+        self.engine = SmartSearchEngine()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_suggest_answers_from_memory_after_first_call(self):
+        self.assertIn("LaserJet Pro", self.engine.suggest(self.db, "laser"))
+
+        with count_selects(self.db) as statements:
+            suggestions = self.engine.suggest(self.db, "scan")
+        self.assertEqual(statements, [])
+        self.assertIn("Scanner", suggestions)
+        self.assertIn("ScanSnap", suggestions)
+
+    def test_floor_suggestions(self):
+        self.assertIn("Étage 1", self.engine.suggest(self.db, "etage"))
+
+
+if __name__ == "__main__":
+    unittest.main()
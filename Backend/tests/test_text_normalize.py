@@ -0,0 +1,37 @@
+import random
+import unittest
+
+import text_normalize
+from text_normalize import normalize_text, strip_accents
+
+
+def reference(value):
+    return strip_accents(str(value)).lower().strip() if value else ""
+
+
+class NormalizeTextTests(unittest.TestCase):
+    def test_common_values(self):
+        self.assertEqual(normalize_text("  Écran Occupé "), "ecran occupe")
+        self.assertEqual(normalize_text("Signalé"), "signale")
+        self.assertEqual(normalize_text("Œuvre Ça"), "œuvre ca")
+        self.assertEqual(normalize_text("أَيْنَ الطَّابِعَة"), "اين الطابعة")
+        self.assertEqual(normalize_text(None), "")
+        self.assertEqual(normalize_text(2), "2")
+
+    def test_matches_unicodedata_fold(self):
+        alphabet = [chr(code) for start, end in text_normalize.TABLE_RANGES for code in range(start, end + 1)]
+        alphabet += ["漢", "한", "€", "ﬁ", " "]
+        rng = random.Random(7)
+        for _ in range(5000):
+            value = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 12)))
+            self.assertEqual(normalize_text(value), reference(value), repr(value))
+
+    def test_long_values_bypass_the_cache(self):
+        before = text_normalize.cache_info().currsize
+        value = "é" * (text_normalize.NORMALIZE_CACHE_MAX_LENGTH + 1)
+        self.assertEqual(normalize_text(value), "e" * len(value))
+        self.assertEqual(text_normalize.cache_info().currsize, before)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+Normalisation de texte pour la recherche : minuscules, sans accents ni diacritiques.
+
+Même résultat que NFKD + suppression des caractères combinants, mais via une
+table `str.translate` précalculée pour les plages latines et arabes, avec un
+cache borné pour les valeurs répétées (types, statuts, marques...). Les
+chaînes contenant d'autres écritures repassent par unicodedata.
+"""
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+NORMALIZE_CACHE_SIZE = int(os.getenv("SEARCH_NORMALIZE_CACHE_SIZE", "65536"))
+# Longer values (descriptions, haystacks) are rarely repeated: normalized without touching the cache
+NORMALIZE_CACHE_MAX_LENGTH = 256
+
+# Basic Latin to Latin Extended-B, combining diacritics, Arabic, Latin Extended Additional,
+# Arabic presentation forms
+TABLE_RANGES: Tuple[Tuple[int, int], ...] = (
+    (0x0000, 0x024F),
+    (0x0300, 0x036F),
+    (0x0600, 0x06FF),
+    (0x1E00, 0x1EFF),
+    (0xFB50, 0xFDFF),
+    (0xFE70, 0xFEFF),
+)
+
+_OUTSIDE_TABLE = re.compile(
+    "[^" + "".join(f"\\u{start:04x}-\\u{end:04x}" for start, end in TABLE_RANGES) + "]"
+)
+
+
+def strip_accents(value: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", value) if not unicodedata.combining(c))
+
+
+def _build_fold_table(ranges: Iterable[Tuple[int, int]]) -> Dict[int, str]:
+    # Only characters whose NFKD fold differs from themselves ("é" -> "e", "أ" -> "ا", harakat -> "")
+    table: Dict[int, str] = {}
+    for start, end in ranges:
+        for code in range(start, end + 1):
+            char = chr(code)
+            folded = strip_accents(char)
+            if folded != char:
+                table[code] = folded
+    return table
+
+
+FOLD_TABLE = _build_fold_table(TABLE_RANGES)
+
+
+def _normalize(value: str) -> str:
+    if value.isascii():
+        return value.lower().strip()
+    if _OUTSIDE_TABLE.search(value):
+        return strip_accents(value).lower().strip()
+    return value.translate(FOLD_TABLE).lower().strip()
+
+
+_normalize_cached = lru_cache(maxsize=NORMALIZE_CACHE_SIZE)(_normalize)
+
+
+def normalize_text(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    if type(value) is not str:
+        value = str(value)
+    if len(value) > NORMALIZE_CACHE_MAX_LENGTH:
+        return _normalize(value)
+    return _normalize_cached(value)
+
+
+def cache_info():
+    return _normalize_cached.cache_info()